@@ -0,0 +1,65 @@
+"""
+Benchmark of how long the dojo takes to start.
+
+Each case is run in a new interpreter several times and the median is
+reported: the bare interpreter, importing system.dojo, and running single
+commands through main.py the way a script calling dojo in a loop does.
+Scripts that run the dojo hundreds of times per batch need a command to
+start in under 50 ms.
+
+Usage:
+    python benchmarks/bench_startup.py [<runs>]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+# The time a single command should take, in milliseconds
+TARGET = 50
+
+CASES = [
+    ("python", ["-c", "pass"]),
+    ("import system.dojo", ["-c", "import system.dojo"]),
+    ("main.py --version", ["main.py", "--version"]),
+    ("main.py print_vacant_rooms", ["main.py", "print_vacant_rooms"]),
+]
+
+
+def median_time(args, runs):
+    """
+    Function to return the median time in milliseconds that a new
+    interpreter takes to run args
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable] + args, cwd=ROOT,
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main(runs=21):
+    if os.environ.get("PYTHONDONTWRITEBYTECODE"):
+        print("PYTHONDONTWRITEBYTECODE is set, so every run compiles the "
+              "sources again")
+    # Compile the sources once so that the runs measure starting, not
+    # compiling
+    subprocess.check_call([sys.executable, "-c", "import main"], cwd=ROOT)
+    for name, args in CASES:
+        elapsed = median_time(args, runs)
+        print("{0:<30}{1:8.1f} ms".format(name, elapsed))
+    # The last case is a whole command
+    print("Target of {0} ms per command {1}".format(
+        TARGET, "met" if elapsed < TARGET else "missed"))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -24,9 +24,14 @@ Usage:
     dojo remove_person <person_id>
     dojo rename_room <room_name> <new_room_name>
     dojo rename_person <person_id> <new_first_name> <new_last_name>
-    dojo load_state [<sqlite_db_name>]
+    dojo optimize_allocations <room_type> [<filename>]
+    dojo export <table> <filename>
+    dojo load_state [<sqlite_db_name>] [--lazy]
     dojo save_state [<sqlite_db_name>]
-    dojo (-i | --interactive)
+    dojo snapshot [<snapshot_file>]
+    dojo restore [<snapshot_file>]
+    dojo (-i | --interactive) [--journal=<journal_file>]
+    dojo serve [--socket=<socket_path>] [--journal=<journal_file>]
     dojo (-h | --help)
     dojo (-v | --version)
 
@@ -34,6 +39,10 @@ Options:
     -i, --interactive           :  Interactive Mode
     -h, --help                  :  show this help message
     -v, --version               :  print the version of the system
+    --journal=<journal_file>    :  recover from and log every change to a journal, checkpointed to dojo.db
+    --socket=<socket_path>      :  the Unix socket to serve on, DOJO_SOCKET or dojo.sock by default
+    serve                       :  keep one dojo running and answer commands sent to its socket. Set DOJO_SOCKET to send commands to it
+    --lazy                      :  answer queries from the database and only load it when something changes
     create_room                 :  create a room of a certain type
     add_person                  :  add a person to the system
     <room_type>                 :  office or livingspace
@@ -43,16 +52,20 @@ Options:
     <person_type>               :  indicate whether the person is staff or fellow
     [<wants_accommodation>]     :  'Y' or 'y' if the person wants accommodation, otherwise leave blank
     [<filename>]                :  output or input filename
+    <table>                     :  people, rooms or allocations, exported as .csv, .jsonl or .col
     [<sqlite_db_name>]          :  name of the database to either load data from or save data to
+    [<snapshot_file>]           :  name of the binary snapshot to either save the dojo to or restore it from
 """
 
+import os
 import sys
 import cmd
 from docopt import docopt, DocoptExit
 from termcolor import cprint
-from system.dojo import Dojo
 
-new_dojo = Dojo()
+# The first arguments that are not sent to a running server
+LOCAL_ARGUMENTS = ["serve", "-i", "--interactive", "-h", "--help", "-v",
+                   "--version"]
 
 
 def docopt_cmd(func):
@@ -89,18 +102,23 @@ def docopt_cmd(func):
 
 class MyInteractive(cmd.Cmd):
     prompt = "Dojo >>> "
+    # The banner is only shown by cmdloop, that is in interactive mode
+    intro = __doc__
     file = None
-    print(__doc__)
+
+    def __init__(self, dojo):
+        cmd.Cmd.__init__(self)
+        self.dojo = dojo
 
     @docopt_cmd
     def do_create_room(self, args):
         """Usage: create_room <room_type> <room_name>..."""
         if args["<room_type>"].lower() == "office":
             for i in args["<room_name>"]:
-                new_dojo.create_room(i, "office")
+                self.dojo.create_room(i, "office")
         elif args["<room_type>"].lower() == "livingspace":
             for i in args["<room_name>"]:
-                new_dojo.create_room(i, "livingspace")
+                self.dojo.create_room(i, "livingspace")
         else:
             cprint(
                 "Sorry. Check the room type you entered and try again", "red")
@@ -117,20 +135,20 @@ class MyInteractive(cmd.Cmd):
                                 args["<wants_accommodation>"] == "y":
                     wants_accommodation = True
                     p_type = "fellow"
-                    new_dojo.add_person(person_first_name, person_last_name,
+                    self.dojo.add_person(person_first_name, person_last_name,
                                         p_type, wants_accommodation)
                     print("")
 
                 elif args["<wants_accommodation>"] is None:
                     wants_accommodation = False
                     p_type = "fellow"
-                    new_dojo.add_person(person_first_name, person_last_name,
+                    self.dojo.add_person(person_first_name, person_last_name,
                                         p_type, wants_accommodation)
                     print("")
 
             elif args["<person_type>"].upper() == "STAFF":
                 p_type = "staff"
-                new_dojo.add_person(person_first_name,
+                self.dojo.add_person(person_first_name,
                                     person_last_name, p_type)
                 print("")
 
@@ -150,12 +168,12 @@ class MyInteractive(cmd.Cmd):
         """Usage: print_room <room_name>"""
         room_name = args["<room_name>"]
         print("")
-        new_dojo.print_room(room_name)
+        self.dojo.print_room(room_name)
 
     @docopt_cmd
     def do_print_vacant_rooms(self, args):
         """Usage: print_vacant_rooms"""
-        new_dojo.print_vacant_rooms()
+        self.dojo.print_vacant_rooms()
 
     @docopt_cmd
     def do_print_allocations(self, args):
@@ -163,10 +181,10 @@ class MyInteractive(cmd.Cmd):
         if args["<filename>"]:
             filename = str(args["<filename>"].split(".")[0]) + ".txt"
             print("")
-            new_dojo.print_allocations(filename)
+            self.dojo.print_allocations(filename)
         else:
             print("")
-            new_dojo.print_allocations()
+            self.dojo.print_allocations()
 
     @docopt_cmd
     def do_print_unallocated(self, args):
@@ -174,24 +192,24 @@ class MyInteractive(cmd.Cmd):
         if args["<filename>"]:
             filename = str(args["<filename>"].split(".")[0]) + ".txt"
             print("")
-            new_dojo.print_unallocated(filename)
+            self.dojo.print_unallocated(filename)
         else:
             print("")
-            new_dojo.print_unallocated()
+            self.dojo.print_unallocated()
 
     @docopt_cmd
     def do_load_people(self, args):
         """Usage: load_people [<filename>]"""
         if args["<filename>"]:
-            new_dojo.load_people(args["<filename>"])
+            self.dojo.load_people(args["<filename>"])
         else:
-            new_dojo.load_people()
+            self.dojo.load_people()
 
     @docopt_cmd
     def do_get_person_id(self, args):
         """Usage: get_person_id <person_first_name> <person_last_name>"""
         p_name = args["<person_first_name>"] + " " + args["<person_last_name>"]
-        new_dojo.get_person_id(p_name)
+        self.dojo.get_person_id(p_name)
 
     @docopt_cmd
     def do_allocate_person(self, args):
@@ -199,9 +217,9 @@ class MyInteractive(cmd.Cmd):
         room_type = args["<room_type>"]
         person_id = int(args["<person_id>"])
         if room_type.lower() == "office":
-            new_dojo.allocate_person(person_id, "office")
+            self.dojo.allocate_person(person_id, "office")
         elif room_type.lower() == "livingspace":
-            new_dojo.allocate_person(person_id, "livingspace")
+            self.dojo.allocate_person(person_id, "livingspace")
         else:
             cprint("Please check the room type you entered and try again",
                    "red")
@@ -210,46 +228,87 @@ class MyInteractive(cmd.Cmd):
         """Usage: reallocate_person <person_id> <room_name>"""
         p_id = int(args["<person_id>"])
         r_name = args["<room_name>"]
-        new_dojo.reallocate_person(p_id, r_name)
+        self.dojo.reallocate_person(p_id, r_name)
 
     @docopt_cmd
     def do_save_state(self, args):
         """Usage: save_state [<sqlite_db_name>]"""
         if args["<sqlite_db_name>"]:
             db_name = str(args["<sqlite_db_name>"].split(".")[0]) + ".db"
-            new_dojo.save_state(db_name)
+            self.dojo.save_state(db_name)
         else:
-            new_dojo.save_state()
+            self.dojo.save_state()
 
     @docopt_cmd
     def do_load_state(self, args):
-        """Usage: load_state [<sqlite_db_name>]"""
+        """Usage: load_state [<sqlite_db_name>] [--lazy]"""
         if args["<sqlite_db_name>"]:
             db_name = str(args["<sqlite_db_name>"].split(".")[0]) + ".db"
-            new_dojo.load_state(db_name)
+            self.dojo.load_state(db_name, lazy=args["--lazy"])
+        else:
+            self.dojo.load_state(lazy=args["--lazy"])
+
+    @docopt_cmd
+    def do_snapshot(self, args):
+        """Usage: snapshot [<snapshot_file>]"""
+        if args["<snapshot_file>"]:
+            self.dojo.snapshot(args["<snapshot_file>"])
         else:
-            new_dojo.load_state()
+            self.dojo.snapshot()
+
+    @docopt_cmd
+    def do_restore(self, args):
+        """Usage: restore [<snapshot_file>]"""
+        try:
+            if args["<snapshot_file>"]:
+                self.dojo.restore(args["<snapshot_file>"])
+            else:
+                self.dojo.restore()
+        except ValueError as e:
+            cprint(str(e), "red")
 
     @docopt_cmd
     def do_delete_room(self, args):
         """Usage: delete_room <room_name>"""
-        new_dojo.delete_room(args["<room_name>"])
+        self.dojo.delete_room(args["<room_name>"])
 
     @docopt_cmd
     def do_remove_person(self, args):
         """Usage: remove_person <person_id>"""
-        new_dojo.remove_person(args["<person_id>"])
+        self.dojo.remove_person(int(args["<person_id>"]))
 
     @docopt_cmd
     def do_rename_room(self, args):
         """Usage: rename_room <room_name> <new_room_name>"""
-        new_dojo.rename_room(args["<room_name>"], args["<new_room_name>"])
+        self.dojo.rename_room(args["<room_name>"], args["<new_room_name>"])
 
     @docopt_cmd
     def do_rename_person(self, args):
         """Usage: rename_person <person_id> <new_first_name> <new_last_name>"""
         new_name = args["<new_first_name>"] + ' ' + args["<new_last_name>"]
-        new_dojo.rename_person(args["<person_id>"], new_name)
+        self.dojo.rename_person(int(args["<person_id>"]), new_name)
+
+    @docopt_cmd
+    def do_optimize_allocations(self, args):
+        """Usage: optimize_allocations <room_type> [<filename>]"""
+        room_type = args["<room_type>"].lower()
+        if room_type not in ["office", "livingspace"]:
+            cprint("Please check the room type you entered and try again",
+                   "red")
+        elif args["<filename>"]:
+            self.dojo.optimize_allocations(
+                self.dojo.load_preferences(args["<filename>"]), room_type)
+        else:
+            self.dojo.optimize_allocations(self.dojo.load_preferences(),
+                                          room_type)
+
+    @docopt_cmd
+    def do_export(self, args):
+        """Usage: export <table> <filename>"""
+        try:
+            self.dojo.export(args["<table>"].lower(), args["<filename>"])
+        except ValueError as e:
+            cprint(str(e), "red")
 
     @docopt_cmd
     def do_version(self, args):
@@ -258,18 +317,86 @@ class MyInteractive(cmd.Cmd):
 
     def do_quit(self, args):
         """Quits out of Interactive Mode."""
+        self.dojo.close_journal()
         print("Good Bye!")
         exit()
 
     def do_exit(self, args):
         """Exits the interactive mode"""
+        self.dojo.close_journal()
         print("Good bye!")
         exit()
 
 
-opt = docopt(__doc__, sys.argv[1:])
-
-if opt["--interactive"]:
-    MyInteractive().cmdloop()
-
-print(opt)
+def serve(dojo, socket_path, journal=None):
+    """
+    Function to keep one dojo running and answer the commands sent to
+    socket_path until it is interrupted or told to quit
+    """
+    from system.server import DojoServer
+    if journal:
+        dojo.open_journal(journal)
+    interpreter = MyInteractive(dojo)
+
+    def run_command(line):
+        # Messages of the interpreter go to the client too
+        interpreter.stdout = sys.stdout
+        interpreter.onecmd(line)
+
+    try:
+        server = DojoServer(socket_path, run_command)
+    except ValueError as e:
+        cprint(str(e), "red")
+        dojo.close_journal()
+        return
+    cprint("Serving the dojo on {}".format(socket_path), "green")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dojo.close_journal()
+
+
+def main(argv=None):
+    """
+    Function to run the command line. When DOJO_SOCKET names the socket of
+    a running server, commands are sent to it instead of being run in a
+    new dojo
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    socket_path = os.environ.get("DOJO_SOCKET")
+    if socket_path and argv and argv[0] not in LOCAL_ARGUMENTS:
+        from system.server import send_command
+        sys.stdout.write(send_command(socket_path, " ".join(argv)))
+        return
+
+    if argv and argv[0] not in LOCAL_ARGUMENTS and \
+            hasattr(MyInteractive, "do_" + argv[0]):
+        # Parsing the whole usage takes longer than running most commands,
+        # so a command is only parsed against its own usage
+        from system.dojo import Dojo
+        MyInteractive(Dojo()).onecmd(" ".join(argv))
+        return
+
+    opt = docopt(__doc__, argv)
+    if opt["--version"]:
+        cprint("Version 1.0")
+        return
+
+    from system.dojo import Dojo
+    dojo = Dojo()
+    if opt["--interactive"]:
+        if opt["--journal"]:
+            dojo.open_journal(opt["--journal"])
+        MyInteractive(dojo).cmdloop()
+    elif opt["serve"]:
+        serve(dojo, opt["--socket"] or socket_path or "dojo.sock",
+              opt["--journal"])
+    else:
+        MyInteractive(dojo).onecmd(" ".join(argv))
+
+
+if __name__ == "__main__":
+    main()
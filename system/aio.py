@@ -0,0 +1,198 @@
+import asyncio
+
+# The task that is running, which older versions of asyncio only give
+# through Task
+current_task = getattr(asyncio, "current_task", None) or \
+    asyncio.Task.current_task
+
+
+class RoomLock(object):
+    """
+    Class to lock one room. The task that holds the lock may take it again,
+    so a desk that holds a room can still change it
+    """
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.owner = None
+        self.count = 0
+
+    async def acquire(self):
+        task = current_task()
+        if self.owner is not task:
+            await self.lock.acquire()
+            self.owner = task
+        self.count += 1
+
+    def release(self):
+        self.count -= 1
+        if not self.count:
+            self.owner = None
+            self.lock.release()
+
+
+class RoomsLock(object):
+    """
+    Class to hold the locks of several rooms as one. The locks are taken in
+    a fixed order so that two holders cannot wait for each other
+    """
+    def __init__(self, locks):
+        self.locks = sorted(set(locks), key=id)
+
+    async def __aenter__(self):
+        taken = []
+        try:
+            for lock in self.locks:
+                await lock.acquire()
+                taken.append(lock)
+        except BaseException:
+            for lock in reversed(taken):
+                lock.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class AsyncDojo(object):
+    """
+    Class to let many coroutines, such as the front desks of a server, use
+    one dojo at the same time. Every call runs on the event loop thread, so
+    each change to the dojo is made in one go. Reads never wait. A change
+    holds a lock on each room it touches until its journal record is on
+    disk, so changes to the same room are acknowledged in order while
+    changes to other rooms go ahead. holding lets a desk keep rooms locked
+    across its own awaits, to check a room and then act on it. A desk that
+    holds rooms and then changes others should name them all in holding,
+    as the rooms are only locked in a fixed order within one call
+    """
+    def __init__(self, dojo):
+        self.dojo = dojo
+        self.locks = {}
+
+    def lock(self, room):
+        """
+        Method to return the lock of a room
+        """
+        if room not in self.locks:
+            self.locks[room] = RoomLock()
+        return self.locks[room]
+
+    def holding(self, *room_names):
+        """
+        Method to return an async context manager that holds the rooms with
+        the given names
+        """
+        return RoomsLock(self.lock(self.dojo.rooms_by_name[room_name])
+                         for room_name in room_names
+                         if room_name in self.dojo.rooms_by_name)
+
+    async def durable(self):
+        """
+        Method to wait until the journal of the dojo, if any, is on disk
+        """
+        if self.dojo.journal is not None:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.dojo.journal.sync)
+
+    async def change(self, find_rooms, action):
+        """
+        Method to lock the rooms returned by find_rooms, run action and wait
+        for it to be durable. The rooms are looked up again once they are
+        locked and the locks are taken again if they changed meanwhile
+        """
+        while True:
+            rooms = find_rooms()
+            async with RoomsLock(self.lock(room) for room in rooms):
+                if find_rooms() != rooms:
+                    continue
+                result = action()
+                for room in rooms:
+                    if self.dojo.rooms_by_name.get(room.room_name) \
+                            is not room:
+                        self.locks.pop(room, None)
+                await self.durable()
+                return result
+
+    def person_rooms(self, person_id, room_type=None):
+        """
+        Method to return the set of rooms a person is in, or only their room
+        of one type
+        """
+        rooms = self.dojo.person_rooms.get(person_id, {})
+        if room_type is not None:
+            return {rooms[room_type]} if room_type in rooms else set()
+        return set(rooms.values())
+
+    async def print_room(self, room_name):
+        return self.dojo.print_room(room_name)
+
+    async def print_vacant_rooms(self):
+        return self.dojo.print_vacant_rooms()
+
+    async def get_person_id(self, person_name):
+        return self.dojo.get_person_id(person_name)
+
+    async def check_room(self, room_name, person_id):
+        return self.dojo.check_room(room_name, person_id)
+
+    async def create_room(self, room_name, room_type):
+        room = self.dojo.create_room(room_name, room_type)
+        await self.durable()
+        return room
+
+    async def allocate_person(self, person_id, room_type, strategy=None):
+        """
+        Method to allocate a person to a room picked by the strategy. The
+        room is locked before the person is put in it and another one is
+        picked if it filled up meanwhile
+        """
+        dojo = self.dojo
+        while True:
+            room = dojo.pick_room(room_type, strategy)
+            if room is None:
+                return dojo.allocate_person(person_id, room_type, strategy)
+            async with RoomsLock([self.lock(room)]):
+                if dojo.pick_room(room_type, room_name=room.room_name) \
+                        is not room:
+                    continue
+                result = dojo.allocate_person(person_id, room_type,
+                                              room_name=room.room_name)
+                await self.durable()
+                return result
+
+    async def reallocate_person(self, person_id, room_name):
+        """
+        Method to move a person to a room, holding both the room and the
+        room of the same type that they are leaving
+        """
+        def find_rooms():
+            room = self.dojo.rooms_by_name.get(room_name)
+            if room is None:
+                return set()
+            return {room} | self.person_rooms(person_id, room.room_type)
+
+        return await self.change(find_rooms, lambda: self.dojo.
+                                 reallocate_person(person_id, room_name))
+
+    async def remove_person(self, person_id):
+        return await self.change(
+            lambda: self.person_rooms(person_id),
+            lambda: self.dojo.remove_person(person_id))
+
+    async def delete_room(self, room_name):
+        def find_rooms():
+            room = self.dojo.rooms_by_name.get(room_name)
+            return {room} if room is not None else set()
+
+        return await self.change(find_rooms,
+                                 lambda: self.dojo.delete_room(room_name))
+
+    async def rename_room(self, room_name, new_room_name):
+        def find_rooms():
+            room = self.dojo.rooms_by_name.get(room_name)
+            return {room} if room is not None else set()
+
+        return await self.change(find_rooms, lambda: self.dojo.rename_room(
+            room_name, new_room_name))
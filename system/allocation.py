@@ -0,0 +1,144 @@
+import heapq
+import itertools
+from collections import deque
+from functools import partial
+
+
+class RandomStrategy(object):
+    """
+    Class to pick a vacant room at random
+    """
+    def __init__(self, vacancies):
+        self.vacancies = vacancies
+
+    def update(self, room):
+        pass
+
+    def discard(self, room):
+        pass
+
+    def choose(self):
+        """
+        Method to return a random vacant room or None if there is none
+        """
+        return self.vacancies.choice()
+
+
+class HeapStrategy(object):
+    """
+    Class to pick the vacant room with the smallest key, as given by the key
+    function, from a heap. Entries are not removed when a room changes. A
+    newer entry is pushed instead and stale ones are dropped when they reach
+    the top of the heap, or all at once when they make up most of it
+    """
+    def __init__(self, vacancies, key):
+        self.key = key
+        self.heap = []
+        self.keys = {}
+        self.counter = itertools.count()
+        for room in vacancies.rooms:
+            self.update(room)
+
+    def update(self, room):
+        """
+        Method to push a room whose occupants have changed back onto the
+        heap, or forget it if it has no vacancy
+        """
+        if len(room.room_occupants) >= room.room_capacity:
+            self.discard(room)
+            return
+        key = self.key(room)
+        if self.keys.get(room) != key:
+            self.keys[room] = key
+            heapq.heappush(self.heap, (key, next(self.counter), room))
+            if len(self.heap) > 2 * len(self.keys):
+                self.compact()
+
+    def discard(self, room):
+        """
+        Method to forget a room. Its entries are dropped lazily
+        """
+        self.keys.pop(room, None)
+
+    def compact(self):
+        """
+        Method to rebuild the heap from its live entries. The oldest live
+        entry of each room is kept so rooms with equal keys are picked in
+        the same order as before
+        """
+        live = {}
+        for entry in self.heap:
+            key, count, room = entry
+            if self.keys.get(room) == key and \
+                    (room not in live or count < live[room][1]):
+                live[room] = entry
+        self.heap = list(live.values())
+        heapq.heapify(self.heap)
+
+    def choose(self):
+        """
+        Method to return the vacant room with the smallest key or None if
+        there is none
+        """
+        heap = self.heap
+        while heap:
+            key, _, room = heap[0]
+            if self.keys.get(room) == key:
+                return room
+            heapq.heappop(heap)
+
+
+def free_spaces(room):
+    """
+    Function to return the number of free spaces of a room. Picking the
+    room with the fewest fills rooms before new ones are opened
+    """
+    return room.room_capacity - len(room.room_occupants)
+
+
+def occupied_share(room):
+    """
+    Function to return how occupied a room is for its capacity. Picking the
+    room with the smallest share spreads people across every room
+    """
+    return len(room.room_occupants) / room.room_capacity
+
+
+class RoundRobinStrategy(object):
+    """
+    Class to pick the vacant rooms in turn. Rooms that become full are
+    skipped and dropped when their turn comes
+    """
+    def __init__(self, vacancies):
+        self.vacancies = vacancies
+        self.queue = deque(vacancies.rooms)
+        self.queued = set(self.queue)
+
+    def update(self, room):
+        if room not in self.queued and \
+                len(room.room_occupants) < room.room_capacity:
+            self.queue.append(room)
+            self.queued.add(room)
+
+    def discard(self, room):
+        pass
+
+    def choose(self):
+        """
+        Method to return the next vacant room in turn or None if there is
+        none
+        """
+        while self.queue:
+            room = self.queue.popleft()
+            if room in self.vacancies:
+                self.queue.append(room)
+                return room
+            self.queued.discard(room)
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "fill-first": partial(HeapStrategy, key=free_spaces),
+    "spread-evenly": partial(HeapStrategy, key=occupied_share),
+    "round-robin": RoundRobinStrategy
+}
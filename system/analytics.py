@@ -0,0 +1,174 @@
+from importlib.util import find_spec
+
+HAVE_NUMPY = find_spec("numpy") is not None
+
+# numpy takes longer to import than the rest of the dojo, so it is only
+# imported once the first arrays are made
+numpy = None
+
+# The room types in the order they are numbered in the arrays
+ROOM_TYPES = ["office", "livingspace"]
+
+
+class Occupancy(object):
+    """
+    Class to keep the capacity and the number of occupants of every room in
+    parallel NumPy arrays so that totals and reports over all the rooms are
+    computed without a Python loop. Each room has a slot in the arrays and
+    the slots of deleted rooms are reused
+    """
+    def __init__(self, size=64):
+        if not HAVE_NUMPY:
+            raise ImportError("Occupancy analytics need numpy")
+        load_numpy()
+        self.capacity = numpy.zeros(size, dtype=numpy.int64)
+        self.occupied = numpy.zeros(size, dtype=numpy.int64)
+        self.kind = numpy.full(size, -1, dtype=numpy.int8)
+        self.rooms = [None] * size
+        self.slots = {}
+        self.free = []
+        self.used = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def grow(self):
+        """
+        Method to double the size of the arrays
+        """
+        size = len(self.rooms)
+        self.capacity = numpy.concatenate(
+            [self.capacity, numpy.zeros(size, dtype=numpy.int64)])
+        self.occupied = numpy.concatenate(
+            [self.occupied, numpy.zeros(size, dtype=numpy.int64)])
+        self.kind = numpy.concatenate(
+            [self.kind, numpy.full(size, -1, dtype=numpy.int8)])
+        self.rooms.extend([None] * size)
+
+    def update(self, room):
+        """
+        Method to record the capacity and the number of occupants of a room,
+        giving it a slot if it does not have one yet
+        """
+        slot = self.slots.get(room)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                if self.used == len(self.rooms):
+                    self.grow()
+                slot = self.used
+                self.used += 1
+            self.slots[room] = slot
+            self.rooms[slot] = room
+            self.kind[slot] = ROOM_TYPES.index(room.room_type)
+            self.capacity[slot] = room.room_capacity
+        self.occupied[slot] = len(room.room_occupants)
+
+    def discard(self, room):
+        """
+        Method to forget a room and free its slot
+        """
+        slot = self.slots.pop(room, None)
+        if slot is None:
+            return
+        self.rooms[slot] = None
+        self.kind[slot] = -1
+        self.capacity[slot] = 0
+        self.occupied[slot] = 0
+        self.free.append(slot)
+
+    def mask(self, room_type=None):
+        """
+        Method to return which slots hold rooms of a type, or any room
+        """
+        kind = self.kind[:self.used]
+        if room_type is None:
+            return kind >= 0
+        return kind == ROOM_TYPES.index(room_type)
+
+    def totals(self, room_type=None):
+        """
+        Method to return the number of rooms, spaces, occupants and vacant
+        spaces of a type of room, or of every room
+        """
+        mask = self.mask(room_type)
+        capacity = int(self.capacity[:self.used][mask].sum())
+        occupied = int(self.occupied[:self.used][mask].sum())
+        return {"rooms": int(mask.sum()), "capacity": capacity,
+                "occupied": occupied, "vacant": capacity - occupied}
+
+    def utilisation(self):
+        """
+        Method to return the share of the spaces of each room type that are
+        taken, or None for a type with no spaces
+        """
+        mask = self.mask()
+        kind = self.kind[:self.used][mask]
+        capacity = numpy.bincount(kind,
+                                  weights=self.capacity[:self.used][mask],
+                                  minlength=len(ROOM_TYPES))
+        occupied = numpy.bincount(kind,
+                                  weights=self.occupied[:self.used][mask],
+                                  minlength=len(ROOM_TYPES))
+        return {room_type: float(occupied[index] / capacity[index])
+                if capacity[index] else None
+                for index, room_type in enumerate(ROOM_TYPES)}
+
+    def histogram(self, room_type=None):
+        """
+        Method to return a list whose nth entry is the number of rooms with
+        n occupants
+        """
+        occupied = self.occupied[:self.used][self.mask(room_type)]
+        return [int(count) for count in numpy.bincount(occupied)]
+
+    def emptiest(self, k, room_type=None):
+        """
+        Method to return up to k rooms with the most vacant spaces, most
+        vacant first, as (room, vacant_spaces) pairs. Rooms without a
+        vacancy are left out
+        """
+        if k <= 0:
+            return []
+        slots = numpy.flatnonzero(self.mask(room_type))
+        vacant = self.capacity[slots] - self.occupied[slots]
+        slots, vacant = slots[vacant > 0], vacant[vacant > 0]
+        if k < len(slots):
+            top = numpy.argpartition(-vacant, k - 1)[:k]
+            slots, vacant = slots[top], vacant[top]
+        order = numpy.lexsort((slots, -vacant))
+        return [(self.rooms[slot], int(spaces))
+                for slot, spaces in zip(slots[order], vacant[order])]
+
+    def summary(self):
+        """
+        Method to return a line that sums up how full the dojo is
+        """
+        totals = self.totals()
+        shares = self.utilisation()
+        return "{0} of {1} spaces taken, {2} vacant. Offices {3}, living " \
+               "spaces {4} in use".format(
+                   totals["occupied"], totals["capacity"], totals["vacant"],
+                   percentage(shares["office"]),
+                   percentage(shares["livingspace"]))
+
+
+def load_numpy():
+    """
+    Function to import numpy the first time it is needed
+    """
+    global numpy
+    if numpy is None:
+        import numpy as module
+        numpy = module
+    return numpy
+
+
+def percentage(share):
+    """
+    Function to format a share as a percentage, or n/a for no share
+    """
+    if share is None:
+        return "n/a"
+    return "{:.0f}%".format(share * 100)
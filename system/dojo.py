@@ -1,460 +1,799 @@
 import sys
 import os
+import gc
 import random
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from termcolor import cprint
+import itertools
+from functools import wraps
 from os import path
 
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from system.person import Fellow, Staff
+from system.person import Fellow, Staff, PersonIdSequence
 from system.room import Office, LivingSpace
-from system.models import People, Rooms, Unallocated, BASE
+from system.indexes import VacancyIndex, OrderedSet, ChangeTracker
+from system.allocation import STRATEGIES
+from system.optimize import auction, total_score
+from system.analytics import Occupancy, HAVE_NUMPY
+from system.results import BulkAllocation, Optimization
+from system.ingest import parse_person, read_people, read_preferences
+from system.output import get_output, NullOutput
+from system.reports import write_report, report_path
+from system.export import table_rows, export_table, export_format
+from system.snapshot import write_snapshot, read_snapshot, STAFF, \
+    WITHOUT_OFFICE, WITHOUT_LIVINGSPACE
+from system.journal import Journal
+from system.locking import NoLock
 
 BASE_DIR = ""
 
+# The class of each room type
+ROOM_CLASSES = {"office": Office, "livingspace": LivingSpace}
+
+# The people lists that say whether someone has a room of each type
+ROOM_STATUSES = {
+    "office": ("with_offices", "without_offices"),
+    "livingspace": ("with_livingspaces", "without_livingspaces")
+}
+
+
+def materialized(method):
+    """
+    Decorator for the methods that need every person and room in memory. A
+    dojo attached lazily to a database loads it before they run
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.materialize()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def journaled(method):
+    """
+    Decorator for the methods that change the dojo. What they changed is
+    appended to the journal, if the dojo has one, once they return
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if self.journal is not None:
+                self.commit_journal()
+    return wrapper
+
 
 class Dojo(object):
     """
-    Main dojo class that manages the system and the data
+    Main dojo class that manages the system and the data. Messages are
+    written to output, which can be "console" (the default), "null",
+    "buffered", "events" or any object with a write(message, colour) method.
+    strategy is the name of the allocation strategy used to pick rooms,
+    one of "random" (the default), "fill-first", "spread-evenly" or
+    "round-robin"
     """
-    def __init__(self):
+    def __init__(self, output=None, strategy="random"):
+        if strategy not in STRATEGIES:
+            raise ValueError("Invalid allocation strategy: {}".format(
+                strategy))
+        self.output = get_output(output)
+        self.strategy = strategy
         self.people = {
             "fellows": [],
             "staff": [],
-            "with_offices": [],
-            "without_offices": [],
-            "with_livingspaces": [],
-            "without_livingspaces": []
+            "with_offices": OrderedSet(),
+            "without_offices": OrderedSet(),
+            "with_livingspaces": OrderedSet(),
+            "without_livingspaces": OrderedSet()
         }
         self.rooms = {
             "offices": [],
             "livingspaces": []
         }
-
-    def get_random_room(self, room_type):
+        # Everyone in the dojo keyed by their id and the ids to give to
+        # the people added next
+        self.people_by_id = {}
+        self.person_ids = PersonIdSequence()
+        # Every room in the dojo keyed by its name
+        self.rooms_by_name = {}
+        # The office and living space of each person keyed by their id
+        self.person_rooms = {}
+        # Rooms that still have vacant spaces, per room type
+        self.vacancies = {
+            "office": VacancyIndex(),
+            "livingspace": VacancyIndex()
+        }
+        # The capacity and number of occupants of every room in arrays for
+        # reports, made the first time they are needed, see occupancy
+        self.occupancy_arrays = None
+        # The database that holds the last saved state, the row id of each
+        # room in it and what has changed since it was saved
+        self.synced_db = None
+        self.room_ids = {}
+        self.changes = ChangeTracker()
+        # The database that queries are answered from until the dojo has
+        # to be loaded, when load_state was called with lazy
+        self.lazy_db = None
+        # The journal that changes are appended to, the database it is
+        # checkpointed to and the number of operations between checkpoints
+        self.journal = None
+        self.journal_db = None
+        self.checkpoint_every = None
+        # Whether a commit saves a checkpoint when one is due. ThreadSafeDojo
+        # saves them itself once no change is half done
+        self.checkpoint_on_commit = True
+        # The lock that guards the indexes when the dojo is used from many
+        # threads, see system.locking
+        self.index_lock = NoLock()
+
+    @property
+    def occupancy(self):
         """
-        Method to return an office or living space that has a vacancy
+        Property of the occupancy arrays of the rooms, or None when numpy is
+        not installed. The arrays are made from the rooms the first time
+        they are asked for and kept up to date from then on
         """
-        # Get a random office
-        if room_type == "office":
-            if [room for room in self.rooms["offices"]
-               if len(room.room_occupants) < room.room_capacity]:
-                random_office = random.choice(
-                    [room for room in self.rooms["offices"] if
-                     len(room.room_occupants) < room.room_capacity])
-
-                return random_office
+        if self.occupancy_arrays is None and HAVE_NUMPY:
+            occupancy = Occupancy()
+            for room in self.rooms["offices"] + self.rooms["livingspaces"]:
+                occupancy.update(room)
+            self.occupancy_arrays = occupancy
+        return self.occupancy_arrays
+
+    def get_random_room(self, room_type, strategy=None):
+        """
+        Method to return an office or living space that has a vacancy. The
+        room is picked by the given strategy or the one of the dojo
+        """
+        with self.index_lock:
+            if room_type in self.vacancies:
+                return self.vacancies[room_type].strategy(
+                    strategy or self.strategy).choose()
 
-        # Get a random living space
-        elif room_type == "livingspace":
-            if [room for room in self.rooms["livingspaces"]
-               if len(room.room_occupants) < room.room_capacity]:
-                random_livingspace = random.choice(
-                    [room for room in self.rooms["livingspaces"] if
-                     len(room.room_occupants) < room.room_capacity])
+    def pick_room(self, room_type, strategy=None, room_name=None):
+        """
+        Method to return the room called room_name if it is of the given
+        type and has a vacancy, or a room picked by the strategy when no
+        name is given
+        """
+        if room_name is None:
+            return self.get_random_room(room_type, strategy)
+        room = self.rooms_by_name.get(room_name)
+        if room is not None and room in self.vacancies[room_type]:
+            return room
 
-                return random_livingspace
+    def register_person(self, person):
+        """
+        Method to add a person to their category list and the id registry
+        """
+        with self.index_lock:
+            if person.person_type == "fellow":
+                self.people["fellows"].append(person)
+            else:
+                self.people["staff"].append(person)
+            self.people_by_id[person.person_id] = person
+            self.changes.person_changed(person)
 
+    def unregister_person(self, person):
+        """
+        Method to remove a person who is in no room from their category list,
+        the id registry and every allocation status
+        """
+        with self.index_lock:
+            if person.person_type == "fellow":
+                self.people["fellows"].remove(person)
+            else:
+                self.people["staff"].remove(person)
+            del self.people_by_id[person.person_id]
+            for statuses in ROOM_STATUSES.values():
+                for status in statuses:
+                    self.people[status].discard(person)
+            self.changes.person_removed(person)
+
+    def register_room(self, room):
+        """
+        Method to add a room to its category list and the name and vacancy
+        indexes
+        """
+        with self.index_lock:
+            if room.room_type == "office":
+                self.rooms["offices"].append(room)
+            else:
+                self.rooms["livingspaces"].append(room)
+            self.rooms_by_name[room.room_name] = room
+            self.vacancies[room.room_type].update(room)
+            if self.occupancy_arrays is not None:
+                self.occupancy_arrays.update(room)
+            self.changes.room_changed(room)
+
+    def unregister_room(self, room):
+        """
+        Method to remove an empty room from its category list and the name
+        and vacancy indexes
+        """
+        with self.index_lock:
+            if room.room_type == "office":
+                self.rooms["offices"].remove(room)
+            else:
+                self.rooms["livingspaces"].remove(room)
+            del self.rooms_by_name[room.room_name]
+            self.vacancies[room.room_type].discard(room)
+            if self.occupancy_arrays is not None:
+                self.occupancy_arrays.discard(room)
+            self.changes.room_removed(room, self.room_ids.pop(room, None))
+
+    def add_occupant(self, room, person):
+        """
+        Method to add a person to a room and keep the indexes and the
+        allocation status of the person up to date
+        """
+        with self.index_lock:
+            room.room_occupants.append(person)
+            with_room, without_room = ROOM_STATUSES[room.room_type]
+            self.people[without_room].discard(person)
+            self.people[with_room].append(person)
+            self.person_rooms.setdefault(person.person_id, {})[
+                room.room_type] = room
+            self.vacancies[room.room_type].update(room)
+            if self.occupancy_arrays is not None:
+                self.occupancy_arrays.update(room)
+            self.changes.person_changed(person)
+            self.changes.room_changed(room)
+
+    def remove_occupant(self, room, person):
+        """
+        Method to remove a person from a room and keep the indexes up to date.
+        The person is marked as not having a room of that type
+        """
+        with self.index_lock:
+            room.room_occupants.remove(person)
+            with_room, without_room = ROOM_STATUSES[room.room_type]
+            self.people[with_room].discard(person)
+            self.people[without_room].append(person)
+            person_rooms = self.person_rooms.get(person.person_id, {})
+            if person_rooms.get(room.room_type) is room:
+                del person_rooms[room.room_type]
+            if not person_rooms:
+                self.person_rooms.pop(person.person_id, None)
+            self.vacancies[room.room_type].update(room)
+            if self.occupancy_arrays is not None:
+                self.occupancy_arrays.update(room)
+            self.changes.person_changed(person)
+            self.changes.room_changed(room)
+
+    @journaled
+    @materialized
     def add_person(self, first_name, last_name,
-                   person_type, wants_accommodation=False):
+                   person_type, wants_accommodation=False, strategy=None):
         """
         Method to create a fellow or staff, add them to the system and allocate
-        them rooms
+        them rooms using the given allocation strategy or the one of the dojo
         """
         person_name = first_name + " " + last_name
         if person_type == "fellow":
-            new_fellow = Fellow(person_name)
-            self.people["fellows"].append(new_fellow)
-            cprint("Fellow {0} - id: {1} has been successfully added.".format(
-                new_fellow.person_name, new_fellow.person_id), "green")
+            new_fellow = Fellow(person_name,
+                                person_id=self.person_ids.next_id())
+            self.register_person(new_fellow)
+            self.output.write(
+                "Fellow {0} - id: {1} has been successfully added.".format(
+                    new_fellow.person_name, new_fellow.person_id), "green")
 
             if wants_accommodation is True:
                 # Check if there is a vacant living space,
                 # if none, add the fellow to the without living spaces list
-                fellow_livingspace = self.get_random_room("livingspace")
+                fellow_livingspace = self.get_random_room(
+                    "livingspace", strategy)
                 if fellow_livingspace is not None:
-                    fellow_livingspace.room_occupants.append(new_fellow)
-                    self.people["with_livingspaces"].append(new_fellow)
-                    cprint(
+                    self.add_occupant(fellow_livingspace, new_fellow)
+                    self.output.write(
                         "{0} has been allocated the living space {1}.".format(
                             first_name,
                             fellow_livingspace.room_name), "green")
                 else:
                     self.people["without_livingspaces"].append(new_fellow)
-                    cprint("Sorry."
-                           "No living space is currently available for {}."
-                           "Please try again later".format(new_fellow), "red")
+                    self.output.write(
+                        "Sorry."
+                        "No living space is currently available for {}."
+                        "Please try again later".format(new_fellow), "red")
 
             elif wants_accommodation is False:
                 self.people["without_livingspaces"].append(new_fellow)
 
             # Check if there is a vacant office, if none, add the fellow to
             # the without offices list
-            fellow_office = self.get_random_room("office")
+            fellow_office = self.get_random_room("office", strategy)
             if fellow_office is not None:
-                fellow_office.room_occupants.append(new_fellow)
-                self.people["with_offices"].append(new_fellow)
-                cprint("{0} has been allocated the office {1}."
-                       .format(first_name, fellow_office.room_name), "green")
+                self.add_occupant(fellow_office, new_fellow)
+                self.output.write(
+                    "{0} has been allocated the office {1}."
+                    .format(first_name, fellow_office.room_name), "green")
 
             else:
                 self.people["without_offices"].append(new_fellow)
-                cprint("Sorry. No office is currently available for {}."
-                       "Please try again later".format(new_fellow), "red")
+                self.output.write(
+                    "Sorry. No office is currently available for {}."
+                    "Please try again later".format(new_fellow), "red")
 
             return new_fellow
 
         elif person_type == "staff":
-            new_staff = Staff(person_name)
-            self.people["staff"].append(new_staff)
-            cprint("Staff {0} - id: {1} has been successfully added.".format(
-                new_staff.person_name, new_staff.person_id), "green")
+            new_staff = Staff(person_name,
+                              person_id=self.person_ids.next_id())
+            self.register_person(new_staff)
+            self.output.write(
+                "Staff {0} - id: {1} has been successfully added.".format(
+                    new_staff.person_name, new_staff.person_id), "green")
 
             # Check if there is a vacant office, if none, add the fellow to the
             # without offices list
-            staff_office = self.get_random_room("office")
+            staff_office = self.get_random_room("office", strategy)
             if staff_office is not None:
-                staff_office.room_occupants.append(new_staff)
-                self.people["with_offices"].append(new_staff)
-                cprint("{0} has been allocated the office {1}.".
-                       format(first_name, staff_office.room_name), "green")
+                self.add_occupant(staff_office, new_staff)
+                self.output.write(
+                    "{0} has been allocated the office {1}.".
+                    format(first_name, staff_office.room_name), "green")
             else:
                 self.people["without_offices"].append(new_staff)
-                cprint("Sorry. No office is currently available for {}."
-                       "Please try again later".format(new_staff), "red")
+                self.output.write(
+                    "Sorry. No office is currently available for {}."
+                    "Please try again later".format(new_staff), "red")
 
             return new_staff
 
+    def vacancy_pool(self, room_type, rng=random):
+        """
+        Method to return a shuffled list with one entry for every vacant space
+        in the rooms of a type
+        """
+        pool = []
+        for room in self.vacancies[room_type].rooms:
+            pool.extend(
+                [room] * (room.room_capacity - len(room.room_occupants)))
+        rng.shuffle(pool)
+        return pool
+
+    @journaled
+    @materialized
+    def add_people_bulk(self, records, seed=None, strategy=None):
+        """
+        Method to add many people at once. Each record is a tuple of
+        (first_name, last_name, person_type, wants_accommodation). With the
+        random strategy everyone is allocated in a single pass over a
+        shuffled pool of vacant spaces. The outcome is returned instead of
+        being printed person by person
+        """
+        result = next(self.add_people_in_chunks([records], seed, strategy))
+        self.output.write(
+            "{} people have been added.".format(len(result.added)),
+            "green")
+        return result
+
+    @materialized
+    def add_people_in_chunks(self, chunks, seed=None, strategy=None):
+        """
+        Method to add people from an iterable of lists of records, yielding
+        the outcome of each list as soon as it has been allocated. The pool of
+        vacant spaces is shared by all the chunks. The dojo may change while
+        a chunk is yielded, so spaces in rooms that have since been deleted
+        or filled are skipped, and the pool is made again once it runs out.
+        Each list is journaled before its outcome is yielded
+        """
+        rng = random.Random(seed)
+        pools = {}
+        strategy = strategy or self.strategy
+        if strategy not in STRATEGIES:
+            raise ValueError("Invalid allocation strategy: {}".format(
+                strategy))
+
+        def take_space(room_type):
+            if strategy != "random":
+                return self.get_random_room(room_type, strategy)
+            vacant = self.vacancies[room_type]
+            for _ in range(2):
+                if not pools.get(room_type):
+                    pools[room_type] = self.vacancy_pool(room_type, rng)
+                pool = pools[room_type]
+                while pool:
+                    room = pool.pop()
+                    if room in vacant:
+                        return room
+
+        for records in chunks:
+            result = BulkAllocation()
+            for record in records:
+                first_name, last_name, person_type, wants_accommodation = \
+                    record
+                person_name = first_name + " " + last_name
+                if person_type.lower() == "fellow":
+                    person = Fellow(person_name,
+                                    person_id=self.person_ids.next_id())
+                elif person_type.lower() == "staff":
+                    person = Staff(person_name,
+                                   person_id=self.person_ids.next_id())
+                else:
+                    result.rejected.append(record)
+                    continue
+                self.register_person(person)
+                result.added.append(person)
+
+                if isinstance(person, Fellow):
+                    livingspace = None
+                    if wants_accommodation in (True, "Y", "y"):
+                        livingspace = take_space("livingspace")
+                        if livingspace is None:
+                            result.without_livingspaces.append(person)
+                    if livingspace is not None:
+                        self.add_occupant(livingspace, person)
+                        result.livingspaces[person.person_id] = livingspace
+                    else:
+                        self.people["without_livingspaces"].append(person)
+
+                office = take_space("office")
+                if office is not None:
+                    self.add_occupant(office, person)
+                    result.offices[person.person_id] = office
+                else:
+                    self.people["without_offices"].append(person)
+                    result.without_offices.append(person)
+            # A generator cannot be journaled, as journaled would commit when
+            # it is created rather than as it runs
+            if self.journal is not None:
+                self.commit_journal()
+            yield result
+
+    @journaled
+    @materialized
     def create_room(self, room_name, room_type):
         """
         Method to create an office or living space as specified by the user
         """
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
         if room_type == "office":
-            if room_name in [office.room_name for office in all_rooms]:
-                cprint(
+            if room_name in self.rooms_by_name:
+                self.output.write(
                     "Sorry. A room called {} already exists. Please try again"
                     .format(room_name), "red")
             else:
                 new_office = Office(room_name)
-                self.rooms["offices"].append(new_office)
-                cprint("An office called {} has been successfully created!"
-                       .format(new_office.room_name), "green")
+                self.register_room(new_office)
+                self.output.write(
+                    "An office called {} has been successfully created!"
+                    .format(new_office.room_name), "green")
                 return new_office
 
         elif room_type == "livingspace":
-            if room_name in [livingspace.room_name for livingspace in
-                             all_rooms]:
-                cprint("Sorry. A room called {} already exists. "
-                       "Please try again".format(room_name), "red")
+            if room_name in self.rooms_by_name:
+                self.output.write("Sorry. A room called {} already exists. "
+                                  "Please try again".format(room_name), "red")
             else:
                 new_livingspace = LivingSpace(room_name)
-                self.rooms["livingspaces"].append(new_livingspace)
-                cprint("A living space called {} has been successfully created"
-                       .format(new_livingspace.room_name), "green")
+                self.register_room(new_livingspace)
+                self.output.write(
+                    "A living space called {} has been successfully created"
+                    .format(new_livingspace.room_name), "green")
                 return new_livingspace
 
-    def print_allocations(self, filename=None):
+    def allocation_lines(self):
         """
-        Method to print room allocations to screen and optionally print the
-        output to a text file
+        Method to generate the lines of the allocations report one at a time
+        as (line, colour) pairs
         """
-        output = ""
-        if self.rooms["offices"] or self.rooms["livingspaces"]:
-            for office in self.rooms["offices"]:
-                cprint("\n" + ("-" * 50), "green")
-                cprint("{0} - {1}".format(office.room_name, office.room_type),
-                       "green")
-                cprint(("-" * 50), "green")
-                output += ("{0} - {1}\n".format(office.room_name,
-                                                office.room_type))
-                output += ("-" * 50) + "\n"
-                if office.room_occupants:
-                    for person in office.room_occupants:
-                        cprint(person.person_name, "green")
-                        output += (person.person_name + "\n")
-                else:
-                    cprint("This room has no occupants.\n", "red")
-                    output += "This room has no occupants.\n"
-                output += "\n"
-
-            for livingspace in self.rooms["livingspaces"]:
-                cprint("\n" + ("-" * 50), "green")
-                cprint("{0} - {1}".format(livingspace.room_name,
-                                          livingspace.room_type), "green")
-                cprint(("-" * 50), "green")
-                output += (
-                    "{0} - {1}\n".format(livingspace.room_name,
-                                         livingspace.room_type))
-                output += ("-" * 50) + "\n"
-                if livingspace.room_occupants:
-                    for person in livingspace.room_occupants:
-                        cprint(person.person_name, "green")
-                        output += (person.person_name + "\n")
-                else:
-                    cprint("This room has no occupants.", "red")
-                    output += "This room has no occupants.\n"
-                output += "\n"
-
-            if filename:
-                file = os.path.join(
-                    os.path.dirname(os.path.realpath(__file__)),
-                    "..", "output_files", filename)
-                output_file = open(file, "w+")
-                output_file.write(output)
-                output_file.close()
-                cprint("The allocations have been printed to the file - {}".
-                       format(filename), "yellow")
-
-        else:
-            cprint("No rooms exist. Please create a room and try again\n",
-                   "red")
-            output += "No rooms exist. Please create a room and try again\n"
-
-        return output
+        if not (self.rooms["offices"] or self.rooms["livingspaces"]):
+            yield "No rooms exist. Please create a room and try again", "red"
+            return
+        for room in itertools.chain(self.rooms["offices"],
+                                    self.rooms["livingspaces"]):
+            yield "{0} - {1}".format(room.room_name, room.room_type), "green"
+            yield "-" * 50, "green"
+            if room.room_occupants:
+                for person in room.room_occupants:
+                    yield person.person_name, "green"
+            else:
+                yield "This room has no occupants.", "red"
+            yield "", None
 
-    def print_unallocated(self, filename=None):
+    def unallocated_lines(self):
         """
-        Method to print the list of unallocated members to the screen and
-        optionally write the output to a text file
+        Method to generate the lines of the unallocated people report one at
+        a time as (line, colour) pairs
         """
-        output = ""
         if self.people["without_livingspaces"]:
-            cprint("People without living spaces:\n", "yellow")
-            output += "People without living spaces:\n"
+            yield "People without living spaces:", "yellow"
             for person in self.people["without_livingspaces"]:
-                cprint("\t{0} - {1}".format(person.person_name,
-                                            person.person_type), "yellow")
-                print("")
-                output += "\t{0} - {1}\n".format(person.person_name,
-                                                 person.person_type)
-        elif not self.people["without_livingspaces"] and self.people["fellows"]:
-            cprint("Every fellow has a living space in the Dojo.\n", "green")
-            output += "Every fellow has a living space in the Dojo.\n\n"
+                yield "\t{0} - {1}".format(person.person_name,
+                                           person.person_type), "yellow"
+            yield "", None
+        elif self.people["fellows"]:
+            yield "Every fellow has a living space in the Dojo.", "green"
+            yield "", None
 
         if self.people["without_offices"]:
-            cprint("People without offices:\n", "yellow")
-            output += "People without offices:\n"
+            yield "People without offices:", "yellow"
             for person in self.people["without_offices"]:
-                cprint("\t{0} - {1}".format(person.person_name,
-                                            person.person_type), "yellow")
-                print("")
-                output += "\t{0} - {1}\n".format(person.person_name,
-                                                 person.person_type)
-        elif not self.people["without_offices"] and self.people["fellows"] or\
-                self.people["staff"]:
-            cprint("Everyone has an office in the Dojo.\n", "green")
-            output += "Everyone has an office in the Dojo.\n"
-
+                yield "\t{0} - {1}".format(person.person_name,
+                                           person.person_type), "yellow"
+        elif self.people["fellows"] or self.people["staff"]:
+            yield "Everyone has an office in the Dojo.", "green"
         else:
-            cprint("There are no people in the Dojo currently.", "red")
+            yield "There are no people in the Dojo currently.", "red"
 
+    def stream_report(self, lines, filename=None, as_string=False):
+        """
+        Method to stream the lines of a report to a file, given as a name or
+        a file-like object, or to the output when there is no file. The text
+        of the report is only kept and returned when as_string is set
+        """
+        kept = [] if as_string else None
         if filename:
-            file = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                "..", "output_files", filename)
-            output_file = open(file, "w+")
-            output_file.write(output)
-            output_file.close()
-            cprint("The allocations have been printed to the file - {}".format(
-                filename), "yellow")
+            def text():
+                for line, _ in lines:
+                    if kept is not None:
+                        kept.append(line)
+                    yield line
+            write_report(text(), filename)
+            if not hasattr(filename, "write"):
+                self.output.write(
+                    "The report has been printed to the file - {}".format(
+                        filename), "yellow")
+        else:
+            for line, colour in lines:
+                if kept is not None:
+                    kept.append(line)
+                self.output.write(line, colour)
+        if kept is not None:
+            return "".join(line + "\n" for line in kept)
+
+    @materialized
+    def print_allocations(self, filename=None, as_string=False):
+        """
+        Method to print room allocations to screen or to a file, given as a
+        name or a file-like object. The report is returned as a string when
+        as_string is set
+        """
+        if self.occupancy is not None and len(self.occupancy):
+            self.output.write(self.occupancy.summary(), "yellow")
+        return self.stream_report(self.allocation_lines(), filename, as_string)
 
-        return output
+    @materialized
+    def print_unallocated(self, filename=None, as_string=False):
+        """
+        Method to print the list of unallocated members to the screen or to
+        a file, given as a name or a file-like object. The report is
+        returned as a string when as_string is set
+        """
+        return self.stream_report(self.unallocated_lines(), filename,
+                                  as_string)
+
+    @materialized
+    def export(self, table, filename, format_name=None):
+        """
+        Method to export the people, rooms or allocations to a file, given
+        as a name or a file-like object, as csv, jsonl or columnar. Without
+        a format, the one that suits the extension of the file name is used
+        """
+        if format_name is None:
+            format_name = export_format(getattr(filename, "name", filename))
+        if hasattr(filename, "write"):
+            export_table(table_rows(self, table), table, filename,
+                         format_name)
+        else:
+            export_table(table_rows(self, table), table,
+                         report_path(filename), format_name)
+            self.output.write(
+                "The {0} have been exported to the file - {1}".format(
+                    table, filename), "yellow")
 
     def print_room(self, room_name):
         """
-        Method to print the members of a single room to the screen
+        Method to print the members of a single room to the screen. A dojo
+        attached lazily to a database reads them from the database
         """
-        rooms = self.rooms["offices"] + self.rooms["livingspaces"]
+        if self.lazy_db is not None:
+            from system.storage import sqlite_engine, find_room_type, \
+                room_occupants
+            engine = sqlite_engine(self.lazy_db)
+            with engine.connect() as connection:
+                room_type = find_room_type(connection, room_name)
+                names = room_occupants(connection, room_name)
+            engine.dispose()
+        else:
+            room = self.rooms_by_name.get(room_name)
+            room_type = room.room_type if room is not None else None
+            names = [person.person_name for person in room.room_occupants] \
+                if room is not None else []
         output = ""
-        if room_name not in [room.room_name for room in rooms]:
-            cprint("Sorry. The room you have entered does not exist."
-                   "Please try again", "red")
+        if room_type is None:
+            self.output.write(
+                "Sorry. The room you have entered does not exist."
+                "Please try again", "red")
             return "Sorry. The room you have entered does not exist. \
                                                         Please try again"
-        for room in rooms:
-            if room.room_name == room_name:
-                cprint(("{0} - {1}".format(room.room_name, room.room_type)),
-                       "green")
-                cprint(("-" * 50), "green")
-                output += (
-                    "{0} - {1}\n".format(room.room_name, room.room_type))
-                output += ("-" * 50) + "\n"
-                if room.room_occupants:
-                    for person in room.room_occupants:
-                        cprint(person.person_name, "green")
-                        output += (person.person_name + "\n")
-                else:
-                    cprint("This room has no occupants.", "red")
-                    output += "This room has no occupants.\n"
+        self.output.write(("{0} - {1}".format(room_name, room_type)),
+                          "green")
+        self.output.write(("-" * 50), "green")
+        output += (
+            "{0} - {1}\n".format(room_name, room_type))
+        output += ("-" * 50) + "\n"
+        if names:
+            for name in names:
+                self.output.write(name, "green")
+                output += (name + "\n")
+        else:
+            self.output.write("This room has no occupants.", "red")
+            output += "This room has no occupants.\n"
         return output
 
+    @materialized
     def print_vacant_rooms(self):
         """
         Method to print all rooms in the Dojo that have vacant spaces
         """
         all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
         if all_rooms:
+            if self.occupancy is not None:
+                self.output.write(self.occupancy.summary(), "yellow")
             vacant_rooms = [room for room in all_rooms if
                             len(room.room_occupants) < room.room_capacity]
             if vacant_rooms is not None:
                 for room in vacant_rooms:
                     empty_spaces = room.room_capacity - len(
                         room.room_occupants)
-                    cprint("\t{0} - Vacant spaces {1}".format(
-                        room.room_name, empty_spaces), "green")
+                    self.output.write("\t{0} - Vacant spaces {1}".format(
+                                   room.room_name, empty_spaces), "green")
                 return vacant_rooms
 
             elif vacant_rooms is None:
-                cprint("\tSorry there are no vacant rooms at the moment.",
-                       "red")
+                self.output.write(
+                    "\tSorry there are no vacant rooms at the moment.",
+                    "red")
                 return []
         else:
-            cprint("\tSorry there are no vacant rooms  at the moment.", "red")
+            self.output.write(
+                "\tSorry there are no vacant rooms  at the moment.", "red")
             return []
 
     def get_person_id(self, person_name):
         """
         This method will get a person's unique ID given their names to help the
-        user in reallocating a person
-        """
-        fellows = []
-        staff = []
-        if person_name in [person.person_name for person in
-                           self.people["fellows"]]:
-            for person in self.people["fellows"]:
-                if person.person_name == person_name:
-                    fellows.append(person)
+        user in reallocating a person. A dojo attached lazily to a database
+        looks them up there and returns copies of the people it finds
+        """
+        if self.lazy_db is not None:
+            from system.storage import sqlite_engine, find_people
+            engine = sqlite_engine(self.lazy_db)
+            with engine.connect() as connection:
+                rows = find_people(connection, person_name)
+            engine.dispose()
+            found = []
+            for person_id, names, person_type in rows:
+                person_class = Fellow if person_type == "fellow" else Staff
+                found.append(person_class(names, person_id=person_id))
+        else:
+            found = [person for person in
+                     self.people["fellows"] + self.people["staff"]
+                     if person.person_name == person_name]
+        fellows = [person for person in found
+                   if person.person_type == "fellow"]
+        staff = [person for person in found if person.person_type == "staff"]
+        if fellows:
             for fellow in fellows:
-                cprint("Fellow {0} - id: {1}".format(
-                    fellow.person_name, fellow.person_id), "green")
+                self.output.write("Fellow {0} - id: {1}".format(
+                               fellow.person_name, fellow.person_id), "green")
 
             return fellows
 
-        if person_name in [p.person_name for p in self.people["staff"]]:
-            for person in self.people["staff"]:
-                if person.person_name == person_name:
-                    staff.append(person)
+        if staff:
             for f in staff:
-                cprint("Staff {0} - id: {1}".format(
-                    f.person_name, f.person_id), "green")
+                self.output.write("Staff {0} - id: {1}".format(
+                               f.person_name, f.person_id), "green")
 
             return staff
 
-        elif person_name not in [p.person_name for p in
-                                 self.people["fellows"]] or person_name not in\
-                [p.person_name for p in self.people["staff"]]:
-            cprint("{} does not exist in the system. \
-                Please add them first to get their id.".format(person_name),
-                   "red")
+        else:
+            self.output.write(
+                "{} does not exist in the system. \
+             Please add them first to get their id.".format(person_name),
+                "red")
             person_id = 0
             return person_id
 
+    @materialized
     def get_person_object(self, person_id):
         """
         Method to check if a person exists before reallocation
         """
-        all_people = self.people["fellows"] + self.people["staff"]
-        if person_id in [person.person_id for person in all_people]:
-            for person in all_people:
-                if person.person_id == person_id:
-                    return person
-
-        elif person_id not in [person.person_id for person in all_people]:
-            return None
+        return self.people_by_id.get(person_id)
 
+    @materialized
     def check_room(self, room_name, person_id):
         """
         Method to check if the room that the person is to be reallocated to
         exists, is vacant and the person is not already in it.
         """
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-        if room_name in [room.room_name for room in all_rooms]:
-            for room in all_rooms:
-                if room.room_name == room_name and len(room.room_occupants) < \
-                        room.room_capacity and person_id not in \
-                        [person.person_id for person in room.room_occupants]:
-                    return room
-                elif room.room_name == room_name and len(room.room_occupants) \
-                        >= room.room_capacity:
-                    return "full"
-                elif room.room_name == room_name and person_id in \
-                        [person.person_id for person in room.room_occupants]:
-                    return "present"
-
-        elif room_name not in [room.room_name for room in all_rooms]:
+        room = self.rooms_by_name.get(room_name)
+        if room is None:
             return None
+        elif len(room.room_occupants) >= room.room_capacity:
+            return "full"
+        elif self.person_rooms.get(person_id, {}).get(room.room_type) is room:
+            return "present"
+        return room
 
+    @materialized
     def get_old_office(self, person_id):
         """
         Method to get the previous office that the person is in
         """
-        for room in self.rooms["offices"]:
-            if person_id in [person.person_id for
-                             person in room.room_occupants]:
-                return room
+        return self.person_rooms.get(person_id, {}).get("office")
 
+    @materialized
     def get_old_livingspace(self, person_id):
         """
         Method to get the previous living space that the person is in
         """
-        for room in self.rooms["livingspaces"]:
-            if person_id in [person.person_id for
-                             person in room.room_occupants]:
-                return room
+        return self.person_rooms.get(person_id, {}).get("livingspace")
 
-    def allocate_person(self, person_id, room_type):
+    @journaled
+    @materialized
+    def allocate_person(self, person_id, room_type, strategy=None,
+                        room_name=None):
         """
-        Method to allocate a person to an available room randomly
+        Method to allocate a person to an available room using the given
+        allocation strategy or the one of the dojo, or to the room called
+        room_name if it has a vacancy
         """
         person = self.get_person_object(person_id)
         if person:
             if room_type is "livingspace":
                 if person in self.people["without_livingspaces"]:
-                    livingspace = self.get_random_room("livingspace")
+                    livingspace = self.pick_room("livingspace", strategy,
+                                                 room_name)
                     if livingspace is not None:
-                        livingspace.room_occupants.append(person)
-                        self.people["without_livingspaces"].remove(person)
-                        self.people["with_livingspaces"].append(person)
-                        cprint(
+                        self.add_occupant(livingspace, person)
+                        self.output.write(
                             "{0} has been allocated the living space {1}.".
                             format(person.person_name, livingspace.room_name),
                             "green")
+                        return livingspace
                     else:
-                        cprint("Sorry."
-                               "No living space is currently available for {}."
-                               "Please try again later".format(
-                                person.person_name),
-                               "red")
+                        self.output.write(
+                            "Sorry."
+                            "No living space is currently available for {}."
+                            "Please try again later".format(
+                             person.person_name),
+                            "red")
                 else:
-                    cprint("Sorry. {} already has a livingspace. Reallocate "
-                           "them instead".format(person.person_name), "red")
+                    self.output.write(
+                        "Sorry. {} already has a livingspace. Reallocate "
+                        "them instead".format(person.person_name), "red")
 
             elif room_type is "office":
                 if person in self.people["without_offices"]:
-                    office = self.get_random_room("office")
+                    office = self.pick_room("office", strategy, room_name)
                     if office is not None:
-                        office.room_occupants.append(person)
-                        self.people["without_offices"].remove(person)
-                        self.people["with_offices"].append(person)
-                        cprint(
+                        self.add_occupant(office, person)
+                        self.output.write(
                             "{0} has been allocated the living space {1}.".
                             format(person.person_name, office.room_name),
                             "green")
+                        return office
                     else:
-                        cprint("Sorry."
-                               "No living space is currently available for {}."
-                               "Please try again later".format(
-                                person.person_name),
-                               "red")
+                        self.output.write(
+                            "Sorry."
+                            "No living space is currently available for {}."
+                            "Please try again later".format(
+                             person.person_name),
+                            "red")
                 else:
-                    cprint("Sorry. {} already has an office. Reallocate "
-                           "them instead".format(person.person_name), "red")
+                    self.output.write(
+                        "Sorry. {} already has an office. Reallocate "
+                        "them instead".format(person.person_name), "red")
 
         elif person is None:
-            cprint("Error. {} cannot be found in the system. Check and try"
-                   " again".format(person_id), "red")
+            self.output.write(
+                "Error. {} cannot be found in the system. Check and try"
+                " again".format(person_id), "red")
 
+    @journaled
+    @materialized
     def reallocate_person(self, person_id, room_name):
         """
         Method to reallocate an individual from one room to another using their
@@ -471,409 +810,968 @@ class Dojo(object):
                         new_room:
                     if isinstance(new_room, LivingSpace):
                         if isinstance(new_person, Staff):
-                            cprint("Cannot reallocate staff to a living space",
-                                   "red")
+                            self.output.write(
+                                "Cannot reallocate staff to a living space",
+                                "red")
                         elif isinstance(new_person, Fellow):
                             if isinstance(old_livingspace, LivingSpace) and \
                                             new_person in \
                                             old_livingspace.room_occupants:
-                                new_room.room_occupants.append(
-                                    old_livingspace.room_occupants.pop(
-                                        old_livingspace.room_occupants.index(
-                                            new_person)))
-                                cprint("{0} has been reallocated "
-                                       "to {1} from {2}".format(
-                                        new_person.person_name, room_name,
-                                        old_livingspace.room_name), "green")
+                                self.remove_occupant(old_livingspace,
+                                                     new_person)
+                                self.add_occupant(new_room, new_person)
+                                self.output.write(
+                                    "{0} has been reallocated "
+                                    "to {1} from {2}".format(
+                                     new_person.person_name, room_name,
+                                     old_livingspace.room_name), "green")
                             elif new_person in \
                                     self.people["without_livingspaces"]:
-                                cprint("{0} cannot be reallocated. "
-                                       "Allocate them a room first".format(
-                                        new_person.person_name), "red")
+                                self.output.write(
+                                    "{0} cannot be reallocated. "
+                                    "Allocate them a room first".format(
+                                     new_person.person_name), "red")
                             else:
-                                cprint("{} has not been reallocated.".format(
-                                    new_person.person_name), "green")
+                                self.output.write(
+                                    "{} has not been reallocated.".format(
+                                        new_person.person_name), "green")
 
                     elif isinstance(new_room, Office):
                         if isinstance(old_office, Office) and \
                                        new_person in old_office.room_occupants:
-                            new_room.room_occupants.append(
-                                old_office.room_occupants.pop(
-                                    old_office.room_occupants.index(
-                                        new_person)))
-                            cprint("{0} has been reallocated to {1} from {2}".
-                                   format(new_person.person_name, room_name,
-                                          old_office.room_name), "green")
+                            self.remove_occupant(old_office, new_person)
+                            self.add_occupant(new_room, new_person)
+                            self.output.write(
+                                "{0} has been reallocated to {1} from {2}".
+                                format(new_person.person_name, room_name,
+                                       old_office.room_name), "green")
                         elif new_person in self.people["without_offices"]:
-                            cprint("{0} cannot be reallocated. "
-                                   "Allocate them a room first".format(
-                                        new_person.person_name), "red")
+                            self.output.write(
+                                "{0} cannot be reallocated. "
+                                "Allocate them a room first".format(
+                                     new_person.person_name), "red")
                         else:
-                            cprint("{} has not been reallocated.".format(
-                                new_person.person_name), "red")
+                            self.output.write(
+                                "{} has not been reallocated.".format(
+                                    new_person.person_name), "red")
 
                 elif new_room is "full":
-                    cprint("Sorry. {} is already full".format(room_name),
-                           "red")
+                    self.output.write(
+                        "Sorry. {} is already full".format(room_name),
+                        "red")
 
                 elif new_room is "present":
-                    cprint("Sorry. {0} is already in room {1}".format(
-                        new_person.person_name, room_name), "red")
+                    self.output.write(
+                        "Sorry. {0} is already in room {1}".format(
+                            new_person.person_name, room_name), "red")
 
                 elif new_room is None:
-                    cprint(
+                    self.output.write(
                         "Sorry. Room {} doest not exist in the system.".format(
                             room_name), "red")
 
         elif new_person is None:
-            cprint("Sorry. {} does not exist in the system. \
-                   Please try again later".format(person_id), "red")
+            self.output.write("Sorry. {} does not exist in the system. \
+                              Please try again later".format(person_id), "red")
 
         else:
-            cprint("We ran into an error", "red")
+            self.output.write("We ran into an error", "red")
 
         return self.rooms
 
-    def load_people(self, filename="input.txt"):
+    @journaled
+    @materialized
+    def load_people(self, filename="input.txt", chunk_size=None,
+                    callback=None, seed=None):
         """
-        Method to load people from text file and allocate them rooms
+        Method to load people from text file and allocate them rooms.
+        When a chunk_size is given the file is streamed and the people are
+        added chunk by chunk. Progress and invalid lines are then reported to
+        callback(event, data) as ("progress", people_added) and
+        ("error", (line_number, line)) instead of being printed
         """
         file = os.path.join(os.path.dirname(os.path.realpath(__file__)),
                             "..", "input_files", filename)
         try:
             input_file = open(file, "r")
-            if input_file and os.path.getsize(file) > 0:
-                for line in input_file:
-                    first_name = line.split()[0]
-                    last_name = line.split()[1]
-                    person_name = first_name + " " + last_name
-                    person_type = line.split()[2]
-                    if len(line.split()) == 4 and person_type == "FELLOW":
-                        self.add_person(first_name, last_name,
-                                        person_type="fellow",
-                                        wants_accommodation=True)
-                        print("")
-
-                    elif len(line.split()) == 3 and person_type == "FELLOW":
-                        self.add_person(first_name, last_name,
-                                        person_type="fellow")
-                        print("")
-
-                    elif len(line.split()) == 3 and person_type == "STAFF":
-                        self.add_person(first_name, last_name,
-                                        person_type="staff")
-                        print("")
-            else:
-                cprint("The file you provided is empty."
-                       "Please check and try again.", "red")
-
         except FileNotFoundError:
-            cprint("\tThe file {} was not found. Check and try again"
-                   .format(filename), "red")
+            self.output.write(
+                "\tThe file {} was not found. Check and try again"
+                .format(filename), "red")
+            return
+
+        with input_file:
+            if os.path.getsize(file) == 0:
+                self.output.write("The file you provided is empty."
+                                  "Please check and try again.", "red")
+
+            elif chunk_size:
+                def on_error(line_number, line):
+                    if callback is not None:
+                        callback("error", (line_number, line))
+
+                people_added = 0
+                chunks = read_people(input_file, chunk_size, on_error)
+                for result in self.add_people_in_chunks(chunks, seed):
+                    people_added += len(result.added)
+                    if callback is not None:
+                        callback("progress", people_added)
+                return people_added
 
+            else:
+                for line in input_file:
+                    try:
+                        first_name, last_name, person_type, \
+                            wants_accommodation = parse_person(line)
+                    except ValueError:
+                        continue
+                    self.add_person(first_name, last_name, person_type,
+                                    wants_accommodation)
+                    self.output.write()
+
+    def load_preferences(self, filename="preferences.txt"):
+        """
+        Method to read the scores people have given rooms from a text file
+        with one "person_id room_name score" per line. Invalid lines are
+        skipped
+        """
+        file = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "..", "input_files", filename)
+        try:
+            input_file = open(file, "r")
+        except FileNotFoundError:
+            self.output.write(
+                "\tThe file {} was not found. Check and try again"
+                .format(filename), "red")
+            return {}
+        with input_file:
+            return read_preferences(input_file)
+
+    @journaled
+    @materialized
+    def optimize_allocations(self, preferences, room_type="office",
+                             seed=None):
+        """
+        Method to reallocate the rooms of a type so that the total of the
+        scores people have given their rooms is as high as possible.
+        preferences maps person ids to scores keyed by room name and rooms
+        that are not scored are worth nothing. Everyone with a room of the
+        type takes part, along with the people without one who have scored
+        one, who must be fellows for living spaces. People who get none of
+        the rooms they scored stay where they are while there is space. The
+        outcome is compared with a random allocation of the same people,
+        shuffled with seed
+        """
+        category = {"office": "offices", "livingspace": "livingspaces"}
+        if room_type not in category:
+            raise ValueError("Invalid room type: {}".format(room_type))
+        rooms = self.rooms[category[room_type]]
+        people = [
+            person for person in self.people["fellows"] + self.people["staff"]
+            if room_type in self.person_rooms.get(person.person_id, {}) or
+            (room_type == "office" or person.person_type == "fellow") and any(
+                room_name in self.rooms_by_name and
+                self.rooms_by_name[room_name].room_type == room_type
+                for room_name in preferences.get(person.person_id, {}))]
+
+        scores = {}
+        for person in people:
+            for room_name, score in preferences.get(
+                    person.person_id, {}).items():
+                room = self.rooms_by_name.get(room_name)
+                if room is not None and room.room_type == room_type:
+                    scores.setdefault(person, {})[room] = score
+        capacities = {room: room.room_capacity for room in rooms}
+        current = {person: self.person_rooms.get(
+            person.person_id, {}).get(room_type) for person in people}
+        assignment = auction(people, capacities, scores, current)
+
+        # Compare with everyone being put in a random vacant space
+        rng = random.Random(seed)
+        spaces = [room for room in rooms for _ in range(room.room_capacity)]
+        rng.shuffle(spaces)
+        shuffled = list(people)
+        rng.shuffle(shuffled)
+        result = Optimization(room_type)
+        result.baseline = total_score(scores, dict(zip(shuffled, spaces)))
+        result.satisfaction = total_score(scores, assignment)
+
+        # Move only the people whose room has changed
+        for person in people:
+            if current[person] is not None and \
+                    current[person] is not assignment[person]:
+                self.remove_occupant(current[person], person)
+        for person in people:
+            room = assignment[person]
+            if room is None:
+                result.unallocated.append(person)
+                continue
+            result.rooms[person.person_id] = room
+            if room is not current[person]:
+                self.add_occupant(room, person)
+                result.moved.append(person)
+
+        self.output.write(
+            "Total satisfaction is {0} against {1} for a random "
+            "allocation".format(result.satisfaction, result.baseline),
+            "green")
+        return result
+
+    @materialized
     def get_room_object(self, room_name):
         """
         Method to find a room and return it
         """
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-        if room_name in [room.room_name for room in all_rooms]:
-            for room in all_rooms:
-                if room.room_name == room_name:
-                    return room
+        return self.rooms_by_name.get(room_name)
 
-        else:
-            return None
+    def person_row(self, person):
+        """
+        Method to return the database row of a person
+        """
+        return {"person_id": person.person_id,
+                "names": person.person_name,
+                "person_type": person.person_type}
+
+    def room_row(self, room):
+        """
+        Method to return the database row of a room
+        """
+        return {"room_name": room.room_name,
+                "room_type": room.room_type,
+                "room_capacity": room.room_capacity}
+
+    def sequence_row(self):
+        """
+        Method to return the database row that holds the next person id
+        """
+        return {"name": "person_id",
+                "next_value": self.person_ids.next_value}
+
+    def allocation_rows(self, people):
+        """
+        Method to return the database rows for the rooms that each of the
+        people has been allocated. Every room must already have a row id
+        """
+        rows = []
+        for person in people:
+            person_rooms = self.person_rooms.get(person.person_id, {})
+            for room_type in ["office", "livingspace"]:
+                if room_type in person_rooms:
+                    rows.append({
+                        "person_id": person.person_id,
+                        "room_id": self.room_ids[person_rooms[room_type]],
+                        "kind": room_type})
+        return rows
+
+    def unallocated_rows(self, people):
+        """
+        Method to return the database rows for the room types that each of
+        the people has not been allocated
+        """
+        rows = []
+        for person in people:
+            for room_type in ["office", "livingspace"]:
+                if person in self.people[ROOM_STATUSES[room_type][1]]:
+                    rows.append({"person_id": person.person_id,
+                                 "names": person.person_name,
+                                 "person_type": person.person_type,
+                                 "without_room": room_type})
+        return rows
+
+    @materialized
+    def save_state(self, db_name="dojo.db", journal_mode=None,
+                   synchronous=None, incremental=False):
+        """
+        Method to save details to db using SQL. Everything is written in a
+        single transaction with one bulk insert per table. journal_mode and
+        synchronous set the sqlite pragmas of the same names. With
+        incremental, only what changed since the dojo was last saved to or
+        loaded from the same database is written
+        """
+        if incremental and self.synced_db == os.path.abspath(db_name) and \
+                os.path.exists(db_name):
+            return self.save_changes(db_name, journal_mode, synchronous)
+
+        # SQLAlchemy is only imported once the dojo is saved or loaded, so
+        # that starting the dojo stays fast
+        from system.models import People, Rooms, Allocations, \
+            Unallocated, Sequences, BASE
+        from system.storage import sqlite_engine, insert_rows
 
-    def save_state(self, db_name="dojo.db"):
-        """Method to save details to db using SQL"""
         # Create database
         if os.path.exists(db_name):
             os.remove(db_name)
 
-        engine = create_engine("sqlite:///{}".format(db_name))
-        BASE.metadata.bind = engine
+        engine = sqlite_engine(db_name, journal_mode, synchronous)
         BASE.metadata.create_all(engine)
-        cprint("Database created", "green")
-
-        Session = sessionmaker(bind=engine)
-        session = Session()
-
-        all_people = self.people["staff"] + self.people["fellows"]
-        if all_people:
-            cprint("\tSaving the people in the dojo...", "green")
-            for person in all_people:
-                new_person = People(
-                    person.person_id, person.person_name, person.person_type
-                )
-                session.add(new_person)
-                session.commit()
-            cprint("\tDone.", "green")
-        else:
-            cprint("\tThere are no people in the Dojo to be saved.", "yellow")
+        self.output.write("Database created", "green")
+
+        with engine.begin() as connection:
+            all_people = self.people["staff"] + self.people["fellows"]
+            if all_people:
+                self.output.write("\tSaving the people in the dojo...",
+                                  "green")
+                insert_rows(connection, People.__table__,
+                            [self.person_row(person) for person in all_people])
+                self.output.write("\tDone.", "green")
+            else:
+                self.output.write(
+                    "\tThere are no people in the Dojo to be saved.",
+                    "yellow")
 
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-        if all_rooms:
-            cprint("\tSaving the rooms in the dojo...", "green")
-            for room in all_rooms:
-                room_occupants = ",".join([str(person.person_id) for person
-                                           in room.room_occupants])
-                new_room = Rooms(
-                    room.room_name, room.room_type, room.room_capacity,
-                    room_occupants)
-                session.add(new_room)
-                session.commit()
-            cprint("\tDone.", "green")
-        else:
-            cprint("There are no rooms in the Dojo to be saved", "yellow")
+            all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
+            self.room_ids = {}
+            if all_rooms:
+                self.output.write("\tSaving the rooms in the dojo...",
+                                  "green")
+                rows = []
+                for room_id, room in enumerate(all_rooms, 1):
+                    self.room_ids[room] = room_id
+                    rows.append(dict(self.room_row(room), id=room_id))
+                insert_rows(connection, Rooms.__table__, rows)
+                insert_rows(connection, Allocations.__table__, [
+                    {"person_id": person.person_id,
+                     "room_id": self.room_ids[room],
+                     "kind": room.room_type}
+                    for room in all_rooms for person in room.room_occupants])
+                self.output.write("\tDone.", "green")
+            else:
+                self.output.write(
+                    "There are no rooms in the Dojo to be saved", "yellow")
+
+            all_unallocated = \
+                [(person, "office")
+                 for person in self.people["without_offices"]] + \
+                [(person, "livingspace")
+                 for person in self.people["without_livingspaces"]]
+            if all_unallocated:
+                self.output.write(
+                    "\tSaving the unallocated people in the dojo...",
+                    "green")
+                insert_rows(connection, Unallocated.__table__, [
+                    {"person_id": person.person_id,
+                     "names": person.person_name,
+                     "person_type": person.person_type,
+                     "without_room": without_room}
+                    for person, without_room in all_unallocated])
+                self.output.write("\tDone.", "green")
 
-        all_unallocated = self.people["without_offices"] + \
-            self.people["without_livingspaces"]
-        if all_unallocated:
-            cprint("\tSaving the unallocated people in the dojo...", "green")
-            for person in self.people["without_offices"]:
-                new_unallocated = Unallocated(
-                    person.person_id, person.person_name, person.person_type,
-                    without_room="office")
+            else:
+                self.output.write("There are no people who are unallocated \
+                           in the dojo to be saved.", "yellow")
 
-                session.add(new_unallocated)
-                session.commit()
+            insert_rows(connection, Sequences.__table__,
+                        [self.sequence_row()])
+        engine.dispose()
+        self.synced_db = os.path.abspath(db_name)
+        self.changes.clear()
 
-            for person in self.people["without_livingspaces"]:
-                new_unallocated = Unallocated(
-                    person.person_id, person.person_name, person.person_type,
-                    without_room="livingspace"
-                )
-                session.add(new_unallocated)
-                session.commit()
+    def save_changes(self, db_name, journal_mode=None, synchronous=None):
+        """
+        Method to write only the people and rooms that changed since the
+        last save to a database that already holds the rest
+        """
+        changes = self.changes
+        people = [person for person in changes.people
+                  if self.people_by_id.get(person.person_id) is person]
+        person_ids = [person.person_id for person in people] + \
+            list(changes.removed_people)
+        rooms = [room for room in changes.rooms
+                 if self.rooms_by_name.get(room.room_name) is room]
+
+        from system.models import People, Rooms, Allocations, \
+            Unallocated, Sequences
+        from sqlalchemy import text
+        from system.storage import sqlite_engine, insert_rows, \
+            update_rows, delete_rows, upgrade_schema
+        engine = sqlite_engine(db_name, journal_mode, synchronous)
+        with engine.begin() as connection:
+            upgrade_schema(connection)
+            delete_rows(connection, People.__table__.c.person_id, person_ids)
+            delete_rows(connection, Unallocated.__table__.c.person_id,
+                        person_ids)
+            delete_rows(connection, Allocations.__table__.c.person_id,
+                        person_ids)
+            delete_rows(connection, Allocations.__table__.c.room_id,
+                        list(changes.removed_rooms))
+            delete_rows(connection, Rooms.__table__.c.id,
+                        list(changes.removed_rooms))
+
+            insert_rows(connection, People.__table__,
+                        [self.person_row(person) for person in people])
+            insert_rows(connection, Unallocated.__table__,
+                        self.unallocated_rows(people))
+
+            update_rows(connection, Rooms.__table__.c.id,
+                        [dict(self.room_row(room), key=self.room_ids[room])
+                         for room in rooms if room in self.room_ids])
+            new_rooms = [room for room in rooms if room not in self.room_ids]
+            if new_rooms:
+                last_id = connection.execute(
+                    text("SELECT MAX(id) FROM rooms")).scalar() or 0
+                rows = []
+                for room_id, room in enumerate(new_rooms, last_id + 1):
+                    self.room_ids[room] = room_id
+                    rows.append(dict(self.room_row(room), id=room_id))
+                insert_rows(connection, Rooms.__table__, rows)
+            insert_rows(connection, Allocations.__table__,
+                        self.allocation_rows(people))
+            delete_rows(connection, Sequences.__table__.c.name,
+                        ["person_id"])
+            insert_rows(connection, Sequences.__table__,
+                        [self.sequence_row()])
+        engine.dispose()
+
+        self.output.write("{0} changes have been saved to {1}".format(
+            len(changes), db_name), "green")
+        changes.clear()
+
+    @journaled
+    def load_state(self, db_name="dojo.db", lazy=False):
+        """
+        Method to load the data stored in the database. Every table is read
+        with a single query and the people and rooms are rebuilt in one pass
+        over the rows. Loading into an empty dojo lets later incremental
+        saves to the same database write only what changed. With lazy, an
+        empty dojo only attaches to the database and loads it the first
+        time it needs every person and room
+        """
+        self.materialize()
+        from sqlalchemy import create_engine
+        from system.storage import sqlite_engine, upgrade_schema, fetch_rows
+        if lazy and os.path.exists(db_name) and not self.people_by_id and \
+                not self.rooms_by_name:
+            engine = sqlite_engine(db_name)
+            with engine.begin() as connection:
+                upgrade_schema(connection)
+            engine.dispose()
+            self.lazy_db = os.path.abspath(db_name)
+            self.output.write(
+                "\tThe database {} has been attached".format(db_name),
+                "green")
 
-            cprint("\tDone.", "green")
+        # Open db if exists
+        elif os.path.exists(db_name):
+            fresh = not self.people_by_id and not self.rooms_by_name
+            if not fresh:
+                self.synced_db = None
+                self.room_ids = {}
+            engine = create_engine("sqlite:///{}".format(db_name))
+            with engine.begin() as connection:
+                upgrade_schema(connection)
+                people_rows = fetch_rows(
+                    connection, "SELECT person_id, names, person_type "
+                    "FROM people ORDER BY person_id")
+                room_rows = fetch_rows(
+                    connection, "SELECT id, room_name, room_type, "
+                    "room_capacity FROM rooms ORDER BY id")
+                allocation_rows = fetch_rows(
+                    connection, "SELECT person_id, room_id FROM allocations "
+                    "ORDER BY id")
+                unallocated_rows = fetch_rows(
+                    connection, "SELECT person_id, without_room "
+                    "FROM unallocated ORDER BY id")
+                sequence_rows = fetch_rows(
+                    connection, "SELECT next_value FROM sequences "
+                    "WHERE name = 'person_id'")
+            engine.dispose()
+
+            # Ids that were handed out before must not be handed out again
+            if sequence_rows and sequence_rows[0][0]:
+                self.person_ids.advance(sequence_rows[0][0] - 1)
+            if people_rows:
+                self.person_ids.advance(people_rows[-1][0])
+
+            # Creating this many objects would set off the garbage
+            # collector again and again although none of them is
+            # garbage
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                # Get people, keyed by their id in the database
+                people_by_row = {}
+                if people_rows:
+                    self.output.write(
+                        "\tLoading people from the database...", "green")
+                    people_by_id = self.people_by_id
+                    for person_id, names, person_type in people_rows:
+                        current_person = people_by_id.get(person_id)
+                        if current_person is not None:
+                            if current_person.person_name == names and \
+                                    current_person.person_type == person_type:
+                                # The same person was loaded before
+                                people_by_row[person_id] = current_person
+                                continue
+                            # Someone else has the id in this dojo
+                            row_id, person_id = \
+                                person_id, self.person_ids.next_id()
+                        else:
+                            row_id = person_id
+                        if person_type == "fellow":
+                            # Recreate the fellow
+                            old_person = Fellow(names, person_id=person_id)
+                            category = self.people["fellows"]
+                        elif person_type == "staff":
+                            # Recreate the staff
+                            old_person = Staff(names, person_id=person_id)
+                            category = self.people["staff"]
+                        else:
+                            continue
+                        people_by_row[row_id] = old_person
+                        if fresh:
+                            # Nothing is tracked as changed in a fresh load so
+                            # the registry is filled directly
+                            category.append(old_person)
+                            people_by_id[person_id] = old_person
+                        else:
+                            self.register_person(old_person)
 
+                    self.output.write(
+                        "\tAll the people have been loaded from the database",
+                        "green")
+                else:
+                    self.output.write("\tNo people in the database", "red")
+
+                # Group the occupants of each room in the order they were
+                # allocated
+                members_by_room = {}
+                for person_id, room_id in allocation_rows:
+                    person = people_by_row.get(person_id)
+                    if person is not None:
+                        members_by_room.setdefault(room_id, []).append(person)
+
+                # Get rooms
+                if room_rows:
+                    self.output.write(
+                        "\tLoading rooms from the database...", "green")
+                    for room_id, room_name, room_type, room_capacity \
+                            in room_rows:
+                        if room_type not in ROOM_CLASSES:
+                            continue
+                        members = members_by_room.get(room_id, [])
+                        current_room = self.rooms_by_name.get(room_name)
+                        if current_room is None:
+                            # Recreate the room and its occupants
+                            old_room = ROOM_CLASSES[room_type](
+                                room_name, room_capacity=room_capacity)
+                            if not fresh:
+                                self.register_room(old_room)
+                                for person in members:
+                                    self.add_occupant(old_room, person)
+                                continue
+
+                            self.place_loaded_room(old_room, members)
+                            self.room_ids[old_room] = room_id
+                            continue
+
+                        # Merge the occupants into the room that already exists
+                        without_room = ROOM_STATUSES[room_type][1]
+                        for person in members:
+                            if person in current_room.room_occupants:
+                                continue
+                            if len(current_room.room_occupants) < \
+                                    current_room.room_capacity:
+                                self.add_occupant(current_room, person)
+                            else:
+                                self.people[without_room].append(person)
+
+                    self.output.write(
+                        "\tAll the rooms have been loaded from the database",
+                        "green")
+                else:
+                    self.output.write("\tNo rooms in the database", "red")
+
+                # Get unallocated
+                if unallocated_rows:
+                    self.output.write(
+                        "\tUpdating list of unallocated people...", "green")
+                    for person_id, without_room in unallocated_rows:
+                        member = people_by_row.get(person_id)
+                        if member is None or without_room not in ROOM_STATUSES:
+                            continue
+                        if without_room not in self.person_rooms.get(
+                                member.person_id, {}):
+                            self.people[ROOM_STATUSES[without_room][1]].append(
+                                member)
+
+                    self.output.write(
+                        "\tList of unallocated people has been updated",
+                        "green")
+                else:
+                    self.output.write(
+                        "\tThere are no unallocated people in the database",
+                        "green")
+            finally:
+                if collecting:
+                    gc.enable()
+
+            if fresh:
+                self.synced_db = os.path.abspath(db_name)
+                self.changes.clear()
+                if self.journal is not None:
+                    self.journal.track_all(self)
         else:
-            cprint("There are no people who are unallocated \
-            in the dojo to be saved.", "yellow")
+            self.output.write(
+                "\tThe database {} does not exist.".format(db_name), "red")
 
-    def load_state(self, db_name="dojo.db"):
-        """Method to load the data stored in the database"""
-        # Open db if exists
-        if os.path.exists(db_name):
-            engine = create_engine("sqlite:///{}".format(db_name))
+    def place_loaded_room(self, room, members):
+        """
+        Method to add a room that is being loaded into an empty dojo with
+        its occupants. The indexes are filled directly and nothing is
+        tracked as changed
+        """
+        room.room_occupants = members
+        if room.room_type == "office":
+            self.rooms["offices"].append(room)
+        else:
+            self.rooms["livingspaces"].append(room)
+        self.rooms_by_name[room.room_name] = room
+        self.vacancies[room.room_type].update(room)
+        if self.occupancy_arrays is not None:
+            self.occupancy_arrays.update(room)
+        self.people[ROOM_STATUSES[room.room_type][0]].extend(members)
+        for person in members:
+            self.person_rooms.setdefault(
+                person.person_id, {})[room.room_type] = room
+
+    @materialized
+    def snapshot(self, filename="dojo.snapshot"):
+        """
+        Method to write the people and rooms to a binary snapshot file,
+        which restores much faster than the database
+        """
+        write_snapshot(self, filename)
+        self.output.write(
+            "The dojo has been saved to the snapshot {}".format(filename),
+            "green")
 
-            # Create a session
-            Session = sessionmaker(bind=engine)
-            session = Session()
-
-            # Get people
-            if session.query(People):
-                all_fellows = [fellow.person_id for fellow
-                               in self.people["fellows"]]
-                all_staff = [staff.person_id for staff in self.people["staff"]]
-                cprint("\tLoading people from the database...", "green")
-                for person in session.query(People):
-                    if person.person_type == "fellow" and \
-                                    person.person_id not in all_fellows:
-                        # Recreate the fellow
-                        old_fellow = Fellow(person.names, person_type="fellow")
-                        old_fellow.person_id = person.person_id
-                        self.people["fellows"].append(old_fellow)
-
-                    elif person.person_type == "staff" \
-                            and person.person_id not in all_staff:
-                        # Recreate the staff
-                        old_staff = Staff(person.names, person_type="staff")
-                        old_staff.person_id = person.person_id
-                        self.people["staff"].append(old_staff)
-
-                cprint("\tAll the people have been loaded from the database",
-                       "green")
+    @journaled
+    def restore(self, filename="dojo.snapshot"):
+        """
+        Method to rebuild an empty dojo from a snapshot file. The file is
+        memory-mapped and its arrays are read whole, then the people, rooms
+        and indexes are rebuilt directly without tracking any change
+        """
+        self.materialize()
+        if self.people_by_id or self.rooms_by_name:
+            self.output.write(
+                "A snapshot can only be restored into an empty dojo", "red")
+            return
+        if not os.path.exists(filename):
+            self.output.write(
+                "\tThe snapshot {} does not exist.".format(filename), "red")
+            return
+        snapshot = read_snapshot(filename)
+        # Creating this many objects would set off the garbage collector
+        # again and again although none of them is garbage
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self.load_snapshot(snapshot)
+        finally:
+            if collecting:
+                gc.enable()
+        self.synced_db = None
+        self.room_ids = {}
+        self.changes.clear()
+        if self.journal is not None:
+            self.journal.track_all(self)
+        self.output.write(
+            "The dojo has been restored from the snapshot {}".format(
+                filename), "green")
+
+    def load_snapshot(self, snapshot):
+        """
+        Method to add the people and rooms of a snapshot to an empty dojo.
+        The people are created in bulk and the lists are filled from their
+        flags, in the order the snapshot kept when it has one
+        """
+        self.person_ids.advance(snapshot.next_person_id - 1)
+        classes = (Fellow, Staff)
+        people = [classes[flags & STAFF](names, person_id=person_id)
+                  for person_id, names, flags in zip(snapshot.person_ids,
+                                                     snapshot.person_names,
+                                                     snapshot.person_flags)]
+        flagged = list(zip(people, snapshot.person_flags))
+        self.people_by_id.update(zip(snapshot.person_ids, people))
+        self.people["fellows"].extend(
+            person for person, flags in flagged if not flags & STAFF)
+        self.people["staff"].extend(
+            person for person, flags in flagged if flags & STAFF)
+        for status, flag, positions in [
+                ("without_offices", WITHOUT_OFFICE, snapshot.without_offices),
+                ("without_livingspaces", WITHOUT_LIVINGSPACE,
+                 snapshot.without_livingspaces)]:
+            if positions is None:
+                self.people[status].extend(
+                    person for person, flags in flagged if flags & flag)
             else:
-                cprint("\tNo people in the database", "red")
-
-            # Get rooms
-            if session.query(Rooms):
-                current_offices = [room.room_name for room in
-                                   self.rooms["offices"]]
-                current_livingspaces = [room.room_name for room in
-                                        self.rooms["livingspaces"]]
-                cprint("\tLoading rooms from the database...", "green")
-                for room in session.query(Rooms):
-                    if room.room_type == "office" and room.room_name not in \
-                            current_offices:
-                        # Create the offices
-                        old_office = Office(room.room_name,
-                                            room_capacity=room.room_capacity)
-                        # Use the ids to populate the occupants from people
-                        members = [int(person_id) for person_id in
-                                   room.room_occupants.split(",") if person_id]
-                        if len(members) > 0:
-                            for member in members:
-                                person = self.get_person_object(member)
-                                old_office.room_occupants.append(person)
-
-                        self.rooms["offices"].append(old_office)
-
-                    elif room.room_type == "office" and room.room_name in \
-                            current_offices:
-                        current_room = self.get_room_object(room.room_name)
-                        members = [int(person_id) for person_id in
-                                   room.room_occupants.split(",") if person_id]
-                        if len(members) > 0:
-                            for member in members:
-                                person = self.get_person_object(member)
-                                if len(current_room.room_occupants) < \
-                                        current_room.room_capacity and person \
-                                        not in current_room.room_occupants:
-                                    current_room.room_occupants.append(person)
-                                elif len(current_room.room_occupants) >= \
-                                        current_room.room_capacity and person \
-                                        not in current_room.room_occupants:
-                                    self.people["without_offices"].\
-                                        append(person)
-
-                    elif room.room_type == "livingspace" and room.room_name \
-                            not in current_livingspaces:
-                        # Create the offices
-                        old_livingspace = LivingSpace(
-                            room.room_name, room_capacity=room.room_capacity)
-                        # Use the ids to populate the occupants from people
-                        members = [int(person_id) for person_id in
-                                   room.room_occupants.split(",") if person_id]
-                        if len(members) > 0:
-                            for member in members:
-                                person = self.get_person_object(member)
-                                old_livingspace.room_occupants.append(person)
-
-                        self.rooms["livingspaces"].append(old_livingspace)
-
-                    elif room.room_type == "livingspace" and room.room_name in\
-                            current_livingspaces:
-                        current_room = self.get_room_object(room.room_name)
-                        members = [int(person_id) for person_id in
-                                   room.room_occupants.split(",") if person_id]
-                        if len(members) > 0:
-                            for member in members:
-                                person = self.get_person_object(member)
-                                if len(current_room.room_occupants) < \
-                                        current_room.room_capacity and person \
-                                        not in current_room.room_occupants:
-                                    current_room.room_occupants.append(person)
-                                elif len(current_room.room_occupants) >= \
-                                        current_room.room_capacity and person \
-                                        not in current_room.room_occupants:
-                                    self.people["without_livingspaces"].\
-                                        append(person)
-
-                cprint("\tAll the rooms have been loaded from the database",
-                       "green")
+                self.people[status].extend(
+                    people[position] for position in positions)
+
+        occupants, offsets = snapshot.occupants, snapshot.occupant_offsets
+        for index, (room_name, room_type, room_capacity) in enumerate(zip(
+                snapshot.room_names, snapshot.room_types,
+                snapshot.room_capacities)):
+            self.place_loaded_room(
+                ROOM_CLASSES[room_type](room_name,
+                                        room_capacity=room_capacity),
+                [people[position] for position in
+                 occupants[offsets[index]:offsets[index + 1]]])
+
+    def open_journal(self, filename="dojo.journal", db_name="dojo.db",
+                     checkpoint_every=1000, sync_every=64,
+                     sync_interval=1.0):
+        """
+        Method to recover the dojo from its last checkpoint in db_name and
+        the journal, then append every later change to the journal. After
+        checkpoint_every operations the dojo is saved to db_name and the
+        journal is emptied. sync_every and sync_interval say how often the
+        journal is synced to disk
+        """
+        self.materialize()
+        if self.journal is not None:
+            self.close_journal()
+        journal = Journal(filename, sync_every, sync_interval)
+        records = journal.read()
+        if os.path.exists(db_name) and not self.people_by_id and \
+                not self.rooms_by_name:
+            output, self.output = self.output, NullOutput()
+            try:
+                self.load_state(db_name)
+            finally:
+                self.output = output
+        for record in records:
+            self.apply_change(record)
+
+        self.journal = journal
+        self.journal_db = db_name
+        self.checkpoint_every = checkpoint_every
+        self.changes.followers.append(journal)
+        journal.open()
+        if records:
+            self.output.write(
+                "\t{0} operations have been recovered from the journal {1}"
+                .format(len(records), filename), "green")
+            self.checkpoint()
+
+    def apply_change(self, record):
+        """
+        Method to bring the people and rooms named in a journal record to
+        the state it holds, through the usual helpers
+        """
+        people, rooms, removed_people, removed_rooms = record
+        for person_id, names, person_type, _ in people:
+            person = self.people_by_id.get(person_id)
+            if person is None:
+                if person_type == "staff":
+                    person = Staff(names, person_id=person_id)
+                else:
+                    person = Fellow(names, person_id=person_id)
+                self.register_person(person)
+                self.person_ids.advance(person_id)
+            elif person.person_name != names:
+                person.person_name = names
+                self.changes.person_changed(person)
+
+        for room_name in removed_rooms:
+            room = self.rooms_by_name.get(room_name)
+            if room is not None:
+                for person in list(room.room_occupants):
+                    self.remove_occupant(room, person)
+                self.unregister_room(room)
+
+        for old_name, room_name, room_type, room_capacity, occupant_ids \
+                in rooms:
+            room = self.rooms_by_name.get(old_name) or \
+                self.rooms_by_name.get(room_name)
+            if room is None:
+                room = ROOM_CLASSES[room_type](room_name,
+                                               room_capacity=room_capacity)
+                self.register_room(room)
+            elif room.room_name != room_name:
+                self.changes.room_changed(room)
+                del self.rooms_by_name[room.room_name]
+                room.room_name = room_name
+                self.rooms_by_name[room_name] = room
+            members = [self.people_by_id[person_id]
+                       for person_id in occupant_ids
+                       if person_id in self.people_by_id]
+            for person in list(room.room_occupants):
+                if person not in members:
+                    self.remove_occupant(room, person)
+            for person in members:
+                if person in room.room_occupants:
+                    continue
+                current_room = self.person_rooms.get(
+                    person.person_id, {}).get(room_type)
+                if current_room is not None:
+                    self.remove_occupant(current_room, person)
+                self.add_occupant(room, person)
+
+        for person_id, _, _, flags in people:
+            person = self.people_by_id[person_id]
+            for room_type, flag in [("office", WITHOUT_OFFICE),
+                                    ("livingspace", WITHOUT_LIVINGSPACE)]:
+                without_room = self.people[ROOM_STATUSES[room_type][1]]
+                if flags & flag:
+                    without_room.append(person)
+                else:
+                    without_room.discard(person)
 
-            else:
-                cprint("\tNo rooms in the database", "red")
-
-            # Get unallocated
-            if session.query(Unallocated):
-                without_offices = [person.person_id for person in
-                                   self.people["without_offices"]]
-                without_livingspaces = [person.person_id for person in
-                                        self.people["without_livingspaces"]]
-                cprint("\tUpdating list of unallocated people...", "green")
-                for person in session.query(Unallocated):
-                    member = self.get_person_object(person.person_id)
-                    if person.without_room == "office" and \
-                            person.person_id not in without_offices:
-                        if member not in self.people["without_offices"]:
-                            self.people["without_offices"].append(member)
-                    elif person.without_room == "livingspace" \
-                            and person.person_id not in without_livingspaces:
-                        if member not in self.people["without_livingspaces"]:
-                            self.people["without_livingspaces"].append(member)
-
-                cprint("\tList of unallocated people has been updated",
-                       "green")
-            else:
-                cprint("\tThere are no unallocated people in the database",
-                       "green")
-        else:
-            cprint("\tThe database {} does not exist.".format(db_name), "red")
+        for person_id in removed_people:
+            person = self.people_by_id.get(person_id)
+            if person is not None:
+                for room in list(self.person_rooms.get(person_id,
+                                                       {}).values()):
+                    self.remove_occupant(room, person)
+                self.unregister_person(person)
+
+    def commit_journal(self):
+        """
+        Method to append what changed to the journal and save a checkpoint
+        when enough operations have been appended since the last one
+        """
+        with self.index_lock:
+            self.journal.commit(self)
+            if self.checkpoint_on_commit and self.checkpoint_due():
+                self.checkpoint()
+
+    def checkpoint_due(self):
+        """
+        Method to return whether enough operations have been journaled
+        since the last checkpoint to save another one
+        """
+        return self.journal is not None and \
+            self.journal.operations >= self.checkpoint_every
+
+    def checkpoint(self):
+        """
+        Method to save the dojo to the database of the journal, then empty
+        the journal. Only what changed since the last checkpoint is written
+        """
+        self.journal.sync()
+        output, self.output = self.output, NullOutput()
+        try:
+            self.save_state(self.journal_db, incremental=True)
+        finally:
+            self.output = output
+        self.journal.truncate()
 
+    def close_journal(self):
+        """
+        Method to save a last checkpoint and stop journaling changes
+        """
+        if self.journal is None:
+            return
+        self.journal.commit(self)
+        self.checkpoint()
+        self.journal.close()
+        self.changes.followers.remove(self.journal)
+        self.journal = None
+
+    def materialize(self):
+        """
+        Method to load the database that the dojo is attached to lazily, if
+        any, so that its people and rooms can be changed
+        """
+        if self.lazy_db is None:
+            return
+        db_name, self.lazy_db = self.lazy_db, None
+        output, self.output = self.output, NullOutput()
+        try:
+            self.load_state(db_name)
+        finally:
+            self.output = output
+
+    @journaled
+    @materialized
     def delete_room(self, room_name):
         """
         Method to delete a room from the system and add members
         to list of unallocated
         """
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-        if room_name in [room.room_name for room in all_rooms]:
-            for room in all_rooms:
-                if room.room_name == room_name and room.room_type == "office":
-                    for member in room.room_occupants:
-                        self.people["without_offices"].append(member)
-                    self.rooms["offices"].pop(
-                        self.rooms["offices"].index(room))
-                    cprint("The office {} has been deleted successfully. All"
-                           "members have been added to the list of unallocated"
-                           "members".format(room_name), "green")
-                elif room.room_name == room_name and \
-                        room.room_type == "livingspace":
-                    for member in room.room_occupants:
-                        self.people["without_livingspaces"].append(member)
-                    self.rooms["livingspaces"].pop(
-                        self.rooms["livingspaces"].index(room))
-                    cprint("The livingspace {} has been deleted successfully."
-                           "All members have been added to the list of "
-                           "unallocated members".format(room_name), "green")
+        room = self.rooms_by_name.get(room_name)
+        if room is not None:
+            if room.room_type == "office":
+                for member in list(room.room_occupants):
+                    self.remove_occupant(room, member)
+                self.unregister_room(room)
+                self.output.write(
+                    "The office {} has been deleted successfully. All"
+                    "members have been added to the list of unallocated"
+                    "members".format(room_name), "green")
+            elif room.room_type == "livingspace":
+                for member in list(room.room_occupants):
+                    self.remove_occupant(room, member)
+                self.unregister_room(room)
+                self.output.write(
+                    "The livingspace {} has been deleted successfully."
+                    "All members have been added to the list of "
+                    "unallocated members".format(room_name), "green")
+            return room
 
         else:
-            cprint("Sorry. That room does not exist. Please try again.", "red")
+            self.output.write(
+                "Sorry. That room does not exist. Please try again.", "red")
 
+    @journaled
+    @materialized
     def remove_person(self, person_id):
         """
         Method to remove a person from the system
         """
         person = self.get_person_object(int(person_id))
         if person:
-            if person in self.people["without_livingspaces"]:
-                self.people["without_livingspaces"].pop(
-                    self.people["without_livingspaces"].index(person))
-                cprint("{} has been removed from the unallocated list"
-                       .format(person.person_name), "green")
-            elif person in self.people["without_offices"]:
-                self.people["without_offices"].pop(
-                    self.people["without_offices"].index(person))
-                cprint("{} has been removed from the unallocated list".
-                       format(person.person_name), "green")
-            all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-            for room in all_rooms:
-                if person in room.room_occupants:
-                    room.room_occupants.pop(room.room_occupants.index(person))
-                    cprint("{0} has been removed from {1}".format(
-                        person.person_name, room.room_name), "green")
-
-            if person in self.people["fellows"]:
-                self.people["fellows"].pop(
-                    self.people["fellows"].index(person))
-                cprint("{} has been successfully removed from the Dojo".
-                       format(person.person_name), "green")
-            elif person in self.people["staff"]:
-                self.people["staff"].pop(self.people["staff"].index(person))
-                cprint("{} has been successfully removed from the Dojo".
-                       format(person.person_name), "green")
+            if person in self.people["without_livingspaces"] or \
+                    person in self.people["without_offices"]:
+                self.output.write(
+                    "{} has been removed from the unallocated list"
+                    .format(person.person_name), "green")
+            person_rooms = self.person_rooms.get(person.person_id, {})
+            for room in list(person_rooms.values()):
+                self.remove_occupant(room, person)
+                self.output.write("{0} has been removed from {1}".format(
+                    person.person_name, room.room_name), "green")
+
+            self.unregister_person(person)
+            self.output.write("{} has been successfully removed from the Dojo".
+                              format(person.person_name), "green")
+            return person
         else:
-            cprint("Sorry. The person with id: {} could not be found."
-                   "Please check and try again".format(person_id), "red")
+            self.output.write(
+                "Sorry. The person with id: {} could not be found."
+                "Please check and try again".format(person_id), "red")
 
+    @journaled
+    @materialized
     def rename_room(self, room_name, new_room_name):
         """
         Method to change the name of a room in the system
         """
-        all_rooms = self.rooms["offices"] + self.rooms["livingspaces"]
-        if room_name in [room.room_name for room in all_rooms]:
-            for room in all_rooms:
-                if room.room_name == room_name:
-                    room.room_name = new_room_name
-                    cprint("{0} has been successfully renamed to {1}".
-                           format(room_name, new_room_name))
+        room = self.rooms_by_name.get(room_name)
+        if room is not None and new_room_name in self.rooms_by_name:
+            self.output.write(
+                "Sorry. A room called {} already exists. Please try again"
+                .format(new_room_name), "red")
+        elif room is not None:
+            with self.index_lock:
+                # Followers of the changes see the room before it is renamed
+                self.changes.room_changed(room)
+                del self.rooms_by_name[room_name]
+                room.room_name = new_room_name
+                self.rooms_by_name[new_room_name] = room
+                self.changes.room_changed(room)
+            self.output.write("{0} has been successfully renamed to {1}".
+                              format(room_name, new_room_name))
+            return room
         else:
-            cprint("Sorry. {} could not be found. Try again".format(room_name),
-                   "red")
+            self.output.write(
+                "Sorry. {} could not be found. Try again".format(room_name),
+                "red")
 
+    @journaled
+    @materialized
     def rename_person(self, person_id, new_names):
         """
         Method to change the name of a person in the system
@@ -881,9 +1779,13 @@ class Dojo(object):
         person = self.get_person_object(int(person_id))
         if person:
             old_person_name = person.person_name
-            person.person_name = new_names
-            cprint("{0}'s name has been changed to {1}".
-                   format(old_person_name, new_names), "green")
+            with self.index_lock:
+                person.person_name = new_names
+                self.changes.person_changed(person)
+            self.output.write("{0}'s name has been changed to {1}".
+                              format(old_person_name, new_names), "green")
+            return person
         else:
-            cprint("Sorry. The person with id: {} could not be found."
-                   "Please check and try again".format(person_id), "red")
+            self.output.write(
+                "Sorry. The person with id: {} could not be found."
+                "Please check and try again".format(person_id), "red")
@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import os
+import struct
+from collections import OrderedDict
+
+from system.reports import write_lines
+
+# The columns of each table that can be exported with the type of each
+TABLES = OrderedDict([
+    ("people", (("person_id", "int"), ("names", "str"),
+                ("person_type", "str"))),
+    ("rooms", (("room_name", "str"), ("room_type", "str"),
+               ("room_capacity", "int"))),
+    ("allocations", (("person_id", "int"), ("room_name", "str"),
+                     ("kind", "str")))
+])
+
+# The export format used for each file extension
+EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".col": "columnar"
+}
+
+# The columnar format starts with MAGIC and the version of the layout
+MAGIC = b"DOJC"
+VERSION = 1
+
+# The number of rows written together as one group of columns
+ROW_GROUP_SIZE = 4096
+
+# The type code of each column type in the columnar format
+TYPE_CODES = {"int": b"q", "str": b"s"}
+
+
+def table_rows(dojo, table):
+    """
+    Function to generate the rows of a table of the dojo one at a time as
+    tuples in the order of its columns
+    """
+    if table == "people":
+        for person in dojo.people_by_id.values():
+            yield person.person_id, person.person_name, person.person_type
+    elif table == "rooms":
+        for room in dojo.rooms_by_name.values():
+            yield room.room_name, room.room_type, room.room_capacity
+    elif table == "allocations":
+        for person_id, person_rooms in dojo.person_rooms.items():
+            for kind in ["office", "livingspace"]:
+                if kind in person_rooms:
+                    yield person_id, person_rooms[kind].room_name, kind
+    else:
+        raise ValueError("Invalid table: {}".format(table))
+
+
+def write_csv(columns, rows, stream):
+    """
+    Function to write rows to a text stream as CSV with a header line
+    """
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def write_jsonl(columns, rows, stream):
+    """
+    Function to write rows to a text stream as JSON Lines, one object per
+    row
+    """
+    write_lines((json.dumps(OrderedDict(zip(columns, row))) for row in rows),
+                stream)
+
+
+def pack_column(column_type, values):
+    """
+    Function to return the bytes of a column of a row group. Integers are
+    stored as little-endian 64 bit numbers and strings as their lengths
+    followed by their UTF-8 bytes
+    """
+    if column_type == "int":
+        return struct.pack("<{}q".format(len(values)), *values)
+    encoded = [value.encode("utf-8") for value in values]
+    return struct.pack("<{}I".format(len(encoded)),
+                       *[len(value) for value in encoded]) + b"".join(encoded)
+
+
+def unpack_column(column_type, count, data):
+    """
+    Function to return the values of a column of a row group from its bytes
+    """
+    if column_type == "int":
+        return list(struct.unpack("<{}q".format(count), data))
+    lengths = struct.unpack_from("<{}I".format(count), data)
+    values, offset = [], 4 * count
+    for length in lengths:
+        values.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return values
+
+
+def write_columnar(columns, types, rows, stream,
+                   row_group_size=ROW_GROUP_SIZE):
+    """
+    Function to write rows to a binary stream in the columnar format. After
+    a header naming the columns, the rows are written in groups of up to
+    row_group_size rows. Each group has its number of rows and then every
+    column in turn, prefixed with its size so that readers can skip the
+    columns they do not need. A group of no rows ends the file
+    """
+    header = [MAGIC, struct.pack("<HH", VERSION, len(columns))]
+    for column, column_type in zip(columns, types):
+        name = column.encode("utf-8")
+        header.append(TYPE_CODES[column_type] +
+                      struct.pack("<H", len(name)) + name)
+    stream.write(b"".join(header))
+
+    def write_group(group):
+        parts = [struct.pack("<I", len(group))]
+        for index, column_type in enumerate(types):
+            data = pack_column(column_type, [row[index] for row in group])
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+        stream.write(b"".join(parts))
+
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) == row_group_size:
+            write_group(group)
+            group = []
+    if group:
+        write_group(group)
+    stream.write(struct.pack("<I", 0))
+
+
+def read_exact(stream, size):
+    """
+    Function to read exactly size bytes from a binary stream
+    """
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated columnar file")
+    return data
+
+
+def read_columnar(stream, columns=None):
+    """
+    Function to generate the rows of a columnar file as tuples. With
+    columns, only those columns are decoded and returned, in that order
+    """
+    if read_exact(stream, len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar file")
+    version, count = struct.unpack("<HH", read_exact(stream, 4))
+    if version != VERSION:
+        raise ValueError("Unsupported columnar version: {}".format(version))
+    names, types = [], []
+    codes = {code: column_type for column_type, code in TYPE_CODES.items()}
+    for _ in range(count):
+        code = read_exact(stream, 1)
+        length, = struct.unpack("<H", read_exact(stream, 2))
+        names.append(read_exact(stream, length).decode("utf-8"))
+        types.append(codes[code])
+    wanted = [names.index(column) for column in columns or names]
+
+    while True:
+        rows, = struct.unpack("<I", read_exact(stream, 4))
+        if rows == 0:
+            return
+        values = {}
+        for index, column_type in enumerate(types):
+            size, = struct.unpack("<I", read_exact(stream, 4))
+            if index in wanted:
+                values[index] = unpack_column(column_type, rows,
+                                              read_exact(stream, size))
+            else:
+                stream.seek(size, io.SEEK_CUR)
+        for row in zip(*[values[index] for index in wanted]):
+            yield row
+
+
+WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl
+}
+
+
+def export_format(filename):
+    """
+    Function to return the export format that suits the extension of a
+    file name
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError("Unknown export file extension: {}".format(
+            extension))
+    return EXTENSIONS[extension]
+
+
+def export_table(rows, table, target, format_name):
+    """
+    Function to stream the rows of a table to target, which is a file name
+    or a file-like object opened in text mode for csv and jsonl or in
+    binary mode for columnar
+    """
+    if table not in TABLES:
+        raise ValueError("Invalid table: {}".format(table))
+    if format_name not in WRITERS and format_name != "columnar":
+        raise ValueError("Invalid export format: {}".format(format_name))
+    columns = [column for column, _ in TABLES[table]]
+    types = [column_type for _, column_type in TABLES[table]]
+
+    if not hasattr(target, "write"):
+        if format_name == "columnar":
+            with io.open(target, "wb") as stream:
+                return export_table(rows, table, stream, format_name)
+        with io.open(target, "w", encoding="utf-8", newline="") as stream:
+            return export_table(rows, table, stream, format_name)
+
+    if format_name == "columnar":
+        write_columnar(columns, types, rows, target)
+    else:
+        WRITERS[format_name](columns, rows, target)
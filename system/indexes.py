@@ -0,0 +1,208 @@
+import random
+from collections import OrderedDict
+
+from system.allocation import STRATEGIES
+
+
+class VacancyIndex(object):
+    """
+    Class to keep track of the rooms of one type that still have vacant
+    spaces so that a random vacant room can be picked in constant time. The
+    allocation strategies that have been used are kept up to date as well
+    """
+    def __init__(self):
+        self.rooms = []
+        self.positions = {}
+        self.strategies = {}
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, room):
+        return room in self.positions
+
+    def add(self, room):
+        """
+        Method to add a room to the index if it is not already in it
+        """
+        if room not in self.positions:
+            self.positions[room] = len(self.rooms)
+            self.rooms.append(room)
+
+    def discard(self, room):
+        """
+        Method to remove a room from the index. The last room takes its slot
+        so that no other room has to move
+        """
+        for strategy in self.strategies.values():
+            strategy.discard(room)
+        position = self.positions.pop(room, None)
+        if position is None:
+            return
+        last_room = self.rooms.pop()
+        if last_room is not room:
+            self.rooms[position] = last_room
+            self.positions[last_room] = position
+
+    def update(self, room):
+        """
+        Method to add or remove a room depending on whether it has a vacancy
+        """
+        if len(room.room_occupants) < room.room_capacity:
+            self.add(room)
+            for strategy in self.strategies.values():
+                strategy.update(room)
+        else:
+            self.discard(room)
+
+    def strategy(self, name):
+        """
+        Method to return the allocation strategy with the given name, which
+        is built from the vacant rooms the first time it is asked for
+        """
+        if name not in self.strategies:
+            if name not in STRATEGIES:
+                raise ValueError("Invalid allocation strategy: {}".format(
+                    name))
+            self.strategies[name] = STRATEGIES[name](self)
+        return self.strategies[name]
+
+    def choice(self):
+        """
+        Method to return a random room with a vacancy or None if there is none
+        """
+        if self.rooms:
+            return random.choice(self.rooms)
+
+
+class OrderedSet(object):
+    """
+    Class to hold people in the order they were added while keeping
+    membership tests, additions and removals constant time. It can be used
+    wherever the plain lists of people used to be
+    """
+    def __init__(self, items=()):
+        self.items = OrderedDict()
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __getitem__(self, index):
+        return list(self.items)[index]
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}".format(list(self))
+
+    def append(self, item):
+        """
+        Method to add an item at the end if it is not already present
+        """
+        self.items[item] = None
+
+    def extend(self, items):
+        """
+        Method to add items at the end, skipping those already present
+        """
+        self.items.update(OrderedDict.fromkeys(items))
+
+    def remove(self, item):
+        """
+        Method to remove an item, raising a ValueError if it is missing
+        """
+        try:
+            del self.items[item]
+        except KeyError:
+            raise ValueError("{} is not in the set".format(item))
+
+    def discard(self, item):
+        """
+        Method to remove an item if it is present
+        """
+        self.items.pop(item, None)
+
+    def index(self, item):
+        """
+        Method to return the position of an item
+        """
+        return list(self.items).index(item)
+
+    def pop(self, index=-1):
+        """
+        Method to remove and return the item at a position
+        """
+        item = self[index]
+        del self.items[item]
+        return item
+
+
+class ChangeTracker(object):
+    """
+    Class to remember the people and rooms that changed since the dojo was
+    last saved so that only they have to be written again. Every change is
+    also passed on to the followers, such as a journal
+    """
+    def __init__(self):
+        self.followers = []
+        self.clear()
+
+    def __len__(self):
+        return len(self.people) + len(self.rooms) + \
+            len(self.removed_people) + len(self.removed_rooms)
+
+    def clear(self):
+        """
+        Method to forget every change
+        """
+        self.people = set()
+        self.rooms = set()
+        self.removed_people = set()
+        self.removed_rooms = set()
+
+    def person_changed(self, person):
+        self.people.add(person)
+        for follower in self.followers:
+            follower.person_changed(person)
+
+    def person_removed(self, person):
+        self.people.discard(person)
+        self.removed_people.add(person.person_id)
+        for follower in self.followers:
+            follower.person_removed(person)
+
+    def room_changed(self, room):
+        self.rooms.add(room)
+        for follower in self.followers:
+            follower.room_changed(room)
+
+    def room_removed(self, room, room_id=None):
+        """
+        Method to forget the changes to a room and remember its saved row id,
+        if it has one, for deletion
+        """
+        self.rooms.discard(room)
+        if room_id is not None:
+            self.removed_rooms.add(room_id)
+        for follower in self.followers:
+            follower.room_removed(room, room_id)
@@ -0,0 +1,69 @@
+def parse_person(line):
+    """
+    Function to turn a line of an input file into a record of
+    (first_name, last_name, person_type, wants_accommodation).
+    Raises a ValueError if the line is not a valid person
+    """
+    fields = line.split()
+    if len(fields) in (3, 4):
+        person_type = fields[2].lower()
+        if person_type == "fellow":
+            return fields[0], fields[1], person_type, len(fields) == 4
+        elif person_type == "staff" and len(fields) == 3:
+            return fields[0], fields[1], person_type, False
+    raise ValueError("Invalid person: {}".format(line.strip()))
+
+
+def read_people(lines, chunk_size, on_error=None):
+    """
+    Function to parse lines lazily and yield the people in them as lists of
+    at most chunk_size records. Blank lines are skipped and the line number
+    and text of every invalid line are passed to on_error
+    """
+    chunk = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append(parse_person(line))
+        except ValueError:
+            if on_error is not None:
+                on_error(line_number, line.rstrip("\n"))
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_score(value):
+    """
+    Function to turn the text of a score into an int, or a float if it is
+    not a whole number. Raises a ValueError if it is not a number
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def read_preferences(lines, on_error=None):
+    """
+    Function to parse lines of "person_id room_name score" into a dict of
+    person id to the scores they have given rooms keyed by room name. Blank
+    lines are skipped and the line number and text of every invalid line are
+    passed to on_error
+    """
+    preferences = {}
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            person_id, room_name, score = line.split()
+            preferences.setdefault(int(person_id), {})[room_name] = \
+                parse_score(score)
+        except ValueError:
+            if on_error is not None:
+                on_error(line_number, line.rstrip("\n"))
+    return preferences
@@ -0,0 +1,213 @@
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from system.snapshot import WITHOUT_OFFICE, WITHOUT_LIVINGSPACE
+
+
+class Pending(threading.local):
+    """
+    Class to hold the changes that have not been committed. Each thread
+    has its own, so a commit holds the operation of its own thread and
+    never half of an operation that another thread is making
+    """
+    def __init__(self):
+        self.people = OrderedDict()
+        self.rooms = OrderedDict()
+        self.removed_people = []
+        self.removed_rooms = []
+
+
+class Journal(object):
+    """
+    Class to keep an append-only log of the changes made to a dojo so that
+    they survive a crash. It follows the same notifications as the change
+    tracker of the dojo and each committed operation is appended as one line
+    holding the final state of what it changed:
+
+        [people, rooms, removed_people, removed_rooms]
+
+    where people are [person_id, names, person_type, flags], rooms are
+    [old_name, room_name, room_type, room_capacity, occupant_ids],
+    removed_people are person ids and removed_rooms are room names. Lines
+    hold states rather than steps so that replaying one twice is harmless.
+
+    Every record is handed to the operating system as it is appended, so
+    it survives the process being killed. The file is synced to disk after
+    sync_every operations or, on the next append, when sync_interval
+    seconds have passed since the last sync, so a crash of the machine
+    loses at most the operations of one batch. The file may be synced from
+    another thread while records are appended
+    """
+    def __init__(self, filename, sync_every=64, sync_interval=1.0):
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.stream = None
+        # Guards the file, which sync may use from another thread
+        self.lock = threading.RLock()
+        self.unsynced = 0
+        self.last_sync = time.time()
+        # The number of operations appended since the last checkpoint
+        self.operations = 0
+        self.pending = Pending()
+
+    def clear(self):
+        """
+        Method to forget the changes of this thread that have not been
+        committed
+        """
+        self.pending.__init__()
+
+    def person_changed(self, person):
+        self.pending.people[person] = None
+
+    def person_removed(self, person):
+        self.pending.people.pop(person, None)
+        self.pending.removed_people.append(person.person_id)
+
+    def room_changed(self, room):
+        # The name the room had when it first changed, to follow renames
+        self.pending.rooms.setdefault(room, room.room_name)
+
+    def room_removed(self, room, room_id=None):
+        self.pending.removed_rooms.append(
+            self.pending.rooms.pop(room, room.room_name))
+
+    def track_all(self, dojo):
+        """
+        Method to mark every person and room of a dojo as changed
+        """
+        for person in dojo.people_by_id.values():
+            self.person_changed(person)
+        for room in dojo.rooms_by_name.values():
+            self.room_changed(room)
+
+    def record(self, dojo):
+        """
+        Method to return the record of the uncommitted changes of this
+        thread and forget them, or None if nothing changed
+        """
+        pending = self.pending
+        if not (pending.people or pending.rooms or pending.removed_people or
+                pending.removed_rooms):
+            return None
+        without_offices = dojo.people["without_offices"]
+        without_livingspaces = dojo.people["without_livingspaces"]
+        people = []
+        for person in pending.people:
+            flags = 0
+            if person in without_offices:
+                flags |= WITHOUT_OFFICE
+            if person in without_livingspaces:
+                flags |= WITHOUT_LIVINGSPACE
+            people.append([person.person_id, person.person_name,
+                           person.person_type, flags])
+        rooms = [[old_name, room.room_name, room.room_type,
+                  room.room_capacity,
+                  [person.person_id for person in room.room_occupants]]
+                 for room, old_name in pending.rooms.items()]
+        record = [people, rooms, pending.removed_people,
+                  pending.removed_rooms]
+        self.clear()
+        return record
+
+    def read(self):
+        """
+        Method to return the records in the journal file. A line that was
+        cut short by a crash ends the journal and is cut off the file so
+        that new records are not appended after it
+        """
+        if not os.path.exists(self.filename):
+            return []
+        records, end = [], 0
+        with io.open(self.filename, "rb") as stream:
+            for line in stream:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line.decode("utf-8")))
+                except ValueError:
+                    break
+                end += len(line)
+        if end < os.path.getsize(self.filename):
+            with io.open(self.filename, "r+b") as stream:
+                stream.truncate(end)
+        return records
+
+    def open(self):
+        """
+        Method to open the journal file for appending
+        """
+        with self.lock:
+            if self.stream is None:
+                self.stream = io.open(self.filename, "ab")
+
+    def append(self, record):
+        """
+        Method to append a record to the journal, syncing it to disk once
+        the batch is full or old enough
+        """
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            self.open()
+            self.stream.write(line + b"\n")
+            self.stream.flush()
+            self.unsynced += 1
+            self.operations += 1
+            full = self.unsynced >= self.sync_every or \
+                time.time() - self.last_sync >= self.sync_interval
+        if full:
+            self.sync()
+
+    def commit(self, dojo):
+        """
+        Method to append the uncommitted changes of a dojo as one record
+        """
+        record = self.record(dojo)
+        if record is not None:
+            self.append(record)
+
+    def sync(self):
+        """
+        Method to write everything appended so far to disk. The file is
+        synced through a descriptor of its own, so records can be appended
+        while the disk catches up
+        """
+        with self.lock:
+            if self.stream is None:
+                descriptor = None
+            else:
+                self.stream.flush()
+                descriptor = os.dup(self.stream.fileno())
+            self.unsynced = 0
+            self.last_sync = time.time()
+        if descriptor is not None:
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def truncate(self):
+        """
+        Method to empty the journal once its changes are in the database
+        """
+        with self.lock:
+            self.close()
+            with io.open(self.filename, "wb") as stream:
+                os.fsync(stream.fileno())
+            self.operations = 0
+            self.open()
+
+    def close(self):
+        """
+        Method to sync and close the journal file
+        """
+        with self.lock:
+            if self.stream is not None:
+                self.sync()
+                self.stream.close()
+                self.stream = None
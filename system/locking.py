@@ -0,0 +1,236 @@
+import threading
+from functools import wraps
+
+
+class NoLock(object):
+    """
+    Class to stand in for the index lock of a dojo that is only used from
+    one thread
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Stripes(object):
+    """
+    Class to hold several stripes of a StripedLocks as one. The stripes are
+    taken in order so that two holders cannot wait for each other
+    """
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        taken = []
+        try:
+            for lock in self.locks:
+                lock.acquire()
+                taken.append(lock)
+        except BaseException:
+            for lock in reversed(taken):
+                lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+        return False
+
+
+class StripedLocks(object):
+    """
+    Class to lock people and rooms with a fixed number of locks. Each key
+    hashes to one of the stripes, so keys that share a stripe hold each
+    other up but no lock is ever created or freed
+    """
+    def __init__(self, stripes=64):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def holding(self, keys):
+        """
+        Method to return a context manager that holds the stripes of keys
+        """
+        indexes = sorted({hash(key) % len(self.locks) for key in keys})
+        return Stripes([self.locks[index] for index in indexes])
+
+    def holding_all(self):
+        """
+        Method to return a context manager that holds every stripe
+        """
+        return Stripes(self.locks)
+
+
+def checkpointed(method):
+    """
+    Decorator for the changes of a ThreadSafeDojo. Once the change has let
+    go of its stripes, a journal checkpoint is saved if one is due
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.checkpoint()
+    return wrapper
+
+
+class ThreadSafeDojo(object):
+    """
+    Class to use one dojo from many threads. Changes lock the stripes of
+    the people and rooms they touch, so a check such as whether a room has
+    a vacancy still holds when the change is made, and changes to other
+    people and rooms run alongside. The indexes that every change updates,
+    such as the vacancy index and the people lists, are guarded by the
+    index lock of the dojo, which is only held for short steps and always
+    taken after the stripes. Reads take the index lock so they see the
+    indexes in one piece.
+
+    Each thread journals its own changes, which no other thread can touch
+    while they are made. Checkpoints save the whole dojo, so they wait for
+    every stripe to be free to never save a change that is half done
+    """
+    def __init__(self, dojo, stripes=64):
+        self.dojo = dojo
+        self.stripes = StripedLocks(stripes)
+        dojo.index_lock = threading.RLock()
+        dojo.checkpoint_on_commit = False
+
+    def checkpoint(self):
+        """
+        Method to save a journal checkpoint of the dojo, if one is due,
+        while no change is being made
+        """
+        if not self.dojo.checkpoint_due():
+            return
+        with self.stripes.holding_all():
+            with self.dojo.index_lock:
+                if self.dojo.checkpoint_due():
+                    self.dojo.checkpoint()
+
+    def change(self, find_keys, action):
+        """
+        Method to lock the people and rooms returned by find_keys and run
+        action. The keys are looked up again once they are locked and the
+        locks are taken again if they changed meanwhile
+        """
+        index_lock = self.dojo.index_lock
+        while True:
+            with index_lock:
+                keys = find_keys()
+            with self.stripes.holding(keys):
+                with index_lock:
+                    if find_keys() != keys:
+                        continue
+                return action()
+
+    def person_keys(self, person_id, room_type=None):
+        """
+        Method to return the keys of a person and the rooms they are in, or
+        only their room of one type
+        """
+        rooms = self.dojo.person_rooms.get(person_id, {})
+        if room_type is not None:
+            rooms = {room_type: rooms[room_type]} if room_type in rooms \
+                else {}
+        return {person_id} | set(rooms.values())
+
+    def print_room(self, room_name):
+        with self.dojo.index_lock:
+            return self.dojo.print_room(room_name)
+
+    def print_vacant_rooms(self):
+        with self.dojo.index_lock:
+            return self.dojo.print_vacant_rooms()
+
+    def get_person_id(self, person_name):
+        with self.dojo.index_lock:
+            return self.dojo.get_person_id(person_name)
+
+    @checkpointed
+    def create_room(self, room_name, room_type):
+        with self.dojo.index_lock:
+            return self.dojo.create_room(room_name, room_type)
+
+    @checkpointed
+    def add_person(self, first_name, last_name, person_type,
+                   wants_accommodation=False, strategy=None):
+        """
+        Method to add a person. Their rooms may be any of the rooms, so every
+        stripe is held
+        """
+        with self.stripes.holding_all():
+            with self.dojo.index_lock:
+                return self.dojo.add_person(first_name, last_name,
+                                            person_type, wants_accommodation,
+                                            strategy)
+
+    @checkpointed
+    def allocate_person(self, person_id, room_type, strategy=None):
+        """
+        Method to allocate a person to a room picked by the strategy. The
+        person and the room are locked before the person is put in it and
+        another room is picked if it filled up meanwhile. When no room has
+        a vacancy, a space may still open before the person is marked as
+        without a room, so every stripe is held as add_person does
+        """
+        dojo = self.dojo
+        while True:
+            with dojo.index_lock:
+                room = dojo.pick_room(room_type, strategy)
+            if room is None:
+                with self.stripes.holding_all():
+                    with dojo.index_lock:
+                        return dojo.allocate_person(person_id, room_type,
+                                                    strategy)
+            with self.stripes.holding([person_id, room]):
+                with dojo.index_lock:
+                    if dojo.pick_room(room_type, room_name=room.room_name) \
+                            is not room:
+                        continue
+                return dojo.allocate_person(person_id, room_type,
+                                            room_name=room.room_name)
+
+    @checkpointed
+    def reallocate_person(self, person_id, room_name):
+        """
+        Method to move a person to a room, holding the person, the room and
+        the room of the same type that they are leaving
+        """
+        def find_keys():
+            room = self.dojo.rooms_by_name.get(room_name)
+            if room is None:
+                return {person_id}
+            return {room} | self.person_keys(person_id, room.room_type)
+
+        return self.change(find_keys, lambda: self.dojo.reallocate_person(
+            person_id, room_name))
+
+    @checkpointed
+    def remove_person(self, person_id):
+        return self.change(lambda: self.person_keys(person_id),
+                           lambda: self.dojo.remove_person(person_id))
+
+    @checkpointed
+    def delete_room(self, room_name):
+        def find_keys():
+            room = self.dojo.rooms_by_name.get(room_name)
+            return {room} if room is not None else set()
+
+        return self.change(find_keys,
+                           lambda: self.dojo.delete_room(room_name))
+
+    @checkpointed
+    def rename_room(self, room_name, new_room_name):
+        def find_keys():
+            room = self.dojo.rooms_by_name.get(room_name)
+            return {room} if room is not None else set()
+
+        def rename():
+            # The new name must still be free when the room takes it
+            with self.dojo.index_lock:
+                return self.dojo.rename_room(room_name, new_room_name)
+
+        return self.change(find_keys, rename)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy import Column, ForeignKey, Integer, String, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 
 
@@ -11,7 +11,7 @@ class People(BASE):
     """
     __tablename__ = "people"
     person_id = Column(Integer, primary_key=True)
-    names = Column(String)
+    names = Column(String, index=True)
     person_type = Column(String)
 
     def __init__(self, person_id, names, person_type):
@@ -27,16 +27,33 @@ class Rooms(BASE):
     __tablename__ = "rooms"
 
     id = Column(Integer, primary_key=True)
-    room_name = Column(String)
+    room_name = Column(String, index=True)
     room_type = Column(String)
     room_capacity = Column(Integer)
-    room_occupants = Column(String)
 
-    def __init__(self, room_name, room_type, room_capacity, room_occupants):
+    def __init__(self, room_name, room_type, room_capacity):
         self.room_name = room_name
         self.room_type = room_type
         self.room_capacity = room_capacity
-        self.room_occupants = room_occupants
+
+
+class Allocations(BASE):
+    """
+    Model for the rooms that people have been allocated, one row per person
+    and room type
+    """
+    __tablename__ = "allocations"
+    id = Column(Integer, primary_key=True)
+    person_id = Column(Integer, ForeignKey("people.person_id"),
+                       nullable=False, index=True)
+    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False,
+                     index=True)
+    kind = Column(String)
+
+    def __init__(self, person_id, room_id, kind):
+        self.person_id = person_id
+        self.room_id = room_id
+        self.kind = kind
 
 
 class Unallocated(BASE):
@@ -45,7 +62,7 @@ class Unallocated(BASE):
     """
     __tablename__ = "unallocated"
     id = Column(Integer, primary_key=True)
-    person_id = Column(Integer)
+    person_id = Column(Integer, ForeignKey("people.person_id"), index=True)
     names = Column(String)
     person_type = Column(String)
     without_room = Column(String)
@@ -55,3 +72,16 @@ class Unallocated(BASE):
         self.names = names
         self.person_type = person_type
         self.without_room = without_room
+
+
+class Sequences(BASE):
+    """
+    Model for the next value of each id sequence of the dojo
+    """
+    __tablename__ = "sequences"
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer)
+
+    def __init__(self, name, next_value):
+        self.name = name
+        self.next_value = next_value
@@ -0,0 +1,103 @@
+import heapq
+import itertools
+
+
+def score_of(scores, person, room):
+    """
+    Function to return how much a person wants a room. Rooms a person has
+    not scored are worth nothing to them
+    """
+    return scores.get(person, {}).get(room, 0)
+
+
+def total_score(scores, assignment):
+    """
+    Function to return the total score of an assignment of people to rooms
+    """
+    return sum(score_of(scores, person, room)
+               for person, room in assignment.items() if room is not None)
+
+
+def auction(people, capacities, scores, current=None):
+    """
+    Function to assign people to rooms so that the total score is as high as
+    possible without going over the capacity of any room. scores maps each
+    person to the rooms they have scored, so preferences can be sparse, and
+    scores may not be negative. Returns a dict of person to room, or to None
+    for the people who could not be given a room.
+
+    Rooms nobody has scored are worth the same to everyone, so only the
+    scored pairs are matched, using the auction algorithm. Every space in a
+    room has a price and people bid for the cheapest space of the room that
+    is worth the most to them after its price, or drop out when no room is
+    worth more than nothing. For integer scores the match is optimal. The
+    people left over keep the room current maps them to while it has space
+    left, and only the rest are put in the spaces left over
+    """
+    people = list(people)
+    capacities = {room: capacity for room, capacity in capacities.items()
+                  if capacity > 0}
+    epsilon = 1.0 / (len(people) + 1)
+    counter = itertools.count()
+    # The spaces of each scored room as a heap of [price, order, holder]
+    spaces = {}
+    for person in people:
+        for room, score in scores.get(person, {}).items():
+            if score < 0:
+                raise ValueError("Invalid score: {}".format(score))
+            if room in capacities and room not in spaces:
+                spaces[room] = [[0.0, next(counter), None]
+                                for _ in range(capacities[room])]
+
+    assignment = dict.fromkeys(people)
+    unassigned = list(reversed(people))
+    while unassigned:
+        person = unassigned.pop()
+        # Find the room worth the most after the price of its cheapest space
+        # and what the next best room is worth. The spaces of a room are all
+        # alike, so the other spaces of the best room are not compared.
+        # Not taking a scored room is worth nothing
+        best, best_room, second = 0.0, None, 0.0
+        for room, score in scores.get(person, {}).items():
+            room_spaces = spaces.get(room)
+            if room_spaces is None:
+                continue
+            offer = score - room_spaces[0][0]
+            if offer > best:
+                best, best_room, second = offer, room, best
+            elif offer > second:
+                second = offer
+        if best_room is None:
+            continue
+
+        # Outbid whoever holds the cheapest space in the best room
+        room_spaces = spaces[best_room]
+        space = heapq.heappop(room_spaces)
+        if space[2] is not None:
+            assignment[space[2]] = None
+            unassigned.append(space[2])
+        heapq.heappush(room_spaces, [
+            space[0] + best - second + epsilon, next(counter), person])
+        assignment[person] = best_room
+
+    # Keep everyone who did not get a scored room where they are while
+    # there is space, then put the rest in the spaces left over
+    left = dict(capacities)
+    for room in assignment.values():
+        if room is not None:
+            left[room] -= 1
+    current = current or {}
+    for person in people:
+        room = current.get(person)
+        if assignment[person] is None and left.get(room, 0) > 0:
+            assignment[person] = room
+            left[room] -= 1
+    vacant = ((room, count) for room, count in left.items() if count > 0)
+    room, count = next(vacant, (None, 0))
+    for person in people:
+        if assignment[person] is None and room is not None:
+            assignment[person] = room
+            count -= 1
+            if count == 0:
+                room, count = next(vacant, (None, 0))
+    return assignment
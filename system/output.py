@@ -0,0 +1,90 @@
+import sys
+from collections import namedtuple
+
+from termcolor import cprint
+
+# The kind of message that each colour used by the dojo stands for
+LEVELS = {
+    "green": "success",
+    "yellow": "warning",
+    "red": "error",
+    None: "info"
+}
+
+Event = namedtuple("Event", ["level", "message"])
+
+
+class ConsoleOutput(object):
+    """
+    Class to print messages to the terminal in colour as they happen
+    """
+    def write(self, message="", colour=None):
+        if colour:
+            cprint(message, colour)
+        else:
+            print(message)
+
+
+class NullOutput(object):
+    """
+    Class to discard every message
+    """
+    def write(self, message="", colour=None):
+        pass
+
+
+class BufferedOutput(object):
+    """
+    Class to collect messages in memory and print them all at once when
+    flushed
+    """
+    def __init__(self):
+        self.lines = []
+
+    def write(self, message="", colour=None):
+        self.lines.append(message)
+
+    def getvalue(self):
+        """
+        Method to return everything written since the last flush
+        """
+        return "".join(line + "\n" for line in self.lines)
+
+    def flush(self, stream=None):
+        """
+        Method to write the collected messages to a stream, stdout by default
+        """
+        (stream or sys.stdout).write(self.getvalue())
+        self.lines = []
+
+
+class EventOutput(object):
+    """
+    Class to record every message as an Event with a level so that callers
+    can inspect what happened
+    """
+    def __init__(self):
+        self.events = []
+
+    def write(self, message="", colour=None):
+        self.events.append(Event(LEVELS.get(colour, "info"), message))
+
+
+OUTPUTS = {
+    "console": ConsoleOutput,
+    "null": NullOutput,
+    "buffered": BufferedOutput,
+    "events": EventOutput
+}
+
+
+def get_output(output=None):
+    """
+    Function to return an output given an instance, one of the names in
+    OUTPUTS or None for the console
+    """
+    if output is None:
+        return ConsoleOutput()
+    if isinstance(output, str):
+        return OUTPUTS[output]()
+    return output
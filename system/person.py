@@ -1,33 +1,59 @@
-from abc import ABCMeta, abstractmethod
-
-
-class Person(metaclass=ABCMeta):
+class PersonIdSequence(object):
+    """
+    Class to hand out person ids in increasing order. Ids are never handed
+    out twice, even after the people they were given to are removed
+    """
+    __slots__ = ("next_value",)
+
+    def __init__(self, next_value=1):
+        self.next_value = next_value
+
+    def next_id(self):
+        """
+        Method to return a new id
+        """
+        person_id = self.next_value
+        self.next_value += 1
+        return person_id
+
+    def advance(self, person_id):
+        """
+        Method to make sure that every id handed out from now on is greater
+        than person_id
+        """
+        if person_id >= self.next_value:
+            self.next_value = person_id + 1
+
+
+# The ids of people created outside a dojo
+PERSON_IDS = PersonIdSequence()
+
+
+class Person(object):
     """Class to create a person object. Inherited by Fellow and Person"""
-    def __init__(self, person_name=None, person_type=None):
+    __slots__ = ("person_name", "person_type", "person_id")
+
+    def __init__(self, person_name=None, person_type=None, person_id=None):
         self.person_name = person_name
         self.person_type = person_type
-        self.person_id = id(self)
+        self.person_id = person_id if person_id is not None else \
+            PERSON_IDS.next_id()
 
-    @abstractmethod
     def __repr__(self):
         return "{}".format(self.person_name)
 
 
 class Fellow(Person):
     """Class to create a Fellow and set their attributes"""
-    def __init__(self, person_name, person_type="fellow"):
-        super(Fellow, self).__init__(person_name, person_type)
-        self.person_id = id(self)
+    __slots__ = ()
 
-    def __repr__(self):
-        return "{}".format(self.person_name)
+    def __init__(self, person_name, person_type="fellow", person_id=None):
+        super(Fellow, self).__init__(person_name, person_type, person_id)
 
 
 class Staff(Person):
     """Class to create a Staff and set their attributes"""
-    def __init__(self, person_name, person_type="staff"):
-        super(Staff, self).__init__(person_name, person_type)
-        self.person_id = id(self)
+    __slots__ = ()
 
-    def __repr__(self):
-        return "{}".format(self.person_name)
+    def __init__(self, person_name, person_type="staff", person_id=None):
+        super(Staff, self).__init__(person_name, person_type, person_id)
@@ -0,0 +1,50 @@
+import io
+import os
+
+# Where reports given as a bare file name are written
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                          "..", "output_files")
+
+# The number of characters gathered before they are written out at once
+BUFFER_SIZE = 1 << 16
+
+
+def report_path(filename):
+    """
+    Function to return where a report is written. A bare file name goes in
+    the output_files folder and a path with a folder is used as it is
+    """
+    if os.path.dirname(filename):
+        return filename
+    return os.path.join(OUTPUT_DIR, filename)
+
+
+def write_lines(lines, stream, buffer_size=BUFFER_SIZE):
+    """
+    Function to write lines to a file-like object. The lines are gathered
+    into blocks of about buffer_size characters so that a long report is
+    written with a few calls instead of one per line
+    """
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        block.append("\n")
+        size += len(line) + 1
+        if size >= buffer_size:
+            stream.write("".join(block))
+            block, size = [], 0
+    if block:
+        stream.write("".join(block))
+
+
+def write_report(lines, target, buffer_size=BUFFER_SIZE):
+    """
+    Function to write the lines of a report to target, which is either a
+    file-like object with a write method or a file name
+    """
+    if hasattr(target, "write"):
+        write_lines(lines, target, buffer_size)
+    else:
+        with io.open(report_path(target), "w", buffering=buffer_size) as \
+                stream:
+            write_lines(lines, stream, buffer_size)
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+
+
+class BulkAllocation(object):
+    """
+    Class to hold the outcome of adding many people to the dojo at once
+    """
+    def __init__(self):
+        self.added = []
+        self.offices = OrderedDict()
+        self.livingspaces = OrderedDict()
+        self.without_offices = []
+        self.without_livingspaces = []
+        self.rejected = []
+
+    def __repr__(self):
+        return "{0} added, {1} offices and {2} living spaces allocated, " \
+               "{3} without offices, {4} without living spaces, " \
+               "{5} rejected".format(len(self.added), len(self.offices),
+                                     len(self.livingspaces),
+                                     len(self.without_offices),
+                                     len(self.without_livingspaces),
+                                     len(self.rejected))
+
+
+class Optimization(object):
+    """
+    Class to hold the outcome of allocating the rooms of one type according
+    to the preferences of the people in them
+    """
+    def __init__(self, room_type):
+        self.room_type = room_type
+        self.rooms = OrderedDict()
+        self.unallocated = []
+        self.moved = []
+        self.satisfaction = 0
+        self.baseline = 0
+
+    def __repr__(self):
+        return "{0} people allocated {1}s, {2} moved, {3} unallocated, " \
+               "satisfaction {4} against {5} for a random " \
+               "allocation".format(len(self.rooms), self.room_type,
+                                   len(self.moved), len(self.unallocated),
+                                   self.satisfaction, self.baseline)
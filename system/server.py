@@ -0,0 +1,97 @@
+import io
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import traceback
+
+# The largest request a client may send
+MAX_REQUEST = 1 << 16
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    """
+    Class to answer one command: the client sends the command as a line of
+    UTF-8 and gets back what running it printed. Requests are served one at
+    a time, so sys.stdout can be swapped while the command runs. A command
+    that exits stops the server once it has answered
+    """
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST).decode("utf-8").strip()
+        if not line:
+            return
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        exiting = False
+        try:
+            self.server.run_command(line)
+        except SystemExit:
+            exiting = True
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+        finally:
+            output, sys.stdout = sys.stdout.getvalue(), stdout
+        self.wfile.write(output.encode("utf-8"))
+        if exiting:
+            # shutdown waits for serve_forever to return, which it cannot
+            # do while this request is being handled
+            threading.Thread(target=self.server.shutdown).start()
+
+
+class DojoServer(socketserver.UnixStreamServer):
+    """
+    Class to serve the commands of a long-running dojo over a Unix socket.
+    run_command is called with each command line in turn
+    """
+    def __init__(self, socket_path, run_command):
+        self.run_command = run_command
+        remove_stale_socket(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path,
+                                               CommandHandler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def remove_stale_socket(socket_path):
+    """
+    Function to remove a socket file left behind by a server that is no
+    longer running. A socket that a server still answers on is kept, so
+    binding to it fails. A path that is not a socket is never removed and
+    raises a ValueError
+    """
+    if not os.path.exists(socket_path):
+        return
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise ValueError("{} exists and is not a socket".format(socket_path))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+    finally:
+        client.close()
+
+
+def send_command(socket_path, line):
+    """
+    Function to send a command line to a dojo server and return what it
+    printed
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall(line.encode("utf-8") + b"\n")
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = client.recv(MAX_REQUEST)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        client.close()
+    return b"".join(chunks).decode("utf-8")
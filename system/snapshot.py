@@ -0,0 +1,183 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+# A snapshot starts with MAGIC and the version of the layout
+MAGIC = b"DOJS"
+VERSION = 2
+
+# magic, version, flags, number of strings, size of the string table,
+# number of people, number of rooms, number of occupants, next person id
+HEADER = struct.Struct("<4sHHIIIIIq")
+
+# The room types in the order they are numbered in a snapshot
+ROOM_TYPES = ["office", "livingspace"]
+
+# The bits of the flags kept for each person
+STAFF = 1
+WITHOUT_OFFICE = 2
+WITHOUT_LIVINGSPACE = 4
+
+Snapshot = namedtuple("Snapshot", [
+    "next_person_id", "person_ids", "person_names", "person_flags",
+    "room_names", "room_types", "room_capacities", "occupant_offsets",
+    "occupants", "without_offices", "without_livingspaces"])
+
+
+def pack_array(typecode, values):
+    """
+    Function to return the little-endian bytes of an array of numbers,
+    padded to a multiple of eight bytes
+    """
+    numbers = array(typecode, values)
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    data = numbers.tobytes()
+    return data + b"\0" * (-len(data) % 8)
+
+
+def unpack_array(buffer, offset, typecode, count):
+    """
+    Function to return an array of count numbers read from buffer at offset
+    and the offset of what follows it. The numbers are copied in one go
+    """
+    numbers = array(typecode)
+    size = numbers.itemsize * count
+    numbers.frombytes(buffer[offset:offset + size])
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers, offset + size + (-size % 8)
+
+
+def write_snapshot(dojo, filename):
+    """
+    Function to write the people and rooms of a dojo to a snapshot file.
+    Names are kept once each in a string table and everything else is kept
+    in fixed-width arrays: the id, name and flags of each person and the
+    name, type, capacity and occupant offsets of each room. The occupants of
+    every room follow as positions in the people arrays, and so do the
+    people without an office and without a living space, in the order the
+    reports list them. Rooms are kept in the order of the room lists. The
+    file is written next to its final name and then moved there
+    """
+    strings, string_index = [], {}
+
+    def intern(name):
+        if name not in string_index:
+            if "\0" in name:
+                raise ValueError("Invalid name: {!r}".format(name))
+            string_index[name] = len(strings)
+            strings.append(name)
+        return string_index[name]
+
+    people = list(dojo.people_by_id.values())
+    positions = {person: position for position, person in enumerate(people)}
+    without_offices = dojo.people["without_offices"]
+    without_livingspaces = dojo.people["without_livingspaces"]
+    person_flags = []
+    for person in people:
+        flags = STAFF if person.person_type == "staff" else 0
+        if person in without_offices:
+            flags |= WITHOUT_OFFICE
+        if person in without_livingspaces:
+            flags |= WITHOUT_LIVINGSPACE
+        person_flags.append(flags)
+    person_names = [intern(person.person_name) for person in people]
+
+    rooms = dojo.rooms["offices"] + dojo.rooms["livingspaces"]
+    occupant_offsets, occupants = [0], []
+    for room in rooms:
+        occupants.extend(positions[person] for person in room.room_occupants)
+        occupant_offsets.append(len(occupants))
+    room_names = [intern(room.room_name) for room in rooms]
+
+    table = "\0".join(strings).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, 0, len(strings), len(table),
+                         len(people), len(rooms), len(occupants),
+                         dojo.person_ids.next_value)
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(header + b"\0" * (-len(header) % 8))
+        snapshot.write(table + b"\0" * (-len(table) % 8))
+        snapshot.write(pack_array(
+            "q", [person.person_id for person in people]))
+        snapshot.write(pack_array("I", person_names))
+        snapshot.write(pack_array("B", person_flags))
+        snapshot.write(pack_array("I", room_names))
+        snapshot.write(pack_array(
+            "B", [ROOM_TYPES.index(room.room_type) for room in rooms]))
+        snapshot.write(pack_array(
+            "I", [room.room_capacity for room in rooms]))
+        snapshot.write(pack_array("I", occupant_offsets))
+        snapshot.write(pack_array("I", occupants))
+        snapshot.write(pack_array(
+            "I", [positions[person] for person in without_offices]))
+        snapshot.write(pack_array(
+            "I", [positions[person] for person in without_livingspaces]))
+    os.replace(temporary, filename)
+
+
+def read_snapshot(filename):
+    """
+    Function to read a snapshot file through a memory map. Each array is
+    copied out of the map in one go and the names are decoded all at once,
+    so nothing is parsed row by row. Returns a Snapshot whose names are
+    already looked up in the string table. Snapshots of the first version
+    do not keep the order of the people without rooms, which is then None
+    """
+    with open(filename, "rb") as snapshot:
+        size = os.fstat(snapshot.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("Not a dojo snapshot")
+        buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, _, string_count, table_size, people, rooms, \
+            occupants, next_person_id = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a dojo snapshot")
+        if version not in (1, VERSION):
+            raise ValueError(
+                "Unsupported snapshot version: {}".format(version))
+        offset = HEADER.size + (-HEADER.size % 8)
+        strings = buffer[offset:offset + table_size].decode("utf-8") \
+            .split("\0") if string_count else []
+        if len(strings) != string_count:
+            raise ValueError("Corrupt snapshot string table")
+        offset += table_size + (-table_size % 8)
+
+        person_ids, offset = unpack_array(buffer, offset, "q", people)
+        person_names, offset = unpack_array(buffer, offset, "I", people)
+        person_flags, offset = unpack_array(buffer, offset, "B", people)
+        room_names, offset = unpack_array(buffer, offset, "I", rooms)
+        room_types, offset = unpack_array(buffer, offset, "B", rooms)
+        room_capacities, offset = unpack_array(buffer, offset, "I", rooms)
+        occupant_offsets, offset = unpack_array(buffer, offset, "I",
+                                                rooms + 1)
+        occupant_positions, offset = unpack_array(buffer, offset, "I",
+                                                  occupants)
+        without_offices = without_livingspaces = None
+        if version > 1:
+            without_offices, offset = unpack_array(
+                buffer, offset, "I",
+                sum(1 for flags in person_flags if flags & WITHOUT_OFFICE))
+            without_livingspaces, offset = unpack_array(
+                buffer, offset, "I",
+                sum(1 for flags in person_flags
+                    if flags & WITHOUT_LIVINGSPACE))
+            without_offices = without_offices.tolist()
+            without_livingspaces = without_livingspaces.tolist()
+        if offset > size:
+            raise ValueError("Truncated snapshot")
+    finally:
+        buffer.close()
+
+    return Snapshot(
+        next_person_id, person_ids.tolist(),
+        [strings[index] for index in person_names], person_flags.tolist(),
+        [strings[index] for index in room_names],
+        [ROOM_TYPES[index] for index in room_types],
+        room_capacities.tolist(), occupant_offsets.tolist(),
+        occupant_positions.tolist(), without_offices, without_livingspaces)
@@ -0,0 +1,158 @@
+from sqlalchemy import bindparam, create_engine, event, text
+
+from system.models import BASE, Rooms, Allocations
+
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+SYNCHRONOUS_MODES = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
+
+def sqlite_engine(db_name, journal_mode=None, synchronous=None):
+    """
+    Function to create an engine for an sqlite database. journal_mode and
+    synchronous are applied as pragmas to every connection when given
+    """
+    pragmas = []
+    if journal_mode is not None:
+        if str(journal_mode).upper() not in JOURNAL_MODES:
+            raise ValueError("Invalid journal mode: {}".format(journal_mode))
+        pragmas.append("PRAGMA journal_mode={}".format(journal_mode))
+    if synchronous is not None:
+        if str(synchronous).upper() not in SYNCHRONOUS_MODES:
+            raise ValueError("Invalid synchronous mode: {}".format(
+                synchronous))
+        pragmas.append("PRAGMA synchronous={}".format(synchronous))
+
+    engine = create_engine("sqlite:///{}".format(db_name))
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    return engine
+
+
+def insert_rows(connection, table, rows):
+    """
+    Function to insert a list of rows into a table with a single executemany
+    """
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def update_rows(connection, key_column, rows):
+    """
+    Function to update many rows with a single executemany. Each row holds
+    the new column values and the value of key_column under "key"
+    """
+    if rows:
+        table = key_column.table
+        connection.execute(
+            table.update().where(key_column == bindparam("key")), rows)
+
+
+def delete_rows(connection, key_column, keys):
+    """
+    Function to delete the rows whose key_column is in keys with a single
+    executemany
+    """
+    if keys:
+        table = key_column.table
+        connection.execute(
+            table.delete().where(key_column == bindparam("key")),
+            [{"key": key} for key in keys])
+
+
+def create_indexes(connection, tables):
+    """
+    Function to add the indexes of the tables to a database that was created
+    before they existed
+    """
+    for table in tables:
+        for index in table.indexes:
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})".format(
+                    index.name, table.name,
+                    ", ".join(column.name for column in index.columns))))
+
+
+def fetch_rows(connection, query):
+    """
+    Function to run a plain select on the sqlite connection underneath and
+    return every row as a tuple. Large tables load faster without the
+    per-row processing of SQLAlchemy results
+    """
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(query)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def table_columns(connection, table_name):
+    """
+    Function to return the names of the columns of a table
+    """
+    return [row[1] for row in connection.execute(
+        text("PRAGMA table_info({})".format(table_name)))]
+
+
+def upgrade_schema(connection):
+    """
+    Function to bring a database saved by an older version of the dojo up to
+    the current schema. Occupants that were stored in the rooms table as
+    comma-joined ids are moved to the allocations table
+    """
+    BASE.metadata.create_all(connection)
+    if "room_occupants" in table_columns(connection, "rooms"):
+        old_rooms = connection.execute(text(
+            "SELECT id, room_name, room_type, room_capacity, room_occupants "
+            "FROM rooms ORDER BY id")).fetchall()
+        connection.execute(text("DROP TABLE rooms"))
+        Rooms.__table__.create(connection)
+        insert_rows(connection, Rooms.__table__, [
+            {"id": room_id, "room_name": room_name, "room_type": room_type,
+             "room_capacity": room_capacity}
+            for room_id, room_name, room_type, room_capacity, _ in old_rooms])
+        insert_rows(connection, Allocations.__table__, [
+            {"person_id": int(person_id), "room_id": room_id,
+             "kind": room_type}
+            for room_id, _, room_type, _, room_occupants in old_rooms
+            for person_id in (room_occupants or "").split(",") if person_id])
+    create_indexes(connection, BASE.metadata.sorted_tables)
+
+
+def room_occupants(connection, room_name):
+    """
+    Function to return the names of the people in a room, in the order they
+    were allocated, straight from the database
+    """
+    return [row[0] for row in connection.execute(text(
+        "SELECT people.names FROM allocations "
+        "JOIN rooms ON rooms.id = allocations.room_id "
+        "JOIN people ON people.person_id = allocations.person_id "
+        "WHERE rooms.room_name = :room_name ORDER BY allocations.id"),
+        {"room_name": room_name})]
+
+
+def find_room_type(connection, room_name):
+    """
+    Function to return the type of the room with the given name, or None if
+    there is no such room
+    """
+    return connection.execute(text(
+        "SELECT room_type FROM rooms WHERE room_name = :room_name"),
+        {"room_name": room_name}).scalar()
+
+
+def find_people(connection, names):
+    """
+    Function to return the id, names and type of everyone with the given
+    names
+    """
+    return connection.execute(text(
+        "SELECT person_id, names, person_type FROM people "
+        "WHERE names = :names ORDER BY person_id"),
+        {"names": names}).fetchall()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.aio import AsyncDojo
+
+
+class AsyncDojoTestCases(unittest.TestCase):
+    """
+    Tests for using one dojo from many coroutines
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.new_dojo = Dojo(output="null")
+        self.new_dojo.open_journal(
+            os.path.join(self.directory, "dojo.journal"),
+            os.path.join(self.directory, "dojo.db"), sync_every=1)
+        for name in ["Blue", "Red", "Green"]:
+            self.new_dojo.create_room(name, "office")
+        self.desks = AsyncDojo(self.new_dojo)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.new_dojo.close_journal()
+        shutil.rmtree(self.directory)
+
+    def run_desks(self, *coroutines):
+        """
+        Runs coroutines together and returns their results
+        """
+        async def together():
+            return await asyncio.gather(*coroutines)
+        return self.loop.run_until_complete(together())
+
+    def test_capacity_under_contention(self):
+        """
+        Test that rooms never go over capacity when many desks allocate and
+        reallocate people at the same time
+        """
+        people = [self.new_dojo.add_person("Staff", str(i), "staff")
+                  for i in range(12)]
+        for person in people[6:]:
+            self.new_dojo.remove_occupant(
+                self.new_dojo.get_old_office(person.person_id), person)
+        self.new_dojo.create_room("Yellow", "office")
+        self.run_desks(*(
+            [self.desks.reallocate_person(person.person_id, "Yellow")
+             for person in people[:6]] +
+            [self.desks.allocate_person(person.person_id, "office")
+             for person in people[6:]]))
+        for room in self.new_dojo.rooms["offices"]:
+            self.assertLessEqual(len(room.room_occupants), 6)
+        self.assertEqual(12, sum(len(room.room_occupants)
+                                 for room in self.new_dojo.rooms["offices"]))
+        self.assertEqual(0, len(self.new_dojo.people["without_offices"]))
+
+    def test_rooms_lock_independently(self):
+        """
+        Test that a desk holding a room only holds up changes to that room
+        """
+        person = self.new_dojo.add_person("Ann", "Kamau", "staff")
+        other = self.new_dojo.add_person("Bob", "Otieno", "staff")
+        events = []
+
+        async def hold_room(room_name, release):
+            async with self.desks.holding(room_name):
+                events.append("held")
+                await release.wait()
+            events.append("released")
+
+        async def move(person, room_name):
+            await self.desks.reallocate_person(person.person_id, room_name)
+            events.append("moved to {}".format(room_name))
+
+        async def scenario():
+            free = {"Blue", "Red", "Green"} - {
+                self.new_dojo.get_old_office(person.person_id).room_name,
+                self.new_dojo.get_old_office(other.person_id).room_name}
+            held = sorted(free)[0] if free else None
+            release = asyncio.Event()
+            holder = asyncio.ensure_future(hold_room(held, release))
+            await asyncio.sleep(0)
+            waiting = asyncio.ensure_future(move(person, held))
+            self.new_dojo.create_room("Yellow", "office")
+            await move(other, "Yellow")
+            await asyncio.sleep(0.01)
+            self.assertNotIn("moved to {}".format(held), events)
+            release.set()
+            await holder
+            await waiting
+            return held
+
+        held = self.loop.run_until_complete(scenario())
+        self.assertEqual(["held", "moved to Yellow", "released",
+                          "moved to {}".format(held)], events)
+
+    def test_hold_then_change(self):
+        """
+        Test that a desk holding a room can check it and then change it
+        while another desk waits for the room, and finds it renamed
+        """
+        person = self.new_dojo.add_person("Ann", "Kamau", "staff")
+        held = next(name for name in ["Blue", "Red", "Green"]
+                    if name != self.new_dojo.get_old_office(
+                        person.person_id).room_name)
+        events = []
+
+        async def check_and_move():
+            async with self.desks.holding(held):
+                room = await self.desks.check_room(held, person.person_id)
+                if room is self.new_dojo.rooms_by_name[held]:
+                    await self.desks.reallocate_person(person.person_id,
+                                                       held)
+                    events.append("moved")
+                await asyncio.sleep(0.01)
+                await self.desks.rename_room(held, "Held")
+                events.append("renamed")
+
+        async def delete_held():
+            await asyncio.sleep(0)
+            await self.desks.delete_room(held)
+            events.append("deleted")
+
+        async def scenario():
+            await asyncio.wait_for(asyncio.gather(
+                check_and_move(), delete_held()), 5)
+
+        self.loop.run_until_complete(scenario())
+        self.assertEqual(["moved", "renamed", "deleted"], events)
+        self.assertIs(self.new_dojo.rooms_by_name["Held"],
+                      self.new_dojo.get_old_office(person.person_id))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+
+
+class AllocationTestCases(unittest.TestCase):
+    """
+    Tests for the strategies used to pick rooms
+    """
+    def setUp(self):
+        self.new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red", "Green"]:
+            self.new_dojo.create_room(name, "office")
+
+    def occupancy(self):
+        """
+        Returns the number of people in each office
+        """
+        return {room.room_name: len(room.room_occupants)
+                for room in self.new_dojo.rooms["offices"]}
+
+    def test_invalid_strategy(self):
+        """
+        Tests that unknown strategies are refused
+        """
+        with self.assertRaises(ValueError):
+            Dojo(output="null", strategy="closest")
+        with self.assertRaises(ValueError):
+            self.new_dojo.get_random_room("office", "closest")
+
+    def test_fill_first(self):
+        """
+        Tests that fill-first fills a room before opening another one
+        """
+        for i in range(7):
+            self.new_dojo.add_person("Staff", str(i), "staff",
+                                     strategy="fill-first")
+        self.assertEqual([0, 1, 6], sorted(self.occupancy().values()))
+
+        # A room that gets a vacancy again is the first to be filled
+        full_room = [room for room in self.new_dojo.rooms["offices"]
+                     if len(room.room_occupants) == 6][0]
+        self.new_dojo.remove_person(full_room.room_occupants[0].person_id)
+        self.assertIs(full_room,
+                      self.new_dojo.get_random_room("office", "fill-first"))
+
+    def test_spread_evenly(self):
+        """
+        Tests that spread-evenly picks the least occupied room
+        """
+        new_dojo = Dojo(output="null", strategy="spread-evenly")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.create_room("Mara", "livingspace")
+        new_dojo.create_room("Kilele", "livingspace")
+        new_dojo.add_people_bulk(
+            [("Fellow", str(i), "fellow", True) for i in range(6)])
+        self.assertEqual([3, 3], [len(room.room_occupants) for room in
+                                  new_dojo.rooms["livingspaces"]])
+
+    def test_round_robin(self):
+        """
+        Tests that round-robin picks the rooms in turn and skips full ones
+        """
+        self.new_dojo.strategy = "round-robin"
+        for i in range(4):
+            self.new_dojo.add_person("Staff", str(i), "staff")
+        self.assertEqual({"Blue": 2, "Red": 1, "Green": 1}, self.occupancy())
+        self.new_dojo.add_people_bulk(
+            [("Staff", str(i), "staff", False) for i in range(14)])
+        self.assertEqual({"Blue": 6, "Red": 6, "Green": 6}, self.occupancy())
+        self.assertIsNone(self.new_dojo.get_random_room("office"))
+
+    def test_heap_stays_compact(self):
+        """
+        Tests that the stale entries of the fill-first heap are dropped as
+        people come and go
+        """
+        for i in range(47):
+            self.new_dojo.create_room("Office{}".format(i), "office")
+        strategy = self.new_dojo.vacancies["office"].strategy("fill-first")
+        for i in range(2000):
+            person = self.new_dojo.add_person("Staff", str(i), "staff",
+                                              strategy="fill-first")
+            self.new_dojo.remove_person(person.person_id)
+        self.assertLessEqual(len(strategy.heap), 2 * len(strategy.keys))
+        self.assertEqual(50, len(strategy.keys))
+        person = self.new_dojo.add_person("Staff", "Last", "staff",
+                                          strategy="fill-first")
+        self.assertEqual(1, len(self.new_dojo.person_rooms[
+            person.person_id]["office"].room_occupants))
+
+if __name__ == "__main__":
+    unittest.main()
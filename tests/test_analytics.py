@@ -0,0 +1,66 @@
+import unittest
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.analytics import HAVE_NUMPY
+from system.dojo import Dojo
+
+
+@unittest.skipUnless(HAVE_NUMPY, "numpy is not installed")
+class AnalyticsTestCases(unittest.TestCase):
+    """
+    Tests for the occupancy arrays of the dojo
+    """
+    def setUp(self):
+        self.new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red", "Green"]:
+            self.new_dojo.create_room(name, "office")
+        self.new_dojo.create_room("Mara", "livingspace")
+        self.new_dojo.add_people_bulk(
+            [("Staff", str(i), "staff", False) for i in range(6)],
+            strategy="fill-first")
+        self.new_dojo.add_people_bulk(
+            [("Fellow", str(i), "fellow", True) for i in range(3)],
+            strategy="fill-first")
+        self.occupancy = self.new_dojo.occupancy
+
+    def test_totals(self):
+        """
+        Tests that the totals match the rooms
+        """
+        self.assertEqual({"rooms": 4, "capacity": 22, "occupied": 12,
+                          "vacant": 10}, self.occupancy.totals())
+        self.assertEqual({"rooms": 1, "capacity": 4, "occupied": 3,
+                          "vacant": 1},
+                         self.occupancy.totals("livingspace"))
+        self.assertEqual({"office": 0.5, "livingspace": 0.75},
+                         self.occupancy.utilisation())
+
+    def test_histogram_and_emptiest(self):
+        """
+        Tests the number of rooms per number of occupants and the rooms
+        with the most vacant spaces
+        """
+        self.assertEqual([1, 0, 0, 1, 0, 0, 1],
+                         self.occupancy.histogram("office"))
+        emptiest = self.occupancy.emptiest(2)
+        self.assertEqual([6, 3], [spaces for _, spaces in emptiest])
+        self.assertEqual([], self.occupancy.emptiest(0))
+
+    def test_changes_are_tracked(self):
+        """
+        Tests that deleting rooms and moving people updates the arrays
+        """
+        empty_room = self.occupancy.emptiest(1)[0][0]
+        self.new_dojo.delete_room(empty_room.room_name)
+        self.new_dojo.create_room("Yellow", "office")
+        self.assertEqual(4, len(self.occupancy))
+        self.assertEqual(22, self.occupancy.totals()["capacity"])
+        person = self.new_dojo.people["staff"][0]
+        self.new_dojo.reallocate_person(person.person_id, "Yellow")
+        self.assertEqual([0, 1, 0, 1, 0, 1],
+                         self.occupancy.histogram("office"))
+        self.assertIn("12 of 22 spaces taken", self.occupancy.summary())
+
+if __name__ == "__main__":
+    unittest.main()
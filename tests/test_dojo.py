@@ -1,5 +1,8 @@
+import io
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 from os import path
 
@@ -47,6 +50,24 @@ class DojoTestCases(unittest.TestCase):
         self.assertTrue(isinstance(random_office, Office))
         self.assertTrue(isinstance(random_livingspace, LivingSpace))
 
+    def test_get_random_room_skips_full_rooms(self):
+        """
+        Test that rooms leave the vacancy index once they are full and come
+        back when a space is freed
+        """
+        new_dojo = Dojo()
+        office = new_dojo.create_room("Green", "office")
+        people = [new_dojo.add_person("Staff", str(i), "staff")
+                  for i in range(office.room_capacity)]
+        self.assertNotIn(office, new_dojo.vacancies["office"])
+        self.assertIsNone(new_dojo.get_random_room("office"))
+
+        new_dojo.remove_person(people[0].person_id)
+        self.assertIs(new_dojo.get_random_room("office"), office)
+
+        new_dojo.delete_room("Green")
+        self.assertIsNone(new_dojo.get_random_room("office"))
+
     def test_add_person(self):
         """
         Test the creation of a new fellow and staff
@@ -63,6 +84,46 @@ class DojoTestCases(unittest.TestCase):
         new_staff_count = len(self.new_dojo.people['staff'])
         self.assertEqual(new_staff_count - initial_staff_count, 1)
 
+    def test_add_people_bulk(self):
+        """
+        Test that many people can be added and allocated in one call and that
+        the outcome says who got which room
+        """
+        new_dojo = Dojo()
+        new_dojo.create_room("Blue", "office")
+        new_dojo.create_room("Mara", "livingspace")
+        records = [("Fellow", str(i), "FELLOW", "Y") for i in range(5)] + \
+                  [("Staff", str(i), "staff", False) for i in range(3)] + \
+                  [("Someone", "Else", "visitor", False)]
+        result = new_dojo.add_people_bulk(records, seed=1)
+
+        self.assertEqual(8, len(result.added))
+        self.assertEqual([records[-1]], result.rejected)
+        self.assertEqual(6, len(result.offices))
+        self.assertEqual(2, len(result.without_offices))
+        self.assertEqual(4, len(result.livingspaces))
+        self.assertEqual(1, len(result.without_livingspaces))
+        for person_id, office in result.offices.items():
+            self.assertIs(new_dojo.get_old_office(person_id), office)
+        self.assertIsNone(new_dojo.get_random_room("office"))
+        self.assertEqual(2, len(new_dojo.people["without_offices"]))
+
+    def test_add_people_bulk_is_repeatable(self):
+        """
+        Test that the same seed gives the same allocations
+        """
+        allocations = []
+        for _ in range(2):
+            new_dojo = Dojo()
+            for name in ["Blue", "Red", "Green"]:
+                new_dojo.create_room(name, "office")
+            result = new_dojo.add_people_bulk(
+                [("Staff", str(i), "staff", False) for i in range(10)],
+                seed=42)
+            allocations.append([office.room_name for office in
+                                result.offices.values()])
+        self.assertEqual(allocations[0], allocations[1])
+
     def test_print_allocations(self):
         """
         Test that allocations are printed on the screen
@@ -99,6 +160,54 @@ class DojoTestCases(unittest.TestCase):
         self.assertEqual(5, len(self.new_dojo.people['fellows']))
         self.assertEqual(4, len(self.new_dojo.people['staff']))
 
+    def test_load_people_in_chunks(self):
+        """
+        Test that people can be streamed from a file in chunks with progress
+        and invalid lines reported to a callback
+        """
+        events = []
+        with tempfile.NamedTemporaryFile("w", suffix=".txt",
+                                         delete=False) as input_file:
+            input_file.write("A B FELLOW Y\nC D STAFF\nNOT A PERSON HERE\n"
+                             "E F FELLOW\n")
+        people_added = self.new_dojo.load_people(
+            input_file.name, chunk_size=2,
+            callback=lambda event, data: events.append((event, data)))
+        os.remove(input_file.name)
+
+        self.assertEqual(3, people_added)
+        self.assertEqual(3, len(self.new_dojo.people["fellows"]))
+        self.assertIn(("error", (3, "NOT A PERSON HERE")), events)
+        self.assertEqual([("progress", 2), ("progress", 3)],
+                         [event for event in events if event[0] == "progress"])
+
+    def test_rooms_change_between_chunks(self):
+        """
+        Test that people added in chunks are not put in rooms that were
+        deleted or filled between two chunks, and that rooms created
+        between them are used
+        """
+        new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red"]:
+            new_dojo.create_room(name, "office")
+        chunks = new_dojo.add_people_in_chunks(
+            [[("Staff", str(i), "staff", False) for i in range(2)],
+             [("Staff", str(i), "staff", False) for i in range(2, 12)]],
+            seed=3)
+        next(chunks)
+        new_dojo.delete_room("Red")
+        while new_dojo.get_random_room("office") is not None:
+            new_dojo.add_person("Filler", "Staff", "staff")
+        new_dojo.create_room("Green", "office")
+        result = next(chunks)
+
+        blue = new_dojo.rooms_by_name["Blue"]
+        green = new_dojo.rooms_by_name["Green"]
+        self.assertEqual(6, len(blue.room_occupants))
+        self.assertEqual(6, len(green.room_occupants))
+        self.assertEqual(set(result.offices.values()), {green})
+        self.assertEqual(4, len(result.without_offices))
+
     def test_print_room(self):
         """
         Test that you can print the room members in a certain room.
@@ -152,6 +261,19 @@ class DojoTestCases(unittest.TestCase):
         self.assertTrue(isinstance(fellow, Fellow))
         self.assertTrue(isinstance(staff, Staff))
 
+    def test_people_by_id_stays_in_sync(self):
+        """
+        Test that the id registry follows people being added and removed
+        """
+        new_fellow = self.new_dojo.add_person("Robley", "Gori", "fellow")
+        self.assertIs(self.new_dojo.people_by_id[new_fellow.person_id],
+                      new_fellow)
+
+        self.new_dojo.remove_person(new_fellow.person_id)
+        self.assertNotIn(new_fellow.person_id, self.new_dojo.people_by_id)
+        self.assertIsNone(
+            self.new_dojo.get_person_object(new_fellow.person_id))
+
     def test_check_room(self):
         """
         Test that you can check if the room that the person is to be
@@ -185,6 +307,28 @@ class DojoTestCases(unittest.TestCase):
             another_lady[0].person_id)
         self.assertTrue(isinstance(old_livingspace, LivingSpace))
 
+    def test_room_indexes_follow_mutations(self):
+        """
+        Test that the room name index and the person to room map follow
+        renames, reallocations and deletions
+        """
+        another_lady = self.new_dojo.get_person_id("Another Lady")[0]
+        self.new_dojo.create_room("Teal", "office")
+        self.new_dojo.reallocate_person(another_lady.person_id, "Teal")
+        self.assertEqual(
+            self.new_dojo.get_old_office(another_lady.person_id).room_name,
+            "Teal")
+
+        self.new_dojo.rename_room("Teal", "Greeny")
+        self.assertIsNone(self.new_dojo.get_room_object("Teal"))
+        self.assertIs(self.new_dojo.get_room_object("Greeny"),
+                      self.new_dojo.get_old_office(another_lady.person_id))
+
+        self.new_dojo.delete_room("Greeny")
+        self.assertIsNone(self.new_dojo.get_old_office(
+            another_lady.person_id))
+        self.assertIn(another_lady, self.new_dojo.people["without_offices"])
+
     def test_reallocate(self):
         """
         Test that you can reallocate a person to a new room
@@ -232,6 +376,29 @@ class DojoTestCases(unittest.TestCase):
             self.assertIn("\tNew Lady - fellow\n", lines)
         os.remove(file)
 
+    def test_stream_reports(self):
+        """
+        Test that reports stream to file-like objects and to paths, and are
+        only returned as a string when asked for
+        """
+        self.new_dojo.add_person("Faith", "Gori", "staff")
+        stream = io.StringIO()
+        self.assertIsNone(self.new_dojo.print_allocations(stream))
+        self.assertIn("Faith Gori\n", stream.getvalue())
+        self.assertTrue(stream.getvalue().startswith(
+            "Blue - office\n" + "-" * 50 + "\n"))
+
+        self.assertEqual("Every fellow has a living space in the Dojo.\n\n"
+                         "Everyone has an office in the Dojo.\n",
+                         self.new_dojo.print_unallocated(as_string=True))
+
+        directory = tempfile.mkdtemp()
+        file = os.path.join(directory, "report.txt")
+        report = self.new_dojo.print_allocations(file, True)
+        with open(file) as stream:
+            self.assertEqual(report, stream.read())
+        shutil.rmtree(directory)
+
     def test_save_state(self):
         """
         Test that data can be saved from the system to the database
@@ -300,6 +467,31 @@ class DojoTestCases(unittest.TestCase):
         self.assertEqual((initial_fellow_count - new_fellow_count), 1)
         self.assertEqual((initial_staff_count - new_staff_count), 1)
 
+    def test_allocation_statuses(self):
+        """
+        Test that the allocation statuses keep the order people were added in
+        and that people move between them as they get or lose rooms
+        """
+        new_dojo = Dojo()
+        first = new_dojo.add_person("First", "Person", "staff")
+        second = new_dojo.add_person("Second", "Person", "fellow", True)
+        self.assertEqual([first, second],
+                         list(new_dojo.people["without_offices"]))
+
+        new_dojo.create_room("Blue", "office")
+        new_dojo.allocate_person(second.person_id, "office")
+        self.assertNotIn(second, new_dojo.people["without_offices"])
+        self.assertIn(second, new_dojo.people["with_offices"])
+
+        new_dojo.delete_room("Blue")
+        self.assertIn(second, new_dojo.people["without_offices"])
+        self.assertNotIn(second, new_dojo.people["with_offices"])
+
+        new_dojo.remove_person(second.person_id)
+        for status in ["with_offices", "without_offices",
+                       "with_livingspaces", "without_livingspaces"]:
+            self.assertNotIn(second, new_dojo.people[status])
+
     def test_delete_room(self):
         """
         Test that a room can be deleted and all members sent to unallocated
@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.export import read_columnar, write_columnar
+
+
+class ExportTestCases(unittest.TestCase):
+    """
+    Tests for exporting the dojo to machine-readable files
+    """
+    def setUp(self):
+        self.new_dojo = Dojo(output="null")
+        self.new_dojo.create_room("Blue", "office")
+        self.new_dojo.create_room("Mara", "livingspace")
+        self.fellow = self.new_dojo.add_person("Ann", "Kamau", "fellow", True)
+        self.staff = self.new_dojo.add_person("Bob", "Otieno", "staff")
+
+    def test_export_csv(self):
+        """
+        Test that tables are exported as CSV with a header
+        """
+        stream = io.StringIO()
+        self.new_dojo.export("people", stream, "csv")
+        self.assertEqual(
+            "person_id,names,person_type\n"
+            "{0},Ann Kamau,fellow\n{1},Bob Otieno,staff\n".format(
+                self.fellow.person_id, self.staff.person_id),
+            stream.getvalue())
+
+    def test_export_jsonl(self):
+        """
+        Test that allocations are exported as one JSON object per line
+        """
+        stream = io.StringIO()
+        self.new_dojo.export("allocations", stream, "jsonl")
+        rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertIn({"person_id": self.fellow.person_id,
+                       "room_name": "Mara", "kind": "livingspace"}, rows)
+        self.assertEqual(3, len(rows))
+
+    def test_export_columnar(self):
+        """
+        Test that the columnar format reads back the rows that were written,
+        across row groups and for a subset of the columns
+        """
+        rows = [(i, "Room {}".format(i), "office") for i in range(10)]
+        stream = io.BytesIO()
+        write_columnar(["person_id", "room_name", "kind"],
+                       ["int", "str", "str"], iter(rows), stream,
+                       row_group_size=4)
+        stream.seek(0)
+        self.assertEqual(rows, list(read_columnar(stream)))
+        stream.seek(0)
+        self.assertEqual([(row[1], row[0]) for row in rows],
+                         list(read_columnar(stream,
+                                            ["room_name", "person_id"])))
+
+    def test_export_to_path(self):
+        """
+        Test that the format follows the extension of the file name and
+        that unknown tables and extensions are refused
+        """
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "rooms.col")
+        self.new_dojo.export("rooms", filename)
+        with open(filename, "rb") as stream:
+            self.assertEqual(
+                [("Blue", "office", 6), ("Mara", "livingspace", 4)],
+                sorted(read_columnar(stream)))
+        with self.assertRaises(ValueError):
+            self.new_dojo.export("rooms", os.path.join(directory, "rooms.xls"))
+        with self.assertRaises(ValueError):
+            self.new_dojo.export("visitors", filename)
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
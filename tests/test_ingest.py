@@ -0,0 +1,61 @@
+import unittest
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.ingest import parse_person, read_people, read_preferences
+
+
+class IngestTestCases(unittest.TestCase):
+    """
+    Tests for parsing people from input files
+    """
+    def test_parse_person(self):
+        """
+        Tests that valid lines are turned into records
+        """
+        self.assertEqual(("OLUWAFEMI", "SULE", "fellow", True),
+                         parse_person("OLUWAFEMI SULE FELLOW Y\n"))
+        self.assertEqual(("SIMON", "PATTERSON", "fellow", False),
+                         parse_person("SIMON PATTERSON FELLOW"))
+        self.assertEqual(("DOMINIC", "WALTERS", "staff", False),
+                         parse_person("DOMINIC WALTERS STAFF"))
+
+    def test_parse_invalid_person(self):
+        """
+        Tests that invalid lines raise a ValueError
+        """
+        for line in ["DOMINIC WALTERS", "DOMINIC WALTERS STAFF Y",
+                     "DOMINIC WALTERS VISITOR"]:
+            with self.assertRaises(ValueError):
+                parse_person(line)
+
+    def test_read_people(self):
+        """
+        Tests that lines are read in chunks and that invalid lines are
+        reported with their line numbers
+        """
+        errors = []
+        lines = ["A B FELLOW Y\n", "\n", "C D STAFF\n", "BROKEN\n",
+                 "E F FELLOW\n"]
+        chunks = list(read_people(lines, 2,
+                                  lambda number, line: errors.append(
+                                      (number, line))))
+        self.assertEqual([2, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual([(4, "BROKEN")], errors)
+
+    def test_read_preferences(self):
+        """
+        Tests that scores are grouped by person and that invalid lines are
+        reported with their line numbers
+        """
+        errors = []
+        lines = ["1 Blue 5\n", "1 Red 2.5\n", "\n", "2 Blue\n",
+                 "x Blue 3\n", "2 Green 1\n"]
+        preferences = read_preferences(
+            lines, lambda number, line: errors.append(number))
+        self.assertEqual({1: {"Blue": 5, "Red": 2.5}, 2: {"Green": 1}},
+                         preferences)
+        self.assertEqual([4, 5], errors)
+
+if __name__ == "__main__":
+    unittest.main()
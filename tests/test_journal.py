@@ -0,0 +1,170 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.journal import Journal
+
+
+def state(dojo):
+    """
+    Returns what a dojo holds in a form that can be compared
+    """
+    return (
+        sorted((person.person_id, person.person_name, person.person_type)
+               for person in dojo.people_by_id.values()),
+        {room.room_name: (room.room_type, sorted(
+            person.person_id for person in room.room_occupants))
+         for room in dojo.rooms_by_name.values()},
+        sorted(person.person_id for person in dojo.people["without_offices"]),
+        sorted(person.person_id
+               for person in dojo.people["without_livingspaces"]))
+
+
+class JournalTestCases(unittest.TestCase):
+    """
+    Tests for recovering the dojo from its journal
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, "dojo.journal")
+        self.db_name = os.path.join(self.directory, "dojo.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def crashed_dojo(self, checkpoint_every=1000):
+        """
+        Returns a journaled dojo that has been changed in every way and then
+        stopped without being saved
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.open_journal(self.journal, self.db_name, checkpoint_every,
+                              sync_every=1)
+        new_dojo.create_room("Blue", "office")
+        new_dojo.create_room("Red", "office")
+        new_dojo.create_room("Mara", "livingspace")
+        people = [new_dojo.add_person("Fellow", str(i), "fellow", True)
+                  for i in range(6)]
+        people += [new_dojo.add_person("Staff", str(i), "staff")
+                   for i in range(4)]
+        new_dojo.reallocate_person(
+            people[0].person_id,
+            "Red" if new_dojo.get_old_office(people[0].person_id).room_name
+            == "Blue" else "Blue")
+        new_dojo.rename_room("Mara", "Kilele")
+        new_dojo.rename_person(people[1].person_id, "Fellow Renamed")
+        new_dojo.remove_person(people[2].person_id)
+        new_dojo.delete_room("Red")
+        new_dojo.create_room("Red", "office")
+        new_dojo.journal.stream.close()
+        return new_dojo
+
+    def test_replay_journal(self):
+        """
+        Test that a dojo that crashed is recovered from its journal alone
+        and does not hand out the ids it used again
+        """
+        crashed = self.crashed_dojo()
+        self.assertFalse(os.path.exists(self.db_name))
+        recovered = Dojo(output="null")
+        recovered.open_journal(self.journal, self.db_name)
+        self.assertEqual(state(crashed), state(recovered))
+        new_person = recovered.add_person("New", "Guy", "staff")
+        self.assertGreater(new_person.person_id,
+                           max(crashed.people_by_id))
+
+        # Recovery saved a checkpoint and emptied the journal
+        self.assertTrue(os.path.exists(self.db_name))
+        recovered.journal.stream.close()
+        self.assertEqual(1, len(Journal(self.journal).read()))
+        self.assertEqual(state(recovered),
+                         state(self.reopened()))
+
+    def reopened(self):
+        """
+        Returns a dojo recovered from the files of the test
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.open_journal(self.journal, self.db_name)
+        new_dojo.close_journal()
+        return new_dojo
+
+    def test_replay_after_checkpoints(self):
+        """
+        Test that a dojo is recovered from its last checkpoint and the
+        operations journaled after it
+        """
+        crashed = self.crashed_dojo(checkpoint_every=4)
+        self.assertTrue(os.path.exists(self.db_name))
+        self.assertLess(len(Journal(self.journal).read()), 4)
+        self.assertEqual(state(crashed), state(self.reopened()))
+
+    def test_torn_record(self):
+        """
+        Test that a record cut short by a crash is dropped and that later
+        records are appended after the last whole one
+        """
+        crashed = self.crashed_dojo()
+        with open(self.journal, "ab") as journal:
+            journal.write(b'[[[99,"Half')
+        journal = Journal(self.journal)
+        records = journal.read()
+        self.assertTrue(records)
+        with open(self.journal, "rb") as stream:
+            self.assertTrue(stream.read().endswith(b"]\n"))
+        self.assertEqual(state(crashed), state(self.reopened()))
+
+    def test_chunks_and_unsynced_records(self):
+        """
+        Test that people added in chunks are journaled as each chunk is
+        yielded and that records reach the file before they are synced
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.open_journal(self.journal, self.db_name, sync_every=1000,
+                              sync_interval=1000)
+        new_dojo.create_room("Blue", "office")
+        chunks = new_dojo.add_people_in_chunks(
+            [[("Staff", "One", "staff", False)],
+             [("Staff", "Two", "staff", False)]])
+        next(chunks)
+        self.assertEqual(2, len(Journal(self.journal).read()))
+        list(chunks)
+        self.assertEqual(state(new_dojo), state(self.reopened()))
+        new_dojo.journal.stream.close()
+
+    def test_sync_from_another_thread(self):
+        """
+        Test that the journal is synced from another thread while records
+        are appended and the journal is emptied
+        """
+        journal = Journal(self.journal, sync_every=1000)
+        done = threading.Event()
+        errors = []
+
+        def keep_syncing():
+            try:
+                while not done.is_set():
+                    journal.sync()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=keep_syncing)
+        thread.start()
+        for index in range(2000):
+            journal.append([[], [], [index], []])
+            if index % 100 == 99:
+                journal.truncate()
+        done.set()
+        thread.join()
+        journal.close()
+        self.assertEqual([], errors)
+        self.assertEqual(0, len(journal.read()))
+
+if __name__ == "__main__":
+    unittest.main()
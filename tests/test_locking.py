@@ -0,0 +1,243 @@
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.locking import StripedLocks, ThreadSafeDojo
+
+
+class LockingTestCases(unittest.TestCase):
+    """
+    Tests for using one dojo from many threads
+    """
+    def setUp(self):
+        self.new_dojo = Dojo(output="null")
+        for index in range(8):
+            self.new_dojo.create_room("Office{}".format(index), "office")
+        self.people = [self.new_dojo.add_person("Staff", str(index), "staff")
+                       for index in range(40)]
+        self.threads = ThreadSafeDojo(self.new_dojo, stripes=16)
+
+    def test_stripes(self):
+        """
+        Test that a key always maps to the same stripe, that stripes are
+        taken in order and that they are released
+        """
+        stripes = StripedLocks(4)
+        held = stripes.holding(["a", "b", "c", "a"])
+        self.assertLessEqual(len(held.locks), 3)
+        self.assertEqual(
+            sorted(held.locks, key=stripes.locks.index), held.locks)
+        with held:
+            self.assertTrue(all(lock.locked() for lock in held.locks))
+        self.assertFalse(any(lock.locked() for lock in stripes.locks))
+        with stripes.holding_all():
+            self.assertTrue(all(lock.locked() for lock in stripes.locks))
+
+    def test_concurrent_changes(self):
+        """
+        Test that reallocations, removals and room changes made from many
+        threads never overfill a room or lose a person
+        """
+        rooms = list(self.new_dojo.rooms_by_name)
+        removed = set(person.person_id for person in self.people[:5])
+        barrier = threading.Barrier(8)
+
+        def work(seed):
+            barrier.wait()
+            chooser = random.Random(seed)
+            for step in range(200):
+                person = chooser.choice(self.people[5:])
+                self.threads.reallocate_person(person.person_id,
+                                               chooser.choice(rooms))
+                if step % 50 == 0:
+                    self.threads.print_vacant_rooms()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(work, seed) for seed in range(7)]
+            futures.append(pool.submit(lambda: [
+                barrier.wait(),
+                [self.threads.remove_person(person_id)
+                 for person_id in removed],
+                self.threads.create_room("Spare", "office"),
+                self.threads.rename_room("Spare", "Extra"),
+                self.threads.delete_room("Extra")]))
+            for future in futures:
+                future.result()
+
+        seen = []
+        for room in self.new_dojo.rooms["offices"]:
+            self.assertLessEqual(len(room.room_occupants),
+                                 room.room_capacity)
+            seen.extend(person.person_id for person in room.room_occupants)
+        seen.extend(person.person_id
+                    for person in self.new_dojo.people["without_offices"])
+        self.assertEqual(sorted(set(seen)), sorted(seen))
+        self.assertEqual(
+            sorted(person.person_id for person in self.people
+                   if person.person_id not in removed), sorted(seen))
+        self.assertEqual(sorted(self.new_dojo.people_by_id), sorted(seen))
+        self.assertNotIn("Extra", self.new_dojo.rooms_by_name)
+
+    def test_concurrent_allocations(self):
+        """
+        Test that people allocated from many threads fill the rooms to
+        capacity and no further
+        """
+        for person in self.people:
+            self.new_dojo.remove_person(person.person_id)
+        for room in list(self.new_dojo.rooms_by_name)[2:]:
+            self.new_dojo.delete_room(room)
+        people = [self.new_dojo.add_person("Staff", str(index), "staff")
+                  for index in range(20)]
+        for room in self.new_dojo.rooms["offices"]:
+            for person in list(room.room_occupants):
+                self.new_dojo.remove_occupant(room, person)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda person: self.threads.allocate_person(
+                person.person_id, "office"), people))
+
+        offices = self.new_dojo.rooms["offices"]
+        self.assertEqual([6, 6], [len(room.room_occupants)
+                                  for room in offices])
+        self.assertEqual(8, len(self.new_dojo.people["without_offices"]))
+
+    def test_allocation_after_no_vacancy(self):
+        """
+        Test that an allocation that found no vacancy cannot take a space
+        that opens while another thread is filling it
+        """
+        self.new_dojo = Dojo(output="null")
+        self.new_dojo.create_room("Blue", "office")
+        for index in range(5):
+            self.new_dojo.add_person("Staff", str(index), "staff")
+        first = self.new_dojo.add_person("Staff", "First", "staff")
+        late = self.new_dojo.add_person("Staff", "Late", "staff")
+        room = self.new_dojo.rooms_by_name["Blue"]
+        self.new_dojo.remove_occupant(room, first)
+        self.threads = ThreadSafeDojo(self.new_dojo)
+        self.assertEqual(5, len(room.room_occupants))
+
+        paused, go = threading.Event(), threading.Event()
+        add_occupant = self.new_dojo.add_occupant
+        pick_room = self.new_dojo.pick_room
+        missed = []
+
+        def add_after_pause(room, member):
+            if member is first:
+                paused.set()
+                go.wait(5)
+            add_occupant(room, member)
+
+        def miss_first_pick(*args, **kwargs):
+            # The late allocation looks before the space is taken
+            if threading.current_thread().name == "late" and not missed:
+                missed.append(True)
+                return None
+            return pick_room(*args, **kwargs)
+
+        self.new_dojo.add_occupant = add_after_pause
+        self.new_dojo.pick_room = miss_first_pick
+        filling = threading.Thread(target=self.threads.allocate_person,
+                                   args=(first.person_id, "office"))
+        filling.start()
+        self.assertTrue(paused.wait(5))
+        allocating = threading.Thread(
+            target=self.threads.allocate_person, name="late",
+            args=(late.person_id, "office"))
+        allocating.start()
+        allocating.join(0.2)
+        self.assertTrue(missed)
+        go.set()
+        filling.join()
+        allocating.join()
+
+        self.assertEqual(6, len(room.room_occupants))
+        self.assertIn(first, room.room_occupants)
+        self.assertIn(late, self.new_dojo.people["without_offices"])
+
+    def test_journal_holds_whole_changes(self):
+        """
+        Test that a change made while another thread is half way through
+        a reallocation neither journals nor checkpoints that half
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        journal = os.path.join(directory, "dojo.journal")
+        db_name = os.path.join(directory, "dojo.db")
+        self.new_dojo.open_journal(journal, db_name, checkpoint_every=1,
+                                   sync_every=1)
+        person = self.people[0]
+        old_office = self.new_dojo.get_old_office(person.person_id)
+        new_office = next(room for room in self.new_dojo.rooms["offices"]
+                          if room is not old_office and
+                          len(room.room_occupants) < room.room_capacity)
+        paused, go = threading.Event(), threading.Event()
+        add_occupant = self.new_dojo.add_occupant
+
+        def add_after_pause(room, member):
+            if member is person:
+                paused.set()
+                go.wait(5)
+            add_occupant(room, member)
+
+        def records():
+            with open(journal, "rb") as stream:
+                return [json.loads(line.decode("utf-8"))
+                        for line in stream if line.endswith(b"\n")]
+
+        self.new_dojo.add_occupant = add_after_pause
+        moving = threading.Thread(
+            target=self.threads.reallocate_person,
+            args=(person.person_id, new_office.room_name))
+        moving.start()
+        self.assertTrue(paused.wait(5))
+        creating = threading.Thread(target=self.threads.create_room,
+                                    args=("Spare", "office"))
+        creating.start()
+        deadline = time.time() + 5
+        while time.time() < deadline and not any(
+                room[1] == "Spare" for record in records()
+                for room in record[1]):
+            time.sleep(0.01)
+
+        # The room is journaled, but the checkpoint waits for the move
+        self.assertTrue(records())
+        for record in records():
+            self.assertNotIn(person.person_id,
+                             [changed[0] for changed in record[0]])
+        creating.join(0.2)
+        self.assertTrue(creating.is_alive())
+        go.set()
+        moving.join()
+        creating.join()
+        self.assertIs(new_office,
+                      self.new_dojo.get_old_office(person.person_id))
+
+        recovered = Dojo(output="null")
+        recovered.open_journal(journal, db_name)
+        recovered.close_journal()
+        self.assertEqual(
+            new_office.room_name,
+            recovered.get_old_office(person.person_id).room_name)
+        self.assertEqual(
+            {room.room_name: sorted(member.person_id
+                                    for member in room.room_occupants)
+             for room in self.new_dojo.rooms["offices"]},
+            {room.room_name: sorted(member.person_id
+                                    for member in room.room_occupants)
+             for room in recovered.rooms["offices"]})
+        self.new_dojo.close_journal()
+
+if __name__ == "__main__":
+    unittest.main()
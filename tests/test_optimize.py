@@ -0,0 +1,109 @@
+import itertools
+import random
+import unittest
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.optimize import auction, total_score
+
+
+class OptimizeTestCases(unittest.TestCase):
+    """
+    Tests for allocating rooms according to preferences
+    """
+    def test_auction_is_optimal(self):
+        """
+        Tests that the auction finds the best total score of every small
+        problem, found by trying every assignment
+        """
+        rng = random.Random(4)
+        for _ in range(100):
+            people = list(range(rng.randint(1, 5)))
+            capacities = {room: rng.randint(0, 2) for room in "abc"}
+            scores = {person: {room: rng.randint(0, 9) for room in "abc"
+                               if rng.random() < 0.6} for person in people}
+            assignment = auction(people, capacities, scores)
+
+            placed = min(len(people), sum(capacities.values()))
+            self.assertEqual(placed, len([room for room in
+                                          assignment.values() if room]))
+            for room, capacity in capacities.items():
+                self.assertLessEqual(
+                    list(assignment.values()).count(room), capacity)
+            if placed < len(people):
+                continue
+            best = max(
+                total_score(scores, dict(zip(people, rooms)))
+                for rooms in itertools.product("abc", repeat=len(people))
+                if all(rooms.count(room) <= capacity
+                       for room, capacity in capacities.items()))
+            self.assertEqual(best, total_score(scores, assignment))
+
+    def test_auction_refuses_negative_scores(self):
+        """
+        Tests that negative scores are refused
+        """
+        with self.assertRaises(ValueError):
+            auction([1], {"a": 1}, {1: {"a": -1}})
+
+    def test_optimize_allocations(self):
+        """
+        Tests that offices are reallocated to match preferences without
+        going over their capacities
+        """
+        new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red", "Green"]:
+            new_dojo.create_room(name, "office")
+        result = new_dojo.add_people_bulk(
+            [("Staff", str(i), "staff", False) for i in range(12)], seed=2)
+        preferences = {person.person_id: {"Blue": 3, "Red": 1}
+                       for person in result.added[:8]}
+        preferences[result.added[8].person_id] = {"Blue": 10}
+
+        optimized = new_dojo.optimize_allocations(preferences, seed=2)
+        self.assertEqual(10 + 5 * 3 + 3 * 1, optimized.satisfaction)
+        self.assertGreaterEqual(optimized.satisfaction, optimized.baseline)
+        self.assertEqual([], optimized.unallocated)
+        blue = new_dojo.get_room_object("Blue")
+        self.assertIn(result.added[8], blue.room_occupants)
+        self.assertEqual(6, len(blue.room_occupants))
+        for person in result.added:
+            self.assertIs(optimized.rooms[person.person_id],
+                          new_dojo.get_old_office(person.person_id))
+            self.assertIn(person, new_dojo.people["with_offices"])
+
+    def test_unscored_people_stay(self):
+        """
+        Tests that people who gave no scores keep their rooms unless they
+        are displaced and that people without an office only take part if
+        they scored one
+        """
+        new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red", "Green"]:
+            new_dojo.create_room(name, "office")
+        result = new_dojo.add_people_bulk(
+            [("Staff", str(i), "staff", False) for i in range(12)], seed=2)
+        waiting = new_dojo.add_person("Staff", "Waiting", "staff")
+        new_dojo.remove_occupant(new_dojo.get_old_office(waiting.person_id),
+                                 waiting)
+        before = {person: new_dojo.get_old_office(person.person_id)
+                  for person in result.added}
+        person = next(person for person in result.added
+                      if before[person].room_name != "Green")
+
+        optimized = new_dojo.optimize_allocations(
+            {person.person_id: {"Green": 5}}, seed=2)
+        self.assertIs(new_dojo.get_room_object("Green"),
+                      new_dojo.get_old_office(person.person_id))
+        self.assertLessEqual(len(optimized.moved), 2)
+        self.assertNotIn(waiting.person_id, optimized.rooms)
+        self.assertIn(waiting, new_dojo.people["without_offices"])
+        moved = [other for other in result.added
+                 if new_dojo.get_old_office(other.person_id) is not
+                 before[other]]
+        self.assertEqual(sorted(optimized.moved, key=id),
+                         sorted(moved, key=id))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import io
+import unittest
+import sys
+from contextlib import redirect_stdout
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.output import BufferedOutput, EventOutput, NullOutput, \
+    ConsoleOutput, get_output
+from system.dojo import Dojo
+
+
+class OutputTestCases(unittest.TestCase):
+    """
+    Tests for the outputs that the dojo writes its messages to
+    """
+    def test_get_output(self):
+        """
+        Tests that outputs can be picked by name or passed in
+        """
+        self.assertTrue(isinstance(get_output(), ConsoleOutput))
+        self.assertTrue(isinstance(get_output("null"), NullOutput))
+        events = EventOutput()
+        self.assertIs(get_output(events), events)
+
+    def test_buffered_output(self):
+        """
+        Tests that buffered messages are only printed when flushed
+        """
+        buffered = BufferedOutput()
+        stream = io.StringIO()
+        buffered.write("Hello", "green")
+        buffered.write()
+        self.assertEqual("", stream.getvalue())
+        buffered.flush(stream)
+        self.assertEqual("Hello\n\n", stream.getvalue())
+        self.assertEqual([], buffered.lines)
+
+    def test_dojo_events(self):
+        """
+        Tests that a dojo writing to an event list prints nothing and records
+        the level of each message
+        """
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            new_dojo = Dojo(output="events")
+            new_dojo.create_room("Blue", "office")
+            new_dojo.create_room("Blue", "office")
+        self.assertEqual("", stdout.getvalue())
+        self.assertEqual(["success", "error"],
+                         [event.level for event in new_dojo.output.events])
+
+if __name__ == "__main__":
+    unittest.main()
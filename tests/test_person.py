@@ -2,7 +2,7 @@ import unittest
 import sys
 from os import path
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from system.person import Fellow, Staff
+from system.person import Fellow, Staff, PersonIdSequence
 
 
 class PersonTestCases(unittest.TestCase):
@@ -33,5 +33,29 @@ class PersonTestCases(unittest.TestCase):
         self.assertTrue(isinstance(self.new_fellow.person_id, int))
         self.assertTrue(isinstance(self.new_fellow, Fellow))
 
+    def test_person_slots(self):
+        """
+        Tests that people have no attribute dictionary
+        """
+        self.assertFalse(hasattr(self.new_fellow, "__dict__"))
+        self.assertFalse(hasattr(self.new_staff, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.new_fellow.nickname = "Faith"
+
+    def test_person_id_sequence(self):
+        """
+        Tests that ids are handed out in order and never below an id that
+        the sequence was advanced past
+        """
+        sequence = PersonIdSequence()
+        self.assertEqual([1, 2], [sequence.next_id(), sequence.next_id()])
+        sequence.advance(10)
+        sequence.advance(5)
+        self.assertEqual(11, sequence.next_id())
+        self.assertEqual(12, Fellow("Faith Gori",
+                                    person_id=12).person_id)
+        self.assertNotEqual(self.new_fellow.person_id,
+                            self.new_staff.person_id)
+
 if __name__ == "__main__":
     unittest.main()
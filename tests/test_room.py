@@ -2,7 +2,7 @@ import unittest
 import sys
 from os import path
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from system.room import Office, LivingSpace
+from system.room import Room, Office, LivingSpace
 
 
 class RoomTestCases(unittest.TestCase):
@@ -36,5 +36,16 @@ class RoomTestCases(unittest.TestCase):
         self.assertEqual(self.new_livingspace.room_occupants, [])
         self.assertTrue(isinstance(self.new_livingspace, LivingSpace))
 
+    def test_room_slots(self):
+        """
+        Tests that rooms have no attribute dictionary and do not share their
+        list of occupants
+        """
+        self.assertFalse(hasattr(self.new_office, "__dict__"))
+        self.assertFalse(hasattr(self.new_livingspace, "__dict__"))
+        first_room, second_room = Room("Red"), Room("Green")
+        first_room.room_occupants.append("Faith Gori")
+        self.assertEqual([], second_room.room_occupants)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.server import DojoServer, send_command, remove_stale_socket
+
+
+class ServerTestCases(unittest.TestCase):
+    """
+    Tests for serving a resident dojo over a Unix socket
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "dojo.sock")
+        self.new_dojo = Dojo()
+        self.server = DojoServer(self.socket_path, self.run_command)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            self.server.shutdown()
+            self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def run_command(self, line):
+        """
+        Runs a command of the form "method argument..." on the dojo
+        """
+        words = line.split()
+        if words[0] == "quit":
+            sys.exit()
+        getattr(self.new_dojo, words[0])(*words[1:])
+
+    def test_commands_share_one_dojo(self):
+        """
+        Test that every command is run on the same dojo and gets back what
+        it printed
+        """
+        self.assertIn(
+            "An office called Blue has been successfully created",
+            send_command(self.socket_path, "create_room Blue office"))
+        send_command(self.socket_path, "add_person Ann Kamau staff")
+        self.assertIn("Ann Kamau",
+                      send_command(self.socket_path, "print_room Blue"))
+        self.assertEqual(1, len(self.new_dojo.people_by_id))
+
+    def test_errors_and_quit(self):
+        """
+        Test that a failing command is reported without stopping the server
+        and that quit stops it and removes its socket
+        """
+        self.assertIn("AttributeError",
+                      send_command(self.socket_path, "fly_away"))
+        self.assertIn("Blue", send_command(self.socket_path,
+                                           "create_room Blue office"))
+        send_command(self.socket_path, "quit")
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.server.server_close()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+        # A socket left behind by a server that stopped is replaced
+        DojoServer(self.socket_path, self.run_command).socket.close()
+        self.server = DojoServer(self.socket_path, self.run_command)
+
+    def test_only_sockets_are_removed(self):
+        """
+        Test that a file that is not a socket is neither removed nor served
+        on
+        """
+        filename = os.path.join(self.directory, "dojo.db")
+        with open(filename, "w") as stream:
+            stream.write("data")
+        self.assertRaises(ValueError, remove_stale_socket, filename)
+        self.assertRaises(ValueError, DojoServer, filename, self.run_command)
+        self.assertTrue(os.path.exists(filename))
+
+if __name__ == "__main__":
+    unittest.main()
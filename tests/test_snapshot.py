@@ -0,0 +1,107 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+
+
+class SnapshotTestCases(unittest.TestCase):
+    """
+    Tests for saving and restoring the dojo with binary snapshots
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "dojo.snapshot")
+        self.new_dojo = Dojo(output="null")
+        self.new_dojo.create_room("Blue", "office")
+        self.new_dojo.create_room("Mara", "livingspace")
+        for i in range(5):
+            self.new_dojo.add_person("Fellow", str(i), "fellow", True)
+        for i in range(3):
+            self.new_dojo.add_person("Staff", "Ñandú {}".format(i), "staff")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_and_restore(self):
+        """
+        Test that a restored dojo has the same people, rooms, occupants and
+        unallocated people, and does not hand out ids that were used
+        """
+        self.new_dojo.snapshot(self.filename)
+        restored = Dojo(output="null")
+        restored.restore(self.filename)
+
+        for name, room in self.new_dojo.rooms_by_name.items():
+            restored_room = restored.rooms_by_name[name]
+            self.assertEqual(room.room_capacity, restored_room.room_capacity)
+            self.assertEqual(
+                [person.person_id for person in room.room_occupants],
+                [person.person_id for person in restored_room.room_occupants])
+        for status in ["fellows", "staff", "without_offices",
+                       "without_livingspaces"]:
+            self.assertEqual(
+                sorted(person.person_id
+                       for person in self.new_dojo.people[status]),
+                sorted(person.person_id for person in restored.people[status]))
+        self.assertEqual(2, len(restored.people["without_offices"]))
+        self.assertEqual(
+            {person.person_name for person in
+             self.new_dojo.people_by_id.values()},
+            {person.person_name for person in restored.people_by_id.values()})
+        self.assertEqual(1, len(restored.people["without_livingspaces"]))
+        self.assertIsNone(restored.get_random_room("office"))
+        restored.create_room("Kilele", "livingspace")
+        self.assertIsNotNone(restored.get_random_room("livingspace"))
+        new_person = restored.add_person("New", "Guy", "staff")
+        self.assertNotIn(new_person.person_id, self.new_dojo.people_by_id)
+
+    def test_restore_needs_empty_dojo(self):
+        """
+        Test that a snapshot is not restored over people and rooms that
+        already exist and that other files are refused
+        """
+        self.new_dojo.snapshot(self.filename)
+        self.new_dojo.restore(self.filename)
+        self.assertEqual(8, len(self.new_dojo.people_by_id))
+
+        with open(self.filename, "wb") as snapshot:
+            snapshot.write(b"SQLite format 3\0" * 4)
+        with self.assertRaises(ValueError):
+            Dojo(output="null").restore(self.filename)
+
+    def test_report_order_is_kept(self):
+        """
+        Test that a restored dojo lists rooms and unallocated people in the
+        same order as the dojo that was saved
+        """
+        self.new_dojo.create_room("Red", "office")
+        self.new_dojo.reallocate_person(
+            self.new_dojo.people["without_offices"][1].person_id, "Red")
+        self.new_dojo.reallocate_person(1, "Red")
+        self.new_dojo.delete_room("Red")
+        self.new_dojo.create_room("Red", "office")
+        self.new_dojo.rename_room("Blue", "Azure")
+        self.new_dojo.snapshot(self.filename)
+        restored = Dojo(output="null")
+        restored.restore(self.filename)
+
+        for group in ["offices", "livingspaces"]:
+            self.assertEqual(
+                [room.room_name for room in self.new_dojo.rooms[group]],
+                [room.room_name for room in restored.rooms[group]])
+        for status in ["without_offices", "without_livingspaces"]:
+            self.assertEqual(
+                [person.person_id for person in self.new_dojo.people[status]],
+                [person.person_id for person in restored.people[status]])
+        self.assertEqual([7, 8, 1], [person.person_id for person in
+                                     restored.people["without_offices"]])
+        self.assertEqual(self.new_dojo.print_unallocated(as_string=True),
+                         restored.print_unallocated(as_string=True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+def run_python(code, *args):
+    """
+    Runs code in a new interpreter started in the root of the project and
+    returns what it printed
+    """
+    return subprocess.check_output(
+        [sys.executable, "-c", code] + list(args), cwd=ROOT,
+        stderr=subprocess.DEVNULL).decode("utf-8")
+
+
+class StartupTestCases(unittest.TestCase):
+    """
+    Tests for keeping the start of the dojo fast
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_heavy_modules_are_lazy(self):
+        """
+        Test that SQLAlchemy and numpy are only imported once the dojo is
+        saved or its occupancy arrays are used
+        """
+        output = run_python(
+            "import sys\n"
+            "from system.dojo import Dojo\n"
+            "new_dojo = Dojo(output='null')\n"
+            "new_dojo.create_room('Blue', 'office')\n"
+            "print('sqlalchemy' in sys.modules, 'numpy' in sys.modules)\n"
+            "new_dojo.save_state(sys.argv[1])\n"
+            "print('sqlalchemy' in sys.modules)\n",
+            path.join(self.directory, "dojo.db"))
+        self.assertEqual(["False False", "True"], output.split("\n")[:2])
+
+    def test_banner_only_in_interactive_mode(self):
+        """
+        Test that the banner is not printed by a single command
+        """
+        output = run_python("import main; main.main(['--version'])")
+        self.assertEqual("Version 1.0", output.strip())
+        output = run_python("import main; main.main(['print_vacant_rooms'])")
+        self.assertNotIn("Welcome to the Dojo", output)
+        output = run_python(
+            "import io, main\n"
+            "from system.dojo import Dojo\n"
+            "interpreter = main.MyInteractive(Dojo())\n"
+            "interpreter.stdin = io.StringIO('exit\\n')\n"
+            "interpreter.use_rawinput = False\n"
+            "interpreter.cmdloop()\n")
+        self.assertIn("Welcome to the Dojo", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from system.dojo import Dojo
+from system.storage import sqlite_engine, room_occupants
+
+
+class StorageTestCases(unittest.TestCase):
+    """
+    Tests for saving the dojo to sqlite
+    """
+    def setUp(self):
+        self.db_name = os.path.join(tempfile.mkdtemp(), "storage.db")
+
+    def tearDown(self):
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(self.db_name + suffix):
+                os.remove(self.db_name + suffix)
+        os.rmdir(os.path.dirname(self.db_name))
+
+    def test_invalid_pragmas(self):
+        """
+        Tests that unknown pragma values are refused
+        """
+        with self.assertRaises(ValueError):
+            sqlite_engine(self.db_name, journal_mode="FAST")
+        with self.assertRaises(ValueError):
+            sqlite_engine(self.db_name, synchronous="1; DROP TABLE people")
+
+    def test_save_state_in_one_transaction(self):
+        """
+        Tests that every row is saved and that the journal mode is applied
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.add_people_bulk(
+            [("Fellow", str(i), "fellow", False) for i in range(10)])
+        new_dojo.save_state(self.db_name, journal_mode="WAL",
+                            synchronous="NORMAL")
+
+        connection = sqlite3.connect(self.db_name)
+        self.assertEqual("wal", connection.execute(
+            "PRAGMA journal_mode").fetchone()[0])
+        self.assertEqual(10, connection.execute(
+            "SELECT COUNT(*) FROM people").fetchone()[0])
+        self.assertEqual(14, connection.execute(
+            "SELECT COUNT(*) FROM unallocated").fetchone()[0])
+        connection.close()
+
+    def dojo_state(self, dojo):
+        """
+        Returns what a dojo holds in a form that can be compared
+        """
+        all_rooms = dojo.rooms["offices"] + dojo.rooms["livingspaces"]
+        return ({room.room_name: (room.room_type, sorted(
+                    person.person_name for person in room.room_occupants))
+                 for room in all_rooms},
+                sorted(person.person_name for person in
+                       dojo.people["fellows"] + dojo.people["staff"]),
+                sorted(person.person_name for person in
+                       dojo.people["without_offices"]),
+                sorted(person.person_name for person in
+                       dojo.people["without_livingspaces"]))
+
+    def test_incremental_save(self):
+        """
+        Tests that saving only the changes gives the same database as saving
+        everything
+        """
+        new_dojo = Dojo(output="null")
+        for name in ["Blue", "Red", "Green"]:
+            new_dojo.create_room(name, "office")
+        new_dojo.create_room("Mara", "livingspace")
+        result = new_dojo.add_people_bulk(
+            [("Fellow", str(i), "fellow", True) for i in range(8)], seed=3)
+        new_dojo.save_state(self.db_name)
+        self.assertEqual(0, len(new_dojo.changes))
+
+        # Swap two room names, move, rename, remove and add people
+        new_dojo.rename_room("Blue", "Temp")
+        new_dojo.rename_room("Red", "Blue")
+        new_dojo.rename_room("Temp", "Red")
+        new_dojo.delete_room("Green")
+        new_dojo.create_room("Yellow", "office")
+        moved = result.added[0]
+        new_dojo.reallocate_person(moved.person_id, "Yellow")
+        new_dojo.rename_person(result.added[1].person_id, "Renamed Fellow")
+        new_dojo.remove_person(result.added[2].person_id)
+        new_dojo.add_person("New", "Staff", "staff")
+        new_dojo.save_state(self.db_name, incremental=True)
+        self.assertEqual(0, len(new_dojo.changes))
+
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertEqual(self.dojo_state(new_dojo),
+                         self.dojo_state(loaded_dojo))
+
+        # The loaded dojo can carry on saving incrementally
+        loaded_dojo.delete_room("Mara")
+        loaded_dojo.save_state(self.db_name, incremental=True)
+        reloaded_dojo = Dojo(output="null")
+        reloaded_dojo.load_state(self.db_name)
+        self.assertEqual(self.dojo_state(loaded_dojo),
+                         self.dojo_state(reloaded_dojo))
+
+    def test_incremental_save_needs_a_synced_database(self):
+        """
+        Tests that an incremental save to a database the dojo was not saved
+        to writes everything
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.add_person("New", "Staff", "staff")
+        new_dojo.save_state(self.db_name, incremental=True)
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertEqual(self.dojo_state(new_dojo),
+                         self.dojo_state(loaded_dojo))
+
+    def test_load_old_schema(self):
+        """
+        Tests that a database whose rooms hold comma-joined occupant ids is
+        moved to the allocations table when loaded
+        """
+        connection = sqlite3.connect(self.db_name)
+        connection.executescript("""
+            CREATE TABLE people (person_id INTEGER PRIMARY KEY,
+                                 names VARCHAR, person_type VARCHAR);
+            CREATE TABLE rooms (id INTEGER PRIMARY KEY, room_name VARCHAR,
+                                room_type VARCHAR, room_capacity INTEGER,
+                                room_occupants VARCHAR);
+            CREATE TABLE unallocated (id INTEGER PRIMARY KEY,
+                                      person_id INTEGER, names VARCHAR,
+                                      person_type VARCHAR,
+                                      without_room VARCHAR);
+            INSERT INTO people VALUES (1, 'Ann Lee', 'fellow');
+            INSERT INTO people VALUES (2, 'Bob Kay', 'staff');
+            INSERT INTO rooms VALUES (1, 'Blue', 'office', 6, '2,1');
+            INSERT INTO rooms VALUES (2, 'Mara', 'livingspace', 4, '1');
+            INSERT INTO rooms VALUES (3, 'Red', 'office', 6, '');
+        """)
+        connection.commit()
+        connection.close()
+
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertEqual(["Bob Kay", "Ann Lee"], [
+            person.person_name for person in
+            loaded_dojo.get_room_object("Blue").room_occupants])
+        self.assertEqual(["Ann Lee"], [
+            person.person_name for person in
+            loaded_dojo.get_room_object("Mara").room_occupants])
+        self.assertEqual([], loaded_dojo.get_room_object("Red").room_occupants)
+
+        connection = sqlite3.connect(self.db_name)
+        columns = [row[1] for row in connection.execute(
+            "PRAGMA table_info(rooms)")]
+        self.assertNotIn("room_occupants", columns)
+        self.assertEqual(3, connection.execute(
+            "SELECT COUNT(*) FROM allocations").fetchone()[0])
+        connection.close()
+
+    def test_loaded_indexes(self):
+        """
+        Tests that the indexes of a loaded dojo match the ones of the dojo
+        that was saved
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.create_room("Mara", "livingspace")
+        new_dojo.add_people_bulk(
+            [("Fellow", str(i), "fellow", True) for i in range(4)], seed=1)
+        new_dojo.save_state(self.db_name)
+
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertEqual(self.dojo_state(new_dojo),
+                         self.dojo_state(loaded_dojo))
+        for person_id, person_rooms in new_dojo.person_rooms.items():
+            self.assertEqual(
+                {room_type: room.room_name
+                 for room_type, room in person_rooms.items()},
+                {room_type: room.room_name for room_type, room in
+                 loaded_dojo.person_rooms[person_id].items()})
+        self.assertEqual(["Blue"], [
+            room.room_name for room in loaded_dojo.vacancies["office"].rooms])
+        self.assertNotIn(loaded_dojo.get_room_object("Mara"),
+                         loaded_dojo.vacancies["livingspace"])
+        self.assertEqual(0, len(loaded_dojo.changes))
+
+    def test_lazy_load_state(self):
+        """
+        Tests that a lazily loaded dojo answers queries from the database and
+        only loads it when it is changed
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.add_person("Ann", "Lee", "fellow")
+        new_dojo.add_person("Bob", "Kay", "staff")
+        new_dojo.save_state(self.db_name)
+
+        lazy_dojo = Dojo(output="null")
+        lazy_dojo.load_state(self.db_name, lazy=True)
+        self.assertEqual({}, lazy_dojo.people_by_id)
+        self.assertIn("Ann Lee\nBob Kay", lazy_dojo.print_room("Blue"))
+        self.assertIn("does not exist", lazy_dojo.print_room("Red"))
+        found = lazy_dojo.get_person_id("Bob Kay")
+        self.assertEqual([new_dojo.get_person_id("Bob Kay")[0].person_id],
+                         [person.person_id for person in found])
+        self.assertEqual(0, lazy_dojo.get_person_id("Cat Ray"))
+        self.assertEqual({}, lazy_dojo.people_by_id)
+
+        # The first change loads the whole database
+        lazy_dojo.create_room("Red", "office")
+        self.assertIsNone(lazy_dojo.lazy_db)
+        self.assertEqual(2, len(lazy_dojo.people_by_id))
+        self.assertEqual(["Ann Lee", "Bob Kay"], [
+            person.person_name for person in
+            lazy_dojo.get_room_object("Blue").room_occupants])
+        lazy_dojo.save_state(self.db_name, incremental=True)
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertEqual(self.dojo_state(lazy_dojo),
+                         self.dojo_state(loaded_dojo))
+
+    def test_person_ids_survive_reloads(self):
+        """
+        Tests that person ids are handed out in order and are not reused
+        after a save and load, even for people who were removed
+        """
+        new_dojo = Dojo(output="null")
+        first = new_dojo.add_person("Ann", "Lee", "fellow")
+        second = new_dojo.add_person("Bob", "Kay", "staff")
+        self.assertEqual(first.person_id + 1, second.person_id)
+        new_dojo.remove_person(second.person_id)
+        new_dojo.save_state(self.db_name)
+
+        loaded_dojo = Dojo(output="null")
+        loaded_dojo.load_state(self.db_name)
+        self.assertIs(loaded_dojo.get_person_object(first.person_id),
+                      loaded_dojo.people["fellows"][0])
+        third = loaded_dojo.add_person("Cat", "Ray", "staff")
+        self.assertEqual(second.person_id + 1, third.person_id)
+
+    def test_load_state_merges_colliding_ids(self):
+        """
+        Tests that people from the database whose ids are taken by someone
+        else in the dojo are given new ids when merged
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        saved = new_dojo.add_person("Ann", "Lee", "fellow")
+        new_dojo.save_state(self.db_name)
+
+        other_dojo = Dojo(output="null")
+        other = other_dojo.add_person("Bob", "Kay", "staff")
+        self.assertEqual(saved.person_id, other.person_id)
+        other_dojo.load_state(self.db_name)
+        self.assertEqual(["Ann Lee", "Bob Kay"], sorted(
+            person.person_name for person in
+            other_dojo.people_by_id.values()))
+        merged = other_dojo.people["fellows"][0]
+        self.assertNotEqual(other.person_id, merged.person_id)
+        self.assertEqual([merged], other_dojo.get_room_object(
+            "Blue").room_occupants)
+
+    def test_room_occupants_query(self):
+        """
+        Tests that the occupants of a room can be read from the database
+        without loading the dojo
+        """
+        new_dojo = Dojo(output="null")
+        new_dojo.create_room("Blue", "office")
+        new_dojo.add_person("Ann", "Lee", "fellow")
+        new_dojo.add_person("Bob", "Kay", "staff")
+        new_dojo.save_state(self.db_name)
+
+        engine = sqlite_engine(self.db_name)
+        with engine.connect() as connection:
+            self.assertEqual(["Ann Lee", "Bob Kay"],
+                             room_occupants(connection, "Blue"))
+            self.assertEqual([], room_occupants(connection, "Red"))
+        engine.dispose()
+
+if __name__ == "__main__":
+    unittest.main()